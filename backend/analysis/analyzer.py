@@ -11,7 +11,7 @@ import os
 import platform
 import io
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 
 import chess
 import chess.pgn
@@ -410,8 +410,17 @@ def analyze_game(pgn_text: str,
         }
     }
 
+import time
+import shutil
+import itertools
+import threading
 import chess.pgn
 import chess.engine
+import chess.syzygy
+
+from .engine_pool import EnginePool, SEARCH_WATCHDOG
+from .metrics import ANALYSES_IN_FLIGHT, FAST_PATHS, GAME_DURATION, PLY_DURATION, observe_search
+from .eval_cache import EvalCache, EVAL_CACHE
 
 # -------- CONFIG --------
 MATE_SCORE = 100000
@@ -436,12 +445,69 @@ THRESHOLDS_CP = {
     "mistake": 300,
 }
 
+# Adaptive mode re-searches a ply at full depth when its shallow cp_loss lies
+# within max(MIN_MARGIN, RATIO * threshold) of a THRESHOLDS_CP boundary
+ADAPTIVE_MARGIN_RATIO = 0.25
+ADAPTIVE_MIN_MARGIN_CP = 5
+
+# Engine info fields copied into per-ply telemetry
+TELEMETRY_FIELDS = ('depth', 'seldepth', 'nodes', 'nps', 'hashfull')
+# Number of most expensive plies listed in the telemetry summary
+TELEMETRY_SLOWEST_PLIES = 5
+
+# Deadline scheduling: share of the budget spent on the time-capped sweep
+DEADLINE_SWEEP_SHARE = 0.25
+# Seconds at the end of the budget no search may run into, on top of the worst
+# engine overshoot seen so far; covers per-ply bookkeeping and a slower stop
+# than any measured yet
+DEADLINE_STOP_MARGIN_S = 0.05
+# Below this many seconds a position keeps its sweep evaluation instead of being searched
+DEADLINE_MIN_SEARCH_S = 0.01
+# Relative weights of a position in the budget split
+DEADLINE_CRITICAL_WEIGHT = 3.0
+DEADLINE_DECIDED_WEIGHT = 0.25
+# Sweep score beyond which a position counts as decided
+DEADLINE_DECIDED_CP = 800
+# Legal move count of a typical middlegame position; more moves get up to 1.5x the
+# weight, fewer down to 0.5x
+DEADLINE_TYPICAL_MOVES = 30
+
+# Syzygy tablebase directory used by the API, for the engine and for direct probing
+SYZYGY_PATH = os.getenv('SYZYGY_PATH') or None
+# Positions with at most this many pieces are looked up in the tablebases
+TABLEBASE_MAX_PIECES = int(os.getenv('TABLEBASE_MAX_PIECES', '7'))
+# Score of a tablebase win, less the plies to the next zeroing move (capped at
+# TABLEBASE_MAX_DTZ), so faster progress scores higher but never near a mate
+TABLEBASE_WIN_SCORE = 20000
+TABLEBASE_MAX_DTZ = 100
+# When a move goes from a mate to a tablebase win or back, move assessment caps
+# both scores here, so the two (which are scored on different scales) count as
+# equally won and a move that keeps the win loses nothing
+DECISIVE_SCORE = TABLEBASE_WIN_SCORE - TABLEBASE_MAX_DTZ
+
+# Identifies the columnar /analyze encoding produced by compact_result
+COMPACT_FORMAT = 'compact-v1'
+
 
 def get_stockfish_path() -> str:
+    """Stockfish executable: STOCKFISH_PATH, else the bundled binary, else one on PATH."""
+    # An explicit STOCKFISH_PATH wins (e.g. a fake engine for load tests)
+    env_path = os.getenv('STOCKFISH_PATH')
+    if env_path:
+        found = env_path if os.path.exists(env_path) else shutil.which(env_path)
+        if found:
+            return found
+        logger.warning(f"STOCKFISH_PATH {env_path} does not exist, looking for Stockfish elsewhere")
     base = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "stockfish"))
-    if platform.system() == "Windows":
-        return os.path.join(base, "stockfish.exe")
-    return os.path.join(base, "stockfish")
+    local_path = os.path.join(base, "stockfish.exe" if platform.system() == "Windows" else "stockfish")
+    if os.path.exists(local_path):
+        return local_path
+    found = shutil.which("stockfish")
+    if found:
+        logger.info(f"Found Stockfish in PATH: {found}")
+        return found
+    logger.warning(f"Stockfish not found at {local_path} or in PATH")
+    return local_path
 
 
 STOCKFISH_PATH = get_stockfish_path()
@@ -475,23 +541,648 @@ def chesscom_accuracy_from_acl(acl: float) -> float:
     return round(acc, 2)
 
 
-def analyze_game(pgn_text: str,
-                 depth: int = 15,
-                 multipv: int = 1,
-                 use_time: bool = False,
-                 time_limit: float = 0.08,
-                 threads: int = 1,
-                 hash_mb: int = 16,
-                 syzygy_path: str = None) -> Dict[str, Any]:
-    """Analyze a single PGN game and return per-side statistics.
+def reason_for_category(category: str) -> str:
+    """Simple human-readable explanation for a move category."""
+    mapping = {
+        'brilliant': 'A brilliant tactical idea that gained decisive advantage.',
+        'great': 'A very strong move that keeps an advantage.',
+        'best': 'Engine agrees — the best move in the position.',
+        'excellent': 'An excellent move improving the position.',
+        'good': 'A good solid move.',
+        'inaccuracy': 'A small inaccuracy that slightly worsened the position.',
+        'mistake': 'A mistake that lost significant advantage or material.',
+        'blunder': 'A blunder that lost material or allowed decisive tactics.'
+    }
+    return mapping.get(category, '')
+
+
+def _search_limit(depth: int, use_time: bool, time_limit: float) -> chess.engine.Limit:
+    return chess.engine.Limit(time=time_limit) if use_time else chess.engine.Limit(depth=depth)
+
+
+def _evaluate_position(engine: chess.engine.SimpleEngine,
+                       board: chess.Board,
+                       limit: chess.engine.Limit,
+                       multipv: int,
+                       game: object,
+                       track_iterations: bool = False,
+                       telemetry: bool = False,
+                       root_moves: Optional[List[chess.Move]] = None) -> Optional[Dict[str, Any]]:
+    """Search a position once and normalise the engine output.
 
     Args:
-        pgn_text: The PGN text to analyze
-        depth: Stockfish search depth (default: 15, min: 5, max: 25)
+        track_iterations: Follow the engine's iterative deepening and flag the
+            position as 'unstable' if the best move changed in the second half
+            of the search
+        telemetry: Add 'search', the TELEMETRY_FIELDS the engine reported for
+            the first line plus the search's wall time in ms
+        root_moves: Every legal move of the position, in the order the engine
+            should try them (UCI searchmoves); None leaves the order to the engine
 
     Returns:
-        Dict with counts and per-category move number lists.
+        Dict with the score from White's point of view ('score'), the principal
+        variation of the first line ('pv') and the first move of every line
+        ('lines'), all as UCI strings, and the depth the engine reached
+        ('depth'); or None if the engine failed.
+    """
+    best_moves = set()
+    started = time.perf_counter()
+    try:
+        # Depth-limited searches have no timeout of their own
+        with SEARCH_WATCHDOG.guard(engine, limit):
+            if track_iterations:
+                min_depth = (limit.depth or 0) // 2 + 1
+                with engine.analysis(board, limit, multipv=multipv, game=game, root_moves=root_moves) as analysis:
+                    for line in analysis:
+                        if line.get('multipv', 1) == 1 and line.get('pv') and line.get('depth', 0) >= min_depth:
+                            best_moves.add(line['pv'][0])
+                    info = analysis.multipv
+            elif multipv > 1:
+                try:
+                    # many engines accept a multipv kwarg; try that first
+                    info = engine.analyse(board, limit, multipv=multipv, game=game, root_moves=root_moves)
+                except TypeError:
+                    # Some wrappers return a list when multipv is configured via engine.configure
+                    try:
+                        engine.configure({'MultiPV': multipv})
+                    except Exception:
+                        pass
+                    info = engine.analyse(board, limit, game=game, root_moves=root_moves)
+            else:
+                info = engine.analyse(board, limit, game=game, root_moves=root_moves)
+    except Exception as e:
+        logger.error(f"Engine analysis failed: {e}")
+        return None
+
+    # Normalise single-dict and list-of-dicts (MultiPV) responses
+    entries = [e for e in (info if isinstance(info, list) else [info]) if isinstance(e, dict)]
+    if entries:
+        observe_search(entries[0])
+    lines = []
+    for entry in entries:
+        line_pv = entry.get('pv')
+        if line_pv:
+            lines.append(line_pv[0].uci())
+    pv = [m.uci() for m in entries[0].get('pv') or []] if entries else []
+
+    score = None
+    score_obj = entries[0].get('score') if entries else None
+    if score_obj is not None:
+        try:
+            # Convert to centipawn value respecting mate handling
+            score = score_obj.white().score(mate_score=MATE_SCORE)
+        except Exception:
+            score = None
+
+    depth_reached = entries[0].get('depth') if entries else None
+    record = {'score': score, 'pv': pv, 'lines': lines, 'depth': depth_reached}
+    if track_iterations:
+        record['unstable'] = len(best_moves) > 1
+    if telemetry:
+        first = entries[0] if entries else {}
+        record['search'] = {field: first.get(field) for field in TELEMETRY_FIELDS}
+        record['search']['wall_ms'] = round(1000 * (time.perf_counter() - started), 2)
+    return record
+
+
+_TABLEBASES: Dict[str, Optional[chess.syzygy.Tablebase]] = {}
+_TABLEBASES_LOCK = threading.Lock()
+
+
+def _open_tablebase(path: str) -> Optional[chess.syzygy.Tablebase]:
+    """Syzygy tables in `path`, opened once per process; None if they cannot be read."""
+    with _TABLEBASES_LOCK:
+        if path not in _TABLEBASES:
+            try:
+                _TABLEBASES[path] = chess.syzygy.open_tablebase(path)
+            except Exception as e:
+                logger.warning(f"Cannot open Syzygy tables at {path}: {e}")
+                _TABLEBASES[path] = None
+        return _TABLEBASES[path]
+
+
+def _tablebase_score(wdl: int, dtz: int, halfmove_clock: int = 0) -> int:
+    """Centipawn score, for the side to move, of a tablebase WDL/DTZ result.
+    Cursed wins and blessed losses are draws under the fifty-move rule, and so
+    is a win whose next zeroing move comes after the halfmove clock runs out."""
+    if abs(wdl) < 2 or abs(dtz) + halfmove_clock > 100:
+        return 0
+    score = TABLEBASE_WIN_SCORE - min(abs(dtz), TABLEBASE_MAX_DTZ)
+    return score if wdl > 0 else -score
+
+
+def _probe_tablebase(tablebase: chess.syzygy.Tablebase,
+                     board: chess.Board,
+                     multipv: int) -> Optional[Dict[str, Any]]:
+    """Exact evaluation from the Syzygy tables, in the same shape as
+    _evaluate_position; None if the tables do not cover the position."""
+    if chess.popcount(board.occupied) > TABLEBASE_MAX_PIECES or board.castling_rights:
+        return None
+    try:
+        score = _tablebase_score(tablebase.probe_wdl(board), tablebase.probe_dtz(board), board.halfmove_clock)
+        # Rank moves by the resulting position's value for the mover
+        ranked = []
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                value = -_tablebase_score(tablebase.probe_wdl(board), tablebase.probe_dtz(board),
+                                          board.halfmove_clock)
+            finally:
+                board.pop()
+            ranked.append((value, move.uci()))
+    except KeyError:
+        # MissingTableError: no table for this material
+        return None
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    lines = [uci for _, uci in ranked[:multipv]]
+    return {
+        'score': score if board.turn == chess.WHITE else -score,
+        'pv': lines[:1],
+        'lines': lines,
+        'depth': None,
+    }
+
+
+def _root_move_order(board: chess.Board, first: List[str]) -> List[chess.Move]:
+    """Every legal move of `board`, the UCI moves in `first` ahead of the rest."""
+    legal = list(board.legal_moves)
+    ordered = []
+    for uci in first:
+        move = chess.Move.from_uci(uci)
+        if move in legal and move not in ordered:
+            ordered.append(move)
+    return ordered + [move for move in legal if move not in ordered]
+
+
+def _terminal_record(board: chess.Board, has_moves: bool) -> Optional[Dict[str, Any]]:
+    """Evaluation of a position without legal moves or mating material;
+    None if the game goes on. Draws by move count or repetition depend on
+    history and are left to the engine."""
+    if has_moves and not board.is_insufficient_material():
+        return None
+    score = 0
+    if not has_moves and board.is_check():
+        score = -MATE_SCORE if board.turn == chess.WHITE else MATE_SCORE
+    return {'score': score, 'pv': [], 'lines': [], 'depth': None}
+
+
+# Satisfied by a depth-limited evaluation of any depth; looks up seeds whatever their depth
+_ANY_DEPTH = chess.engine.Limit(depth=0)
+
+
+class _Evaluator:
+    """Evaluates positions for one analysis run: serves them from the
+    evaluation cache when possible, searches on a miss and keeps per-run
+    counters.
+
+    Some positions never reach the engine: finished games are scored
+    directly, tablebase positions are probed, and a position with a single
+    legal move takes the evaluation of the position after that move.
+    """
+
+    def __init__(self,
+                 engine: chess.engine.SimpleEngine,
+                 game: object,
+                 eval_cache: Optional[EvalCache],
+                 telemetry: bool = False,
+                 tablebase: Optional[chess.syzygy.Tablebase] = None,
+                 seed: Optional[EvalCache] = None):
+        self.engine = engine
+        self.game = game
+        self.eval_cache = eval_cache
+        self.telemetry = telemetry
+        self.tablebase = tablebase
+        # Evaluations recovered from a previous result of this game, possibly
+        # shallower than this run's (see _seed_from_previous)
+        self.seed = seed
+        self.cache_stats = {'hits': 0, 'misses': 0, 'reused': 0}
+        self.fast_paths = {'terminal': 0, 'tablebase': 0, 'forced': 0}
+        # Telemetry of the latest evaluate() call, when telemetry is enabled
+        self.last_search: Optional[Dict[str, Any]] = None
+
+    def evaluate(self,
+                 board: chess.Board,
+                 limit: chess.engine.Limit,
+                 multipv: int,
+                 track_iterations: bool = False,
+                 budget: Optional[float] = None,
+                 search: bool = True) -> Optional[Dict[str, Any]]:
+        """Evaluate `board` to `limit`.
+
+        With a time `budget` (seconds) the search may stop before reaching
+        limit.depth; its result is then cached under the depth it did reach.
+        Without `search` only cached evaluations and fast paths are used, and
+        None is returned when the position would need the engine.
+
+        A seeded evaluation is reused as is when it is as deep as `limit`;
+        a shallower one only orders the root moves of the new search, its
+        best lines first, so the result is the same as without it.
+        """
+        hint = None
+        if self.seed is not None:
+            record = self.seed.get(board, _ANY_DEPTH, multipv)
+            if record is not None and (record['depth'] or 0) >= (limit.depth or 0):
+                self.cache_stats['reused'] += 1
+                self.last_search = {'cached': True, 'reused': True} if self.telemetry else None
+                return record
+            hint = record
+        if self.eval_cache is not None:
+            record = self.eval_cache.get(board, limit, multipv)
+            if record is not None:
+                self.cache_stats['hits'] += 1
+                self.last_search = {'cached': True} if self.telemetry else None
+                return record
+            self.cache_stats['misses'] += 1
+
+        # Fast paths; their results are cheap to recompute and never cached
+        first_moves = list(itertools.islice(board.generate_legal_moves(), 2))
+        record = _terminal_record(board, bool(first_moves))
+        if record is not None:
+            return self._fast_path('terminal', record, track_iterations)
+        if self.tablebase is not None:
+            record = _probe_tablebase(self.tablebase, board, multipv)
+            if record is not None:
+                return self._fast_path('tablebase', record, track_iterations)
+        if len(first_moves) == 1:
+            # Forced move: the position is worth exactly what the reply is worth.
+            # The reply is usually the next game position, so its search is reused.
+            move = first_moves[0]
+            board.push(move)
+            try:
+                child = self.evaluate(board, limit, multipv, track_iterations, budget, search)
+            finally:
+                board.pop()
+            if child is None:
+                return None
+            record = dict(child, pv=[move.uci()] + child['pv'], lines=[move.uci()])
+            last = self.last_search
+            self._fast_path('forced', record, track_iterations)
+            if self.telemetry:
+                self.last_search = dict(last or {}, fast_path='forced')
+            return record
+
+        if not search:
+            return None
+        search_limit = limit
+        if budget is not None:
+            search_limit = chess.engine.Limit(depth=limit.depth, time=budget)
+        root_moves = None
+        if hint is not None:
+            self.cache_stats['reused'] += 1
+            root_moves = _root_move_order(board, hint['lines'] + hint['pv'][:1])
+        record = _evaluate_position(self.engine, board, search_limit, multipv, self.game, track_iterations,
+                                    telemetry=self.telemetry, root_moves=root_moves)
+        if self.telemetry:
+            self.last_search = record.pop('search', None) if record is not None else None
+        if record is not None and self.eval_cache is not None:
+            if budget is None:
+                self.eval_cache.put(board, limit, multipv, record)
+            elif record.get('depth'):
+                self.eval_cache.put(board, chess.engine.Limit(depth=record['depth']), multipv, record)
+        return record
+
+    def _fast_path(self, kind: str, record: Dict[str, Any], track_iterations: bool) -> Dict[str, Any]:
+        self.fast_paths[kind] += 1
+        FAST_PATHS.labels(kind).inc()
+        if track_iterations:
+            record.setdefault('unstable', False)
+        self.last_search = {'fast_path': kind} if self.telemetry else None
+        return record
+
+
+def _telemetry_summary(searches: List[Dict[str, Any]], plies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-game totals over every engine search, plus the slowest plies."""
+    searched = [t for t in searches if t and 'wall_ms' in t]
+    nodes = sum(t.get('nodes') or 0 for t in searched)
+    search_ms = sum(t.get('wall_ms') or 0 for t in searched)
+    depths = [t['depth'] for t in searched if t.get('depth') is not None]
+    slowest = sorted(plies, key=lambda p: p['telemetry']['ply_ms'], reverse=True)
+    return {
+        'searches': len(searched),
+        'cached': sum(1 for t in searches if t and t.get('cached')),
+        'fast_paths': sum(1 for t in searches if t and t.get('fast_path')),
+        'total_nodes': nodes,
+        'search_ms': round(search_ms, 2),
+        # Aggregate nps: total nodes over total search wall time
+        'mean_nps': int(nodes / (search_ms / 1000)) if search_ms else None,
+        'mean_depth': round(sum(depths) / len(depths), 2) if depths else None,
+        'min_depth': min(depths) if depths else None,
+        'max_hashfull': max((t.get('hashfull') or 0 for t in searched), default=None),
+        'slowest_plies': [
+            {'ply_index': p['ply_index'], 'move_number': p['move_number'], 'side': p['side'],
+             **p['telemetry']}
+            for p in slowest[:TELEMETRY_SLOWEST_PLIES]
+        ],
+    }
+
+
+def _is_near_threshold(cp_loss: float) -> bool:
+    """Whether a cp_loss is close enough to a category boundary that a deeper
+    search could plausibly change the move's classification."""
+    return any(abs(cp_loss - bound) <= max(ADAPTIVE_MIN_MARGIN_CP, bound * ADAPTIVE_MARGIN_RATIO)
+               for bound in THRESHOLDS_CP.values())
+
+
+def _score_for(record: Optional[Dict[str, Any]], color: chess.Color) -> Optional[int]:
+    """Centipawn score of an evaluated position from `color`'s point of view."""
+    if record is None or record.get('score') is None:
+        return None
+    return record['score'] if color == chess.WHITE else -record['score']
+
+
+def _is_mate_score(score: int) -> bool:
+    """Whether a centipawn score stands for a forced mate (see MATE_SCORE)."""
+    return abs(score) > TABLEBASE_WIN_SCORE
+
+
+def _assess_move(move: chess.Move,
+                 mover_color: chess.Color,
+                 before: Optional[Dict[str, Any]],
+                 after: Optional[Dict[str, Any]],
+                 multipv: int) -> Dict[str, Any]:
+    """Derive cp_loss, best move(s) and category for one ply from the
+    evaluations of the positions before and after it."""
+    # Compute centipawn loss (non-negative). Two mates keep their distance, so a
+    # slower mate still costs something; a mate compared with anything else is
+    # capped at +/-DECISIVE_SCORE
+    score_before = _score_for(before, mover_color)
+    score_after = _score_for(after, mover_color)
+    cp_loss = 0.0
+    if score_before is not None and score_after is not None:
+        if _is_mate_score(score_before) != _is_mate_score(score_after):
+            score_before = max(-DECISIVE_SCORE, min(DECISIVE_SCORE, score_before))
+            score_after = max(-DECISIVE_SCORE, min(DECISIVE_SCORE, score_after))
+        cp_loss = max(0.0, float(score_before) - float(score_after))
+
+    pv = before['pv'] if before else []
+    best_uci = pv[0] if pv else None
+    # With MultiPV report the first move of every line, otherwise the whole PV
+    best_uci_list = list(before['lines'] if multipv > 1 else pv) if before else []
+    if not best_uci_list and best_uci:
+        best_uci_list = [best_uci]
+
+    # Determine if the move played was the engine's best move
+    played_uci = move.uci()
+    is_best_move = best_uci is not None and played_uci == best_uci
+    cat = classify_cp_loss(int(round(cp_loss)), is_best_move)
+
+    return {
+        'played_uci': played_uci,
+        'best_uci': best_uci,
+        'best_uci_list': best_uci_list,
+        'cp_loss': cp_loss,
+        'category': cat,
+        'reason': reason_for_category(cat),
+    }
+
+
+def _seed_from_previous(previous: Dict[str, Any],
+                        board: chess.Board,
+                        moves: List[chess.Move],
+                        depth: int,
+                        multipv: int) -> Optional[EvalCache]:
+    """Rebuild position evaluations from an earlier analyze_game result.
+
+    A result holds, for every position it shares with this game, the score
+    (the previous ply's 'eval') and the best move or lines (its own ply's
+    best_uci / best_uci_list), which is all a later ply assessment reads.
+    Those positions are stored in a request-local EvalCache, at the depth
+    the previous run searched them. At the same depth only positions the
+    previous run did not search reach the engine; from a shallower result
+    every position is searched again, with the previous best lines tried
+    first (see _Evaluator.evaluate). The starting position's score is not
+    part of a result and is always searched again.
+
+    Only depth-limited, non-adaptive, non-deadline results with the same
+    MultiPV and starting position, and at most `depth`, can be reused: a
+    deeper result would answer a shallower run with different evaluations
+    than a fresh run gives.
+
+    Returns:
+        The seeded cache, or None if nothing can be reused
+    """
+    try:
+        params = previous['analysis_params']
+        moves_meta = previous['moves_meta']
+        if (params.get('use_time') or params.get('adaptive') or params.get('deadline') is not None
+                or int(params['depth']) > depth or int(params['multipv']) != multipv
+                or previous['fen_history'][0] != board.fen()):
+            return None
+        prev_limit = chess.engine.Limit(depth=int(params['depth']))
+        prev_moves = [meta['played_uci'] for meta in moves_meta]
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        logger.warning(f"Ignoring malformed previous result: {e}")
+        return None
+
+    common = 0
+    for move, prev_uci in zip(moves, prev_moves):
+        if move.uci() != prev_uci:
+            break
+        common += 1
+
+    seed = EvalCache(max_entries=common + 1)
+    board = board.copy(stack=False)
+    for index in range(1, common + 1):
+        board.push(moves[index - 1])
+        score = moves_meta[index - 1]['eval']
+        if index < len(prev_moves):
+            meta = moves_meta[index]
+            pv = meta['best_uci_list'] if multipv == 1 else [meta['best_uci']] if meta['best_uci'] else []
+            lines = meta['best_uci_list'] if multipv > 1 else pv[:1]
+            seed.put(board, prev_limit, multipv, {'score': score, 'pv': pv, 'lines': lines,
+                                                 'depth': prev_limit.depth})
+        elif index == len(moves):
+            # The previous final position was searched for its score only,
+            # which is all it is needed for if it is still the final position
+            seed.put(board, prev_limit, 1, {'score': score, 'pv': [], 'lines': [], 'depth': prev_limit.depth})
+    return seed if len(seed) else None
+
+
+def _critical_positions(moves: List[chess.Move],
+                        mover_color: chess.Color,
+                        sweep: List[Optional[Dict[str, Any]]],
+                        multipv: int) -> Tuple[Set[int], int]:
+    """Positions of the plies whose sweep cp_loss lies near a category
+    boundary or whose best move changed during the sweep.
+
+    Returns:
+        (indices of the positions before and after each such ply, number of such plies)
     """
+    positions: Set[int] = set()
+    plies = 0
+    for ply_index, move in enumerate(moves):
+        before, after = sweep[ply_index], sweep[ply_index + 1]
+        cp_loss = _assess_move(move, mover_color, before, after, multipv)['cp_loss']
+        if _is_near_threshold(cp_loss) or (before or {}).get('unstable'):
+            positions.update((ply_index, ply_index + 1))
+            plies += 1
+        mover_color = not mover_color
+    return positions, plies
+
+
+def _position_weights(board: chess.Board,
+                      moves: List[chess.Move],
+                      sweep: List[Optional[Dict[str, Any]]],
+                      critical: Set[int]) -> List[float]:
+    """Share of the deadline budget each position should get.
+
+    Forced positions (at most one legal move, including game over) get
+    nothing and keep their sweep evaluation. Critical positions get
+    DEADLINE_CRITICAL_WEIGHT, decided ones DEADLINE_DECIDED_WEIGHT and the
+    rest 1, scaled by how many legal moves the position has.
+    """
+    board = board.copy(stack=False)
+    weights = []
+    for index in range(len(moves) + 1):
+        if index:
+            board.push(moves[index - 1])
+        legal = board.legal_moves.count()
+        score = (sweep[index] or {}).get('score')
+        if legal <= 1:
+            weights.append(0.0)
+            continue
+        if index in critical:
+            weight = DEADLINE_CRITICAL_WEIGHT
+        elif score is not None and abs(score) >= DEADLINE_DECIDED_CP:
+            weight = DEADLINE_DECIDED_WEIGHT
+        else:
+            weight = 1.0
+        weights.append(weight * min(1.5, max(0.5, legal / DEADLINE_TYPICAL_MOVES)))
+    return weights
+
+
+def _short_of(record: Optional[Dict[str, Any]], depth: int) -> bool:
+    """Whether an evaluation is known to have stopped before `depth`."""
+    reached = (record or {}).get('depth')
+    return reached is not None and reached < depth
+
+
+class _DeadlineScheduler:
+    """Splits what is left of a game's time budget across the positions still
+    to be searched, in proportion to their weights. Positions are allotted in
+    order; time a search leaves unused (or overruns) is shared out among the
+    positions after it.
+
+    Each search costs a little more than its movetime (UCI round trip, engine
+    stop latency). That overhead is learned from the searches so far and set
+    aside for every position still pending. `stop_at` is a hard stop: no
+    search is allotted more than what is left before it, less the worst
+    overhead seen.
+    """
+
+    def __init__(self, stop_at: float, weights: List[float], overhead: float = 0.0, worst: float = 0.0):
+        self.stop_at = stop_at
+        self.weights = weights
+        self.overhead = overhead
+        self.worst = worst
+        self._pending = sum(weights)
+        self._pending_count = sum(1 for weight in weights if weight > 0)
+
+    def remaining(self) -> float:
+        return self.stop_at - time.monotonic()
+
+    def allot(self, index: int) -> Optional[float]:
+        """Seconds to search position `index`, or None to keep its sweep evaluation."""
+        weight = self.weights[index]
+        if weight <= 0:
+            return None
+        remaining = self.remaining()
+        usable = remaining - self.overhead * self._pending_count
+        share = min(usable * weight / self._pending, remaining - self.worst)
+        self._pending -= weight
+        self._pending_count -= 1
+        return share if share >= DEADLINE_MIN_SEARCH_S else None
+
+    def spent(self, seconds: float, budget: float) -> None:
+        """Update the overhead estimates from a search allotted `budget` that took `seconds`."""
+        overhead = max(0.0, seconds - budget)
+        self.overhead = 0.8 * self.overhead + 0.2 * overhead
+        self.worst = max(self.worst, overhead)
+
+
+def _configure_engine(engine: chess.engine.SimpleEngine,
+                      threads: Optional[int],
+                      hash_mb: Optional[int],
+                      syzygy_path: Optional[str]) -> None:
+    """Configure common UCI options (best-effort; not all engines expose the same options).
+
+    Threads and Hash are left alone when None, e.g. for pooled engines, which
+    the pool sizes when it hands them out.
+    """
+    try:
+        if threads is not None and hash_mb is not None:
+            engine.configure({'Threads': int(threads), 'Hash': int(hash_mb)})
+        if syzygy_path:
+            try:
+                engine.configure({'SyzygyPath': syzygy_path})
+            except Exception:
+                # Not all engine wrappers accept SyzygyPath; ignore if unsupported
+                pass
+    except Exception:
+        # ignore config errors and proceed
+        pass
+
+
+def split_pgn_games(pgn_text: str) -> List[str]:
+    """Split a multi-game PGN into one PGN string per game."""
+    games = []
+    stream = io.StringIO(pgn_text)
+    while True:
+        game = chess.pgn.read_game(stream)
+        if game is None:
+            break
+        games.append(str(game))
+    return games
+
+
+def iter_analysis(pgn_text: str,
+                  depth: int = 15,
+                  multipv: int = 1,
+                  use_time: bool = False,
+                  time_limit: float = 0.08,
+                  threads: int = 1,
+                  hash_mb: int = 16,
+                  syzygy_path: str = None,
+                  engine_pool: Optional[EnginePool] = None,
+                  eval_cache: Optional[EvalCache] = EVAL_CACHE,
+                  adaptive: bool = False,
+                  sweep_depth: Optional[int] = None,
+                  telemetry: bool = False,
+                  deadline: Optional[float] = None,
+                  previous: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Analyze a game incrementally, yielding each ply as soon as it is scored.
+
+    Every position in the game is searched exactly once; the evaluation of the
+    position after ply N doubles as the evaluation before ply N+1, so ply N is
+    emitted right after that search. Positions already searched at least as
+    deeply (e.g. common openings) are served from the evaluation cache, and
+    finished, forced and tablebase positions skip the search (see _Evaluator).
+
+    In adaptive mode (depth-limited searches only) the whole game is first
+    swept at `sweep_depth`; only plies whose cp_loss lies near a THRESHOLDS_CP
+    boundary, or whose best move changed during the sweep's iterative
+    deepening, are then re-searched at the full `depth`.
+
+    With a `deadline` the sweep is time-capped to DEADLINE_SWEEP_SHARE of the
+    budget, and what is left is split across the positions by weight (see
+    _position_weights), each searched towards `depth` for at most its share.
+    Plies whose evaluation stopped short of `depth` are marked
+    'budget_limited'.
+
+    Yields, in order:
+        {'type': 'start', 'fen': <initial FEN>}
+        {'type': 'ply', **moves_meta entry, 'fen': <FEN after the move>}
+        where each moves_meta entry carries 'eval', the centipawn score from
+        White's point of view after the move
+        {'type': 'summary', 'white': ..., 'black': ..., 'analysis_params': ...}
+
+    With telemetry, each ply also carries 'telemetry' (see analyze_game) and
+    analysis_params gets a per-game 'telemetry' summary.
+
+    Args are the same as for analyze_game.
+    """
+    # The deadline covers everything, including waiting for a pooled engine
+    started_at = time.monotonic()
     game = chess.pgn.read_game(io.StringIO(pgn_text))
     if game is None:
         raise ValueError("Invalid PGN provided")
@@ -513,237 +1204,503 @@ def analyze_game(pgn_text: str,
 
     board = game.board()
 
-    # We will record the FEN after each ply so frontend can step through positions
-    fen_history: List[str] = [board.fen()]
-    moves_meta: List[Dict[str, Any]] = []
-
-    # Verify stockfish exists
-    if not os.path.exists(STOCKFISH_PATH):
-        raise FileNotFoundError(f"Stockfish not found at {STOCKFISH_PATH}")
-
-    # Use engine context to ensure clean shutdown and configure engine for reproducible results
-    with chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH) as engine:
-        # Configure common UCI options (best-effort; not all engines expose the same options)
-        try:
-            engine.configure({'Threads': int(threads), 'Hash': int(hash_mb)})
-            if syzygy_path:
-                try:
-                    engine.configure({'SyzygyPath': syzygy_path})
-                except Exception:
-                    # Not all engine wrappers accept SyzygyPath; ignore if unsupported
-                    pass
-        except Exception:
-            # ignore config errors and proceed
-            pass
-
-        # Iterate through every move and evaluate before and after the move
-        for move in game.mainline_moves():
+    # Safety: stop at illegal moves (shouldn't normally happen)
+    moves: List[chess.Move] = []
+    replay = game.board()
+    for move in game.mainline_moves():
+        if not replay.is_legal(move):
+            logger.warning(f"Illegal move {move} at move {replay.fullmove_number}, stopping analysis")
+            break
+        moves.append(move)
+        replay.push(move)
+
+    if engine_pool is not None:
+        # Borrow a long-lived engine, sized within the pool's resource budget;
+        # passing `game` to analyse() sends ucinewgame
+        engine_path = engine_pool.path
+        # With a deadline, waiting for an engine comes out of the same budget
+        timeout = max(0.0, float(deadline) - DEADLINE_STOP_MARGIN_S) if deadline is not None else None
+        engine_ctx = engine_pool.acquire(timeout=timeout, threads=threads, hash_mb=hash_mb)
+    else:
+        # Verify stockfish exists
+        if not os.path.exists(STOCKFISH_PATH):
+            raise FileNotFoundError(f"Stockfish not found at {STOCKFISH_PATH}")
+        engine_path = STOCKFISH_PATH
+        engine_ctx = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+
+    limit = _search_limit(depth, use_time, time_limit)
+    multipv = max(1, int(multipv or 1))
+    # A deadline replaces both the fixed per-ply time and the adaptive sweep
+    if deadline is not None:
+        deadline = max(0.0, float(deadline))
+        # No search runs past this, whatever the split of the budget
+        stop_at = started_at + deadline - DEADLINE_STOP_MARGIN_S
+        use_time = adaptive = False
+        limit = chess.engine.Limit(depth=depth)
+    adaptive = bool(adaptive) and not use_time
+    if adaptive or deadline is not None:
+        sweep_depth = max(1, min(int(sweep_depth or max(6, depth // 2)), depth - 1))
+    deepened_plies = 0
+    budget_limited: Set[int] = set()
+
+    def lines_for(index: int) -> int:
+        # MultiPV is only needed where we report alternatives to a played move;
+        # the final position only contributes the score after the last move
+        return multipv if index < len(moves) else 1
+
+    yield {'type': 'start', 'fen': board.fen()}
+    started = time.perf_counter()
+
+    # Use engine context to ensure clean shutdown (or return to the pool)
+    with ANALYSES_IN_FLIGHT.track_inprogress(), engine_ctx as engine:
+        if engine_pool is not None:
+            _configure_engine(engine, None, None, syzygy_path)
+            # Report what the pool actually gave the engine, within the resource budget
+            threads, hash_mb = engine_pool.size_of(engine) or (threads, hash_mb)
+        else:
+            _configure_engine(engine, threads, hash_mb, syzygy_path)
+
+        tablebase = _open_tablebase(syzygy_path) if syzygy_path else None
+        seed = _seed_from_previous(previous, game.board(), moves, depth, multipv) if previous and not use_time else None
+        evaluator = _Evaluator(engine, game, eval_cache, telemetry=telemetry, tablebase=tablebase, seed=seed)
+        # Telemetry of every position's evaluation, by position index
+        searches: Dict[int, Optional[Dict[str, Any]]] = {}
+        sweep_searches: List[Optional[Dict[str, Any]]] = []
+        telemetry_plies: List[Dict[str, Any]] = []
+
+        # Positions to search at full depth; None means all of them
+        deep_positions = None
+        sweep: List[Optional[Dict[str, Any]]] = []
+        scheduler = None
+        # Time each deadline sweep search took beyond its cap
+        overheads: List[float] = []
+        # Positions the deadline sweep had no time left to search
+        unswept: Set[int] = set()
+        if (adaptive or deadline is not None) and moves:
+            # Pass 1: shallow sweep of every position
+            sweep_limit = chess.engine.Limit(depth=sweep_depth)
+            sweep_cap = None
+            sweep_board = game.board()
+            for index in range(len(moves) + 1):
+                if index:
+                    sweep_board.push(moves[index - 1])
+                can_search = True
+                if deadline is not None:
+                    # Spread what is left of the sweep's share over the remaining positions;
+                    # once that no longer covers a search's overhead, only cached
+                    # evaluations and fast paths are used
+                    now = time.monotonic()
+                    sweep_left = started_at + deadline * DEADLINE_SWEEP_SHARE - now
+                    worst = max(overheads, default=0.0)
+                    sweep_cap = min(sweep_left / (len(moves) + 1 - index), stop_at - now - worst)
+                    overhead = sum(overheads) / len(overheads) if overheads else 0.0
+                    can_search = sweep_cap > overhead
+                search_started = time.monotonic()
+                evaluator.last_search = None
+                record = evaluator.evaluate(sweep_board, sweep_limit, lines_for(index),
+                                            track_iterations=True, budget=sweep_cap, search=can_search)
+                sweep.append(record)
+                sweep_searches.append(evaluator.last_search)
+                if record is None and not can_search:
+                    unswept.add(index)
+                elif sweep_cap is not None:
+                    overheads.append(max(0.0, time.monotonic() - search_started - sweep_cap))
+
+            # Pass 2 targets: plies near a category boundary or with an unstable best move
+            critical, deepened_plies = _critical_positions(moves, board.turn, sweep, multipv)
+            if deadline is not None:
+                weights = _position_weights(board, moves, sweep, critical)
+                scheduler = _DeadlineScheduler(stop_at, weights,
+                                               overhead=sum(overheads) / len(overheads) if overheads else 0.0,
+                                               worst=max(overheads, default=0.0))
+            else:
+                deep_positions = critical
+
+        def from_sweep(index: int) -> Optional[Dict[str, Any]]:
+            if telemetry:
+                searches[index] = dict(sweep_searches[index] or {}, sweep=True)
+            return sweep[index]
+
+        def evaluate(index: int) -> Optional[Dict[str, Any]]:
+            if deep_positions is not None and index not in deep_positions:
+                return from_sweep(index)
+            budget = None
+            if scheduler is not None:
+                budget = scheduler.allot(index)
+                if budget is None:
+                    # Forced position, or no time left: the sweep result stands
+                    if index in unswept or (scheduler.weights[index] > 0 and _short_of(sweep[index], depth)):
+                        budget_limited.add(index)
+                    return from_sweep(index)
+            search_started = time.monotonic()
+            record = evaluator.evaluate(board, limit, lines_for(index), budget=budget)
+            if scheduler is not None:
+                scheduler.spent(time.monotonic() - search_started, budget)
+            if telemetry:
+                searches[index] = evaluator.last_search
+            if budget is not None and _short_of(record, depth):
+                budget_limited.add(index)
+            return record
+
+        before = evaluate(0) if moves else None
+
+        for ply_index, move in enumerate(moves):
+            ply_started = time.perf_counter()
             mover_color = board.turn
             side = "white" if mover_color == chess.WHITE else "black"
             move_number = board.fullmove_number
 
-            # Safety: skip illegal moves (shouldn't normally happen)
-            if not board.is_legal(move):
-                # record as missed if you like, but skip for now
-                board.push(move)
-                continue
-
-            # Engine evaluation before the move (get best move and score)
-            try:
-                # attempt to request multiple PVs if configured; prefer time-based limits for reproducibility if requested
-                limit = chess.engine.Limit(time=time_limit) if use_time else chess.engine.Limit(depth=depth)
-                if multipv and int(multipv) > 1:
-                    try:
-                        # many engines accept a multipv kwarg; try that first
-                        info_before = engine.analyse(board, limit, multipv=int(multipv))
-                    except TypeError:
-                        # Some wrappers return a list when multipv is configured via engine.configure
-                        try:
-                            engine.configure({'MultiPV': int(multipv)})
-                        except Exception:
-                            pass
-                        info_before = engine.analyse(board, limit)
-                else:
-                    info_before = engine.analyse(board, limit)
-            except Exception:
-                # If engine fails, push move and continue
-                board.push(move)
-                continue
+            board.push(move)
+            after = evaluate(ply_index + 1)
+            assessment = _assess_move(move, mover_color, before, after, multipv)
 
-            # Extract best move(s). Handle both single-dict and list-of-dicts responses for MultiPV
-            best_move = None
-            best_uci_list = []
-            if info_before is not None:
-                # If engine.analyse returned a list (multiple PVs), normalize it
-                try:
-                    if isinstance(info_before, list):
-                        # each entry may contain 'pv' and 'score'
-                        for entry in info_before:
-                            pv = entry.get('pv') if isinstance(entry, dict) else None
-                            if pv and len(pv) > 0:
-                                try:
-                                    best_uci_list.append(pv[0].uci())
-                                except Exception:
-                                    pass
-                        # primary best move is first entry's pv[0] when present
-                        first_entry = info_before[0] if len(info_before) > 0 else None
-                        if first_entry and isinstance(first_entry, dict):
-                            pv0 = first_entry.get('pv')
-                            if pv0 and len(pv0) > 0:
-                                best_move = pv0[0]
-                    else:
-                        pv = info_before.get("pv") if isinstance(info_before, dict) else None
-                        if pv:
-                            best_move = pv[0]
-                            try:
-                                best_uci_list = [m.uci() for m in pv]
-                            except Exception:
-                                if best_move is not None:
-                                    try:
-                                        best_uci_list = [best_move.uci()]
-                                    except Exception:
-                                        best_uci_list = []
-                except Exception:
-                    # Fallback: try to extract single pv field
-                    try:
-                        pv = info_before.get("pv") if isinstance(info_before, dict) else None
-                        if pv:
-                            best_move = pv[0]
-                            best_uci_list = [m.uci() for m in pv]
-                    except Exception:
-                        best_move = None
-                        best_uci_list = []
+            # Classify and record; each move is counted in exactly one category
+            cat = assessment['category']
+            stats[side]["counts"][cat] += 1
+            stats[side]["moves"][cat].append(move_number)
 
-            # Extract score for the primary PV (handle list or dict formats)
-            score_before_obj = None
-            score_before = None
-            try:
-                if isinstance(info_before, list) and len(info_before) > 0 and isinstance(info_before[0], dict):
-                    score_before_obj = info_before[0].get('score')
-                elif isinstance(info_before, dict):
-                    score_before_obj = info_before.get('score')
-                if score_before_obj is not None:
-                    try:
-                        # Convert to centipawn value respecting mate handling
-                        score_before = score_before_obj.pov(mover_color).score(mate_score=MATE_SCORE)
-                    except Exception:
-                        score_before = None
-            except Exception:
-                score_before_obj = None
-                score_before = None
+            total_cp_loss[side] += assessment['cp_loss']
+            total_moves[side] += 1
+            PLY_DURATION.observe(time.perf_counter() - ply_started)
 
-            # Play the actual move
-            board.push(move)
+            # ply_index is the index into fen_history of the position BEFORE the move,
+            # which is where best_uci should be played from
+            event = {
+                'type': 'ply',
+                'ply_index': ply_index,
+                'move_number': move_number,
+                'side': side,
+                **assessment,
+                'fen': board.fen(),
+                'eval': after['score'] if after else None,
+            }
+            if deadline is not None:
+                event['budget_limited'] = ply_index in budget_limited or ply_index + 1 in budget_limited
+            if telemetry:
+                event['telemetry'] = {
+                    **(searches.get(ply_index + 1) or {}),
+                    'ply_ms': round(1000 * (time.perf_counter() - ply_started), 2),
+                }
+                telemetry_plies.append(event)
+            yield event
+            before = after
+
+    GAME_DURATION.observe(time.perf_counter() - started)
+    analysis_params = {
+        'engine_path': engine_path,
+        'depth': depth,
+        'multipv': multipv,
+        'use_time': use_time,
+        'time_limit': time_limit,
+        'threads': threads,
+        'hash_mb': hash_mb,
+        'syzygy_path': syzygy_path,
+        'cache_hits': evaluator.cache_stats['hits'],
+        'cache_misses': evaluator.cache_stats['misses'],
+        'reused_positions': evaluator.cache_stats['reused'],
+        'fast_paths': evaluator.fast_paths,
+        'adaptive': adaptive,
+    }
+    if adaptive:
+        analysis_params['sweep_depth'] = sweep_depth
+        analysis_params['deepened_plies'] = deepened_plies
+    if deadline is not None:
+        analysis_params['deadline'] = deadline
+        analysis_params['sweep_depth'] = sweep_depth
+        analysis_params['elapsed_s'] = round(time.monotonic() - started_at, 3)
+        analysis_params['budget_limited_plies'] = sum(
+            1 for ply_index in range(len(moves))
+            if ply_index in budget_limited or ply_index + 1 in budget_limited)
+    if telemetry:
+        all_searches = sweep_searches + [t for t in searches.values() if t and not t.get('sweep')]
+        analysis_params['telemetry'] = _telemetry_summary(all_searches, telemetry_plies)
+
+    yield {
+        'type': 'summary',
+        'white': stats['white'],
+        'black': stats['black'],
+        'analysis_params': analysis_params,
+    }
 
-            # record FEN after this move
-            fen_history.append(board.fen())
 
-            # Engine evaluation after the move (from same mover's perspective)
-            try:
-                limit_after = chess.engine.Limit(time=time_limit) if use_time else chess.engine.Limit(depth=depth)
-                info_after = engine.analyse(board, limit_after)
-            except Exception:
-                info_after = None
+def analyze_game(pgn_text: str,
+                 depth: int = 15,
+                 multipv: int = 1,
+                 use_time: bool = False,
+                 time_limit: float = 0.08,
+                 threads: int = 1,
+                 hash_mb: int = 16,
+                 syzygy_path: str = None,
+                 engine_pool: Optional[EnginePool] = None,
+                 eval_cache: Optional[EvalCache] = EVAL_CACHE,
+                 adaptive: bool = False,
+                 sweep_depth: Optional[int] = None,
+                 telemetry: bool = False,
+                 deadline: Optional[float] = None,
+                 previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Analyze a single PGN game and return per-side statistics.
 
-            score_after_obj = info_after.get("score") if info_after and isinstance(info_after, dict) else None
-            score_after = None
-            if score_after_obj is not None:
-                try:
-                    score_after = score_after_obj.pov(mover_color).score(mate_score=MATE_SCORE)
-                except Exception:
-                    score_after = None
+    Args:
+        pgn_text: The PGN text to analyze
+        depth: Stockfish search depth (default: 15, min: 5, max: 25)
+        syzygy_path: Syzygy tablebase directory. Passed to the engine, and
+            positions with at most TABLEBASE_MAX_PIECES pieces are looked up
+            in it directly instead of being searched
+        engine_pool: Optional pool to borrow a warm engine from instead of
+            spawning a new Stockfish process for this game
+        eval_cache: Position evaluation cache to consult before searching
+            (default: the shared process-wide cache, None disables caching)
+        adaptive: Sweep the game at `sweep_depth` first and only search
+            critical plies at full `depth` (ignored with use_time)
+        sweep_depth: Depth of the adaptive sweep (default: max(6, depth // 2))
+        telemetry: Record engine telemetry. Each moves_meta entry gets
+            'telemetry' with the depth, seldepth, nodes, nps and hashfull the
+            engine reported for the position after the move, the search's
+            'wall_ms' (or 'cached': True) and the whole ply's 'ply_ms'.
+            analysis_params gets a per-game 'telemetry' summary with total
+            nodes, mean nps and depth, and the slowest plies
+        deadline: Total wall-time budget for the game in seconds, including
+            waiting for an engine. Positions get more time when critical or
+            complex and little or none when forced or decided; each moves_meta
+            entry gets 'budget_limited', true if the search ran out of time
+            before reaching `depth`. Overrides use_time and adaptive
+        previous: An earlier result for this game with the same MultiPV at
+            the same or a lower depth, e.g. with fewer moves. At the same
+            depth, positions it already evaluated are reused instead of
+            searched, so re-analyzing after appending moves only searches the
+            new plies; from a lower depth its best lines are tried first when
+            each position is searched again. Either way the result is the same
+            as a fresh run's. Results with other settings are ignored;
+            analysis_params['reused_positions'] counts the positions it served
 
-            # Compute centipawn loss (non-negative)
-            cp_loss = 0.0
-            if score_before is not None and score_after is not None:
-                try:
-                    cp_loss = float(score_before) - float(score_after)
-                    if cp_loss < 0:
-                        cp_loss = 0.0
-                except Exception:
-                    cp_loss = 0.0
+    Returns:
+        Dict with counts and per-category move number lists.
+    """
+    return collect_result(iter_analysis(
+        pgn_text, depth=depth, multipv=multipv, use_time=use_time, time_limit=time_limit,
+        threads=threads, hash_mb=hash_mb, syzygy_path=syzygy_path, engine_pool=engine_pool,
+        eval_cache=eval_cache, adaptive=adaptive, sweep_depth=sweep_depth, telemetry=telemetry,
+        deadline=deadline, previous=previous))
 
-            # Determine if the move played was the engine's best move
-            try:
-                is_best_move = best_move is not None and move == best_move
-            except Exception:
-                is_best_move = False
 
-            # Classify and record
-            cat = classify_cp_loss(int(round(cp_loss)), is_best_move)
-            stats[side]["counts"][cat] += 1
-            stats[side]["moves"][cat].append(move_number)
-            # Each move is counted in exactly one category; previous logic also
-            # added a 'missed' bucket for mistakes/blunders which caused duplicates.
-            # We intentionally avoid adding duplicate buckets here so classification
-            # is exclusive.
+class LiveAnalysis:
+    """Analysis of a game in progress, extended one ply at a time.
 
-            total_cp_loss[side] += cp_loss
-            total_moves[side] += 1
+    Every position evaluated so far is kept, so a new move costs a single
+    search (of the position after it; the position before it was searched
+    when the previous move came in) and a takeback costs none. Ply events have
+    the same shape as iter_analysis's.
 
-            # Persist per-move metadata for frontend (played move, best move, classification)
-            try:
-                played_uci = move.uci()
-            except Exception:
-                played_uci = None
-            try:
-                best_uci = best_move.uci() if best_move is not None else None
-            except Exception:
-                best_uci = None
-            # ensure best_uci_list is present and as UCI strings
-            try:
-                if not best_uci_list and best_uci:
-                    best_uci_list = [best_uci]
-            except Exception:
-                best_uci_list = []
+    The engine is not owned: attach() one before analyzing and detach() it
+    while the game is idle, e.g. to give it back to an EnginePool. A
+    re-attached engine starts a new game (ucinewgame) but the evaluations
+    already made are kept.
+    """
 
-            # Simple reason generator (human-readable explanation stub)
-            def reason_for_category(category: str) -> str:
-                mapping = {
-                    'brilliant': 'A brilliant tactical idea that gained decisive advantage.',
-                    'great': 'A very strong move that keeps an advantage.',
-                    'best': 'Engine agrees — the best move in the position.',
-                    'excellent': 'An excellent move improving the position.',
-                    'good': 'A good solid move.',
-                    'inaccuracy': 'A small inaccuracy that slightly worsened the position.',
-                    'mistake': 'A mistake that lost significant advantage or material.',
-                    'blunder': 'A blunder that lost material or allowed decisive tactics.'
-                }
-                return mapping.get(category, '')
-
-            # The engine evaluation (best_move) was computed for the position BEFORE the
-            # played move. To make frontend mapping intuitive (fen_history index ->
-            # best move to play from that position), record ply_index as the index
-            # of the position BEFORE the move.
-            prev_index = max(0, len(fen_history) - 2)
-            moves_meta.append({
-                'ply_index': prev_index,  # index into fen_history for the position before the move
-                'move_number': move_number,
-                'side': side,
-                'played_uci': played_uci,
-                'best_uci': best_uci,
-                'best_uci_list': best_uci_list,
-                'cp_loss': cp_loss,
-                'category': cat,
-                'reason': reason_for_category(cat),
-            })
+    def __init__(self,
+                 fen: str = chess.STARTING_FEN,
+                 depth: int = 15,
+                 multipv: int = 1,
+                 threads: int = 1,
+                 hash_mb: int = 16,
+                 syzygy_path: Optional[str] = None,
+                 eval_cache: Optional[EvalCache] = EVAL_CACHE):
+        """
+        Args:
+            fen: Starting position
+            depth, multipv, threads, hash_mb, syzygy_path, eval_cache: As for analyze_game
+
+        Raises:
+            ValueError: If `fen` is not a valid position
+        """
+        self.limit = chess.engine.Limit(depth=depth)
+        self.multipv = max(1, int(multipv or 1))
+        self.threads = threads
+        self.hash_mb = hash_mb
+        self.syzygy_path = syzygy_path
+        self.eval_cache = eval_cache
+        self.tablebase = _open_tablebase(syzygy_path) if syzygy_path else None
+        self.evaluator: Optional[_Evaluator] = None
+        self.reset(fen)
+
+    @property
+    def attached(self) -> bool:
+        return self.evaluator is not None
+
+    @property
+    def moves(self) -> List[chess.Move]:
+        return list(self.board.move_stack)
+
+    def attach(self, engine: chess.engine.SimpleEngine, sized: bool = False) -> None:
+        """Search on `engine` from now on; `sized` if it already has its Threads and Hash."""
+        if sized:
+            _configure_engine(engine, None, None, self.syzygy_path)
+        else:
+            _configure_engine(engine, self.threads, self.hash_mb, self.syzygy_path)
+        self.evaluator = _Evaluator(engine, object(), self.eval_cache, tablebase=self.tablebase)
+
+    def detach(self) -> None:
+        self.evaluator = None
+
+    def reset(self, fen: str = chess.STARTING_FEN) -> Dict[str, Any]:
+        """Start over from `fen`; returns the 'start' event."""
+        self.board = chess.Board(fen)
+        # Evaluation of every position of the game so far, by position index
+        self.records: List[Optional[Dict[str, Any]]] = [None]
+        return {'type': 'start', 'fen': self.board.fen()}
+
+    def evaluate_current(self) -> Optional[Dict[str, Any]]:
+        """Evaluate the current position if that has not happened yet, so the
+        next move only needs the search of the position after it."""
+        if self.records[-1] is None:
+            self.records[-1] = self._evaluate(self.board)
+        return self.records[-1]
+
+    def push(self, move: chess.Move) -> Dict[str, Any]:
+        """Play `move` and return its 'ply' event.
+
+        Raises:
+            ValueError: If the move is illegal in the current position
+            RuntimeError: If no engine is attached
+        """
+        if not self.board.is_legal(move):
+            raise ValueError(f"Illegal move {move.uci()} in {self.board.fen()}")
+        before = self.evaluate_current()
+        ply_started = time.perf_counter()
+        mover_color = self.board.turn
+        move_number = self.board.fullmove_number
+        self.board.push(move)
+        after = self._evaluate(self.board)
+        self.records.append(after)
+        PLY_DURATION.observe(time.perf_counter() - ply_started)
+        return {
+            'type': 'ply',
+            'ply_index': len(self.records) - 2,
+            'move_number': move_number,
+            'side': "white" if mover_color == chess.WHITE else "black",
+            **_assess_move(move, mover_color, before, after, self.multipv),
+            'fen': self.board.fen(),
+            'eval': after['score'] if after else None,
+        }
 
-    # Remove accuracy - frontend requested counts and moves only
+    def sync(self, moves: List[chess.Move]) -> Iterator[Dict[str, Any]]:
+        """Bring the game in line with the full move list `moves`.
+
+        Moves taken back are dropped with a single 'takeback' event carrying
+        the number of plies kept; the moves not analyzed yet are then pushed,
+        yielding their 'ply' events.
+
+        Raises:
+            ValueError: If a new move is illegal
+        """
+        played = self.board.move_stack
+        common = 0
+        for move, known in zip(moves, played):
+            if move != known:
+                break
+            common += 1
+        if common < len(played):
+            while len(self.board.move_stack) > common:
+                self.board.pop()
+            del self.records[common + 1:]
+            yield {'type': 'takeback', 'plies': common}
+        for move in moves[common:]:
+            yield self.push(move)
+
+    def _evaluate(self, board: chess.Board) -> Optional[Dict[str, Any]]:
+        if self.evaluator is None:
+            raise RuntimeError("No engine attached")
+        return self.evaluator.evaluate(board, self.limit, self.multipv)
+
+
+def collect_result(events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Assemble the analyze_game result from iter_analysis events."""
+    # We will record the FEN after each ply so frontend can step through positions
+    fen_history: List[str] = []
+    moves_meta: List[Dict[str, Any]] = []
+    summary: Dict[str, Any] = {}
+
+    for event in events:
+        event = dict(event)
+        kind = event.pop('type')
+        if kind == 'start':
+            fen_history.append(event['fen'])
+        elif kind == 'ply':
+            fen_history.append(event.pop('fen'))
+            moves_meta.append(event)
+        elif kind == 'summary':
+            summary = event
 
     # Return stats plus fen history and per-move metadata for frontend UI
     return {
-        'white': stats['white'],
-        'black': stats['black'],
+        'white': summary['white'],
+        'black': summary['black'],
         'fen_history': fen_history,
         'moves_meta': moves_meta,
-        'analysis_params': {
-            'engine_path': STOCKFISH_PATH,
-            'depth': depth,
-            'multipv': multipv,
-            'use_time': use_time,
-            'time_limit': time_limit,
-            'threads': threads,
-            'hash_mb': hash_mb,
-            'syzygy_path': syzygy_path,
-        }
+        'analysis_params': summary['analysis_params'],
+    }
+
+
+def replay_result(result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Turn a stored analyze_game result back into iter_analysis events."""
+    fen_history = result['fen_history']
+    yield {'type': 'start', 'fen': fen_history[0]}
+    for meta in result['moves_meta']:
+        yield {'type': 'ply', **meta, 'fen': fen_history[meta['ply_index'] + 1]}
+    yield {
+        'type': 'summary',
+        'white': result['white'],
+        'black': result['black'],
+        'analysis_params': result['analysis_params'],
+    }
+
+
+# Per-ply fields that compact_result stores as dedicated columns or derives on the client
+_COMPACT_DERIVED = ('ply_index', 'move_number', 'side', 'played_uci', 'best_uci',
+                    'best_uci_list', 'cp_loss', 'category', 'reason', 'eval')
+
+
+def compact_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Columnar encoding of an analyze_game result for size-sensitive clients.
+
+    Instead of a FEN and a dict per ply, the game is sent as the start FEN plus
+    the played moves in UCI, with one array per per-ply field. Categories are
+    small integer codes into 'categories', and each category's reason sentence
+    is sent once. 'best' is null where it equals the first entry of 'lines'.
+    'ep_plies' lists the plies after which the position has a capturable en
+    passant square, so the client can rebuild fen_history exactly by replaying
+    the moves. Any other per-ply fields (e.g. telemetry) go in 'extra'.
+    """
+    fen_history = result['fen_history']
+    moves_meta = result['moves_meta']
+    codes = {category: code for code, category in enumerate(CATEGORIES)}
+
+    best, lines = [], []
+    for meta in moves_meta:
+        line = meta['best_uci_list']
+        lines.append(line)
+        best.append(None if line and meta['best_uci'] == line[0] else meta['best_uci'])
+
+    extra: Dict[str, List[Any]] = {}
+    for ply_index, meta in enumerate(moves_meta):
+        for key, value in meta.items():
+            if key not in _COMPACT_DERIVED:
+                extra.setdefault(key, [None] * len(moves_meta))[ply_index] = value
+
+    return {
+        'format': COMPACT_FORMAT,
+        'white': result['white'],
+        'black': result['black'],
+        'analysis_params': result['analysis_params'],
+        'start_fen': fen_history[0],
+        'categories': CATEGORIES,
+        'reasons': [reason_for_category(category) for category in CATEGORIES],
+        'moves': [meta['played_uci'] for meta in moves_meta],
+        'category': [codes[meta['category']] for meta in moves_meta],
+        'cp_loss': [round(meta['cp_loss'], 1) for meta in moves_meta],
+        'eval': [meta['eval'] for meta in moves_meta],
+        'best': best,
+        'lines': lines,
+        'ep_plies': [index for index, fen in enumerate(fen_history[1:]) if fen.split()[3] != '-'],
+        'extra': extra,
     }
@@ -0,0 +1,312 @@
+# backend/analysis/engine_pool.py
+
+import os
+import queue
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import chess.engine
+
+from .metrics import (ENGINE_ACQUIRE_WAIT, ENGINE_SEARCH_TIMEOUTS, ENGINE_SPAWN_DURATION, ENGINE_SPAWNS,
+                      ENGINES_WAITING)
+from .resources import ResourceGovernor
+
+logger = logging.getLogger(__name__)
+
+# -------- CONFIG --------
+ENGINE_POOL_SIZE = int(os.getenv('ENGINE_POOL_SIZE', '2'))
+# Threads and hash of an idle engine; 0 sizes them from the governor's budget
+# (1 thread and 64 MB without a governor)
+ENGINE_THREADS = int(os.getenv('ENGINE_THREADS', '0'))
+ENGINE_HASH_MB = int(os.getenv('ENGINE_HASH_MB', '0'))
+ENGINE_ACQUIRE_TIMEOUT = float(os.getenv('ENGINE_ACQUIRE_TIMEOUT', '60'))
+# Depth of the search warm_up runs on each engine
+ENGINE_WARMUP_DEPTH = int(os.getenv('ENGINE_WARMUP_DEPTH', '10'))
+# Longest a single search may run beyond its own time limit before the
+# watchdog kills the engine
+ENGINE_SEARCH_TIMEOUT = float(os.getenv('ENGINE_SEARCH_TIMEOUT', '120'))
+
+
+class SearchWatchdog:
+    """Kills engines whose search runs past its time cap.
+
+    Depth-limited searches have no timeout in python-chess, so an engine that
+    hangs on one position would otherwise keep its caller, and its pool slot,
+    forever. Closing the engine makes the pending search raise
+    EngineTerminatedError; the pool then discards the engine on release and
+    respawns it. One daemon thread serves every guarded search.
+    """
+
+    def __init__(self, timeout: float = ENGINE_SEARCH_TIMEOUT):
+        self.timeout = timeout
+        self._deadlines: Dict[int, Tuple[float, chess.engine.SimpleEngine]] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._tokens = 0
+
+    @contextmanager
+    def guard(self, engine: chess.engine.SimpleEngine, limit: Optional[chess.engine.Limit] = None) -> Iterator[None]:
+        """Kill `engine` if the ``with`` block outlasts the timeout plus limit.time."""
+        cap = self.timeout + ((limit.time or 0) if limit is not None else 0)
+        with self._cond:
+            self._tokens += 1
+            token = self._tokens
+            self._deadlines[token] = (time.monotonic() + cap, engine)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="search-watchdog", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._deadlines.pop(token, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                expired = [token for token, (deadline, _) in self._deadlines.items() if deadline <= now]
+                engines = [self._deadlines.pop(token)[1] for token in expired]
+                if not engines:
+                    upcoming = min((deadline for deadline, _ in self._deadlines.values()), default=None)
+                    self._cond.wait(None if upcoming is None else upcoming - now)
+                    continue
+            for engine in engines:
+                logger.error(f"Engine search exceeded {self.timeout:.0f}s, killing the engine")
+                ENGINE_SEARCH_TIMEOUTS.inc()
+                try:
+                    engine.close()
+                except Exception as e:
+                    logger.debug(f"Failed to close hung engine: {e}")
+
+
+# Guards every engine search in this process
+SEARCH_WATCHDOG = SearchWatchdog()
+
+
+class EnginePool:
+    """A fixed-size pool of long-lived, pre-configured UCI engine processes.
+
+    Engines are spawned once (eagerly by ``start`` or lazily on first use) and
+    handed out with ``acquire``. Callers should pass a fresh ``game`` object to
+    ``engine.analyse`` so python-chess sends ``ucinewgame`` at the start of each
+    request. Engines that crash, raise engine errors or stop answering ``isready``
+    are killed on release and transparently respawned on the next ``acquire``.
+
+    With a ``governor``, the threads and hash asked of ``acquire`` are cut to
+    the shared resource budget, and every engine's hash is charged to it.
+    """
+
+    def __init__(self,
+                 path: Union[str, List[str]],
+                 size: int = ENGINE_POOL_SIZE,
+                 threads: int = ENGINE_THREADS,
+                 hash_mb: int = ENGINE_HASH_MB,
+                 acquire_timeout: float = ENGINE_ACQUIRE_TIMEOUT,
+                 governor: Optional[ResourceGovernor] = None):
+        self.path = path
+        self.size = max(1, int(size))
+        self.governor = governor
+        default_threads, default_hash = governor.engine_defaults(self.size) if governor else (1, 64)
+        self.threads = int(threads) or default_threads
+        self.hash_mb = int(hash_mb) or default_hash
+        self.acquire_timeout = acquire_timeout
+        # Each slot holds a live engine or None (spawn on next acquire)
+        self._slots: "queue.LifoQueue[Optional[chess.engine.SimpleEngine]]" = queue.LifoQueue()
+        for _ in range(self.size):
+            self._slots.put(None)
+        self._lock = threading.Lock()
+        self._engines: List[chess.engine.SimpleEngine] = []
+        # (Threads, Hash) each live engine is currently configured with, by id
+        self._sizes: Dict[int, Tuple[int, int]] = {}
+        self._closed = False
+        self.spawn_count = 0
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """UCI options every pooled engine is configured with."""
+        return {'Threads': self.threads, 'Hash': self.hash_mb}
+
+    def size_of(self, engine: chess.engine.SimpleEngine) -> Optional[Tuple[int, int]]:
+        """(Threads, Hash) a pooled engine is configured with; None if it is not one of ours."""
+        return self._sizes.get(id(engine))
+
+    @property
+    def running(self) -> int:
+        """Number of live engine processes."""
+        with self._lock:
+            return len(self._engines)
+
+    def start(self) -> None:
+        """Spawn and configure every engine up front so the first requests are warm."""
+        spawned = []
+        for _ in range(self.size):
+            engine = self._slots.get()
+            if engine is None:
+                try:
+                    engine = self._spawn()
+                except Exception as e:
+                    logger.error(f"Failed to pre-spawn engine: {e}")
+            spawned.append(engine)
+        for engine in spawned:
+            self._slots.put(engine)
+        logger.info(f"Engine pool started with {sum(e is not None for e in spawned)}/{self.size} engines")
+
+    def warm_up(self, depth: int = ENGINE_WARMUP_DEPTH, limit: Optional[int] = None) -> int:
+        """Spawn missing engines and run a short search on every idle one, or
+        on at most `limit` of them.
+
+        The search makes the engine load its network weights and allocate its
+        hash table now rather than during a request. Engines that fail their
+        health check are replaced; engines busy with an analysis are skipped.
+        Callers sharing the pool through a FairScheduler hold one slot per
+        engine they let this take.
+
+        Returns:
+            Number of engines that completed the warm-up search
+        """
+        if self._closed:
+            return 0
+        idle = []
+        while limit is None or len(idle) < limit:
+            try:
+                idle.append(self._slots.get_nowait())
+            except queue.Empty:
+                break
+
+        warm = 0
+        for engine in idle:
+            try:
+                if engine is not None and not self._is_alive(engine):
+                    self._discard(engine)
+                    engine = None
+                if engine is None:
+                    engine = self._spawn()
+                with SEARCH_WATCHDOG.guard(engine):
+                    engine.analyse(chess.Board(), chess.engine.Limit(depth=depth), game=object())
+                warm += 1
+            except Exception as e:
+                logger.error(f"Engine warm-up failed: {e}")
+                if engine is not None:
+                    self._discard(engine)
+                    engine = None
+            finally:
+                # Hand each engine back as soon as it is warm
+                self._slots.put(engine)
+        return warm
+
+    def _spawn(self) -> chess.engine.SimpleEngine:
+        start = time.perf_counter()
+        engine = chess.engine.SimpleEngine.popen_uci(self.path)
+        try:
+            engine.configure(self.config)
+        except Exception as e:
+            logger.warning(f"Some engine configuration failed: {e}")
+        ENGINE_SPAWN_DURATION.observe(time.perf_counter() - start)
+        ENGINE_SPAWNS.inc()
+        with self._lock:
+            self._engines.append(engine)
+            self._sizes[id(engine)] = (self.threads, self.hash_mb)
+            self.spawn_count += 1
+        if self.governor is not None:
+            self.governor.hold(id(engine), self.hash_mb)
+        return engine
+
+    def _resize(self, engine: chess.engine.SimpleEngine, threads: int, hash_mb: int) -> None:
+        # Changing Hash reallocates (and clears) the table, so only do it when the size changes
+        if self._sizes.get(id(engine)) == (threads, hash_mb):
+            return
+        try:
+            engine.configure({'Threads': threads, 'Hash': hash_mb})
+        except Exception as e:
+            logger.warning(f"Failed to resize engine: {e}")
+        self._sizes[id(engine)] = (threads, hash_mb)
+
+    def _discard(self, engine: chess.engine.SimpleEngine) -> None:
+        with self._lock:
+            if engine in self._engines:
+                self._engines.remove(engine)
+            self._sizes.pop(id(engine), None)
+        if self.governor is not None:
+            self.governor.forget(id(engine))
+        try:
+            engine.close()
+        except Exception as e:
+            logger.debug(f"Failed to close engine: {e}")
+
+    @staticmethod
+    def _is_alive(engine: chess.engine.SimpleEngine) -> bool:
+        try:
+            engine.ping()
+            return True
+        except Exception as e:
+            logger.warning(f"Engine failed health check, restarting: {e}")
+            return False
+
+    @contextmanager
+    def acquire(self,
+                timeout: Optional[float] = None,
+                threads: Optional[int] = None,
+                hash_mb: Optional[int] = None) -> Iterator[chess.engine.SimpleEngine]:
+        """Borrow an engine for the duration of the ``with`` block.
+
+        The engine is sized to ``threads`` and ``hash_mb`` (the pool defaults
+        if not given), within the governor's budget if the pool has one.
+        Without a governor and without either argument it is left as it is.
+
+        Raises:
+            TimeoutError: If no engine becomes free within ``timeout`` seconds
+            RuntimeError: If the pool has been closed
+        """
+        if self._closed:
+            raise RuntimeError("Engine pool is closed")
+        start = time.perf_counter()
+        try:
+            with ENGINES_WAITING.track_inprogress():
+                engine = self._slots.get(timeout=self.acquire_timeout if timeout is None else timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a free engine")
+        finally:
+            ENGINE_ACQUIRE_WAIT.observe(time.perf_counter() - start)
+
+        grant = None
+        try:
+            if engine is None:
+                engine = self._spawn()
+            if self.governor is not None:
+                grant = self.governor.reserve(id(engine), threads or self.threads, hash_mb or self.hash_mb)
+                self._resize(engine, grant.threads, grant.hash_mb)
+            elif threads or hash_mb:
+                self._resize(engine, int(threads or self.threads), int(hash_mb or self.hash_mb))
+            yield engine
+        finally:
+            if grant is not None:
+                self.governor.release(grant)
+            # Only healthy engines go back into the pool; anything else is respawned later
+            if engine is not None and (self._closed or not self._is_alive(engine)):
+                self._discard(engine)
+                engine = None
+            self._slots.put(engine)
+
+    def close(self) -> None:
+        """Shut down every engine owned by the pool."""
+        self._closed = True
+        with self._lock:
+            engines, self._engines = self._engines, []
+            self._sizes.clear()
+        if self.governor is not None:
+            for engine in engines:
+                self.governor.forget(id(engine))
+        for engine in engines:
+            try:
+                engine.quit()
+            except Exception as e:
+                logger.debug(f"Failed to cleanly close engine: {e}")
+                try:
+                    engine.close()
+                except Exception:
+                    pass
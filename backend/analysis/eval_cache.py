@@ -0,0 +1,114 @@
+# backend/analysis/eval_cache.py
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import chess
+import chess.engine
+import chess.polyglot
+
+# -------- CONFIG --------
+EVAL_CACHE_SIZE = int(os.getenv('EVAL_CACHE_SIZE', '200000'))
+# Upper bound on the estimated memory held by the cache, in MB
+EVAL_CACHE_MAX_MB = float(os.getenv('EVAL_CACHE_MAX_MB', '64'))
+# Estimated bytes per entry besides its move strings: key tuple, LRU node,
+# packed record tuple and the score/depth objects
+ENTRY_OVERHEAD_BYTES = 360
+
+# Record fields kept in the cache, in packed order; everything move assessment reads
+_FIELDS = ('score', 'depth', 'unstable')
+
+
+class EvalCache:
+    """Thread-safe LRU cache of normalised position evaluations.
+
+    Entries are keyed by the Zobrist hash of the position and the kind of search
+    limit ('depth' or 'time'). Each entry remembers the limit value and MultiPV
+    it was searched with, so a result searched deeper (or longer, or with more
+    lines) also satisfies requests for shallower searches. Note that the Zobrist
+    hash ignores move counters and repetition history.
+
+    Records are stored packed, with the PV and lines as one space-separated
+    string each, and the cache is bounded both by entry count and by an
+    estimate of the bytes its entries hold.
+    """
+
+    def __init__(self, max_entries: int = EVAL_CACHE_SIZE, max_mb: float = EVAL_CACHE_MAX_MB):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries: "OrderedDict[Tuple[int, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(board: chess.Board, limit: chess.engine.Limit) -> Tuple[Tuple[int, str], float]:
+        if limit.time is not None:
+            return (chess.polyglot.zobrist_hash(board), 'time'), float(limit.time)
+        return (chess.polyglot.zobrist_hash(board), 'depth'), float(limit.depth or 0)
+
+    @staticmethod
+    def _pack(record: Dict[str, Any]) -> Tuple[Tuple[Any, ...], int]:
+        """Compact form of a record and its estimated size in bytes."""
+        pv = ' '.join(record.get('pv') or ())
+        lines = ' '.join(record.get('lines') or ())
+        packed = tuple(record.get(field) for field in _FIELDS) + (pv, lines)
+        return packed, ENTRY_OVERHEAD_BYTES + sys.getsizeof(pv) + sys.getsizeof(lines)
+
+    @staticmethod
+    def _unpack(packed: Tuple[Any, ...], multipv: int) -> Dict[str, Any]:
+        record = dict(zip(_FIELDS, packed))
+        if record['unstable'] is None:
+            del record['unstable']
+        pv, lines = packed[len(_FIELDS):]
+        record['pv'] = pv.split() if pv else []
+        record['lines'] = lines.split()[:multipv] if lines else []
+        return record
+
+    def get(self, board: chess.Board, limit: chess.engine.Limit, multipv: int) -> Optional[Dict[str, Any]]:
+        """Return a cached evaluation at least as strong as requested, or None."""
+        key, strength = self._key(board, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['strength'] < strength or entry['multipv'] < multipv:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._unpack(entry['record'], multipv)
+
+    def put(self, board: chess.Board, limit: chess.engine.Limit, multipv: int, record: Dict[str, Any]) -> None:
+        """Store an evaluation unless a stronger one is already cached."""
+        if self.max_entries == 0:
+            return
+        key, strength = self._key(board, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['strength'] >= strength and entry['multipv'] >= multipv:
+                self._entries.move_to_end(key)
+                return
+            packed, size = self._pack(record)
+            if entry is not None:
+                self.bytes -= entry['size']
+            self._entries[key] = {'strength': strength, 'multipv': multipv, 'record': packed, 'size': size}
+            self._entries.move_to_end(key)
+            self.bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted['size']
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by every analysis in this process
+EVAL_CACHE = EvalCache()
@@ -0,0 +1,150 @@
+# backend/analysis/metrics.py
+
+import time
+from typing import Callable, Dict
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+
+# Exposition format for the /metrics endpoint
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# -------- Service --------
+SERVICE_READY = Gauge('chessgod_ready', '1 once engines are warm and common openings are cached')
+
+# -------- HTTP --------
+REQUEST_DURATION = Histogram(
+    'chessgod_http_request_duration_seconds',
+    'Time to serve an HTTP request, including a streamed body',
+    ['route', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+# -------- Analysis --------
+GAME_DURATION = Histogram(
+    'chessgod_analysis_game_duration_seconds',
+    'Wall time to analyze one game, including waiting for an engine',
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160),
+)
+PLY_DURATION = Histogram(
+    'chessgod_analysis_ply_duration_seconds',
+    'Time to evaluate and assess one ply',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ANALYSES_IN_FLIGHT = Gauge('chessgod_analyses_in_flight', 'Games currently being analyzed')
+ANALYSIS_QUEUE_DEPTH = Gauge('chessgod_analysis_queue_depth', 'Analysis jobs waiting for a scheduler slot')
+ANALYSIS_QUEUE_WAIT = Histogram(
+    'chessgod_analysis_queue_wait_seconds',
+    'Time an analysis job waited for a scheduler slot',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+ANALYSIS_REJECTED = Counter(
+    'chessgod_analysis_rejected',
+    'Analysis jobs turned away with a 429, by the limit they hit (client, global)',
+    ['limit'],
+)
+LIVE_SESSIONS = Gauge('chessgod_live_sessions', 'Open /live WebSocket sessions')
+LIVE_ENGINES = Gauge('chessgod_live_engines', 'Pooled engines currently attached to a /live session')
+FAST_PATHS = Counter(
+    'chessgod_analysis_fast_paths',
+    'Positions evaluated without an engine search (terminal, tablebase, forced)',
+    ['kind'],
+)
+
+# -------- Engine --------
+ENGINE_NPS = Histogram(
+    'chessgod_engine_nps',
+    'Nodes per second reported at the end of each engine search',
+    buckets=(1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2e6, 4e6, 8e6, 1.6e7),
+)
+ENGINE_NODES = Counter('chessgod_engine_nodes', 'Nodes searched by all engines')
+ENGINE_SPAWNS = Counter('chessgod_engine_spawns', 'Engine processes started')
+ENGINE_SPAWN_DURATION = Histogram(
+    'chessgod_engine_spawn_duration_seconds',
+    'Time to start and configure an engine process',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+ENGINE_ACQUIRE_WAIT = Histogram(
+    'chessgod_engine_acquire_wait_seconds',
+    'Time spent waiting for a free pooled engine',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60),
+)
+ENGINES_WAITING = Gauge('chessgod_engine_waiters', 'Callers waiting for a free pooled engine')
+ENGINE_SEARCH_TIMEOUTS = Counter('chessgod_engine_search_timeouts',
+                                 'Engines killed by the watchdog for a search that ran past its time cap')
+
+# -------- Resources --------
+RESOURCE_BUDGET = Gauge('chessgod_resource_budget', 'Engine resource budget, by resource (threads, hash_mb)',
+                        ['resource'])
+RESOURCE_USED = Gauge('chessgod_resource_used', 'Engine resources in use, by resource (threads, hash_mb)',
+                      ['resource'])
+RESOURCE_AVAILABLE = Gauge('chessgod_resource_available', 'Engine resources left in the budget, by resource',
+                           ['resource'])
+
+# -------- Upstream --------
+UPSTREAM_DURATION = Histogram(
+    'chessgod_upstream_request_duration_seconds',
+    'Latency of requests to Chess.com / Lichess',
+    ['host', 'status'],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15),
+)
+UPSTREAM_CACHE = Counter(
+    'chessgod_upstream_cache_lookups',
+    'Upstream document cache lookups by outcome (fresh, revalidated, miss)',
+    ['outcome'],
+)
+
+
+def render_metrics() -> bytes:
+    """Current metrics in the Prometheus text format."""
+    return generate_latest()
+
+
+def observe_search(info: Dict) -> None:
+    """Record the nodes and nps of a finished engine search."""
+    nps = info.get('nps')
+    if nps:
+        ENGINE_NPS.observe(nps)
+    nodes = info.get('nodes')
+    if nodes:
+        ENGINE_NODES.inc(nodes)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template.
+
+    Requests are labelled with the matched route path (e.g.
+    ``/games/{platform}/{username}``) rather than the raw URL to keep label
+    cardinality bounded. Timing stops after the last body chunk is sent, so
+    streamed NDJSON responses count their full duration.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    def _route(self, scope) -> str:
+        router = scope.get('router')
+        for route in getattr(router, 'routes', ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, 'path', 'unmatched')
+        return 'unmatched'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_DURATION.labels(self._route(scope), scope['method'], str(status['code'])).observe(
+                time.perf_counter() - start)
@@ -0,0 +1,202 @@
+# backend/analysis/resources.py
+
+import os
+import math
+import logging
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+from .metrics import RESOURCE_AVAILABLE, RESOURCE_BUDGET, RESOURCE_USED
+
+logger = logging.getLogger(__name__)
+
+# -------- CONFIG --------
+# Engine threads all analyses may use at once; 0 detects the CPUs available to the process
+RESOURCE_CPU_THREADS = int(os.getenv('RESOURCE_CPU_THREADS', '0'))
+# Hash table memory (MB) all engines may hold at once; 0 takes RESOURCE_MEMORY_SHARE
+# of the memory available to the process
+RESOURCE_HASH_MB = int(os.getenv('RESOURCE_HASH_MB', '0'))
+# Share of the process's memory given to engine hash tables; the rest is left for
+# Python, the engines' networks and the OS
+RESOURCE_MEMORY_SHARE = float(os.getenv('RESOURCE_MEMORY_SHARE', '0.5'))
+# Most any one request may ask for; 0 means the whole budget
+RESOURCE_MAX_THREADS = int(os.getenv('RESOURCE_MAX_THREADS', '0'))
+RESOURCE_MAX_HASH_MB = int(os.getenv('RESOURCE_MAX_HASH_MB', '0'))
+# Smallest hash table an engine is given, however busy the machine
+RESOURCE_MIN_HASH_MB = int(os.getenv('RESOURCE_MIN_HASH_MB', '16'))
+# Largest default hash per engine when it is sized from the budget
+RESOURCE_DEFAULT_HASH_CAP_MB = int(os.getenv('RESOURCE_DEFAULT_HASH_CAP_MB', '256'))
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def detect_cpus() -> int:
+    """CPUs this process may run on, honouring affinity and a cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    # cgroup v2 "quota period", else cgroup v1
+    quota = period = None
+    cpu_max = _read('/sys/fs/cgroup/cpu.max')
+    if cpu_max and not cpu_max.startswith('max'):
+        quota, period = (int(x) for x in cpu_max.split()[:2])
+    else:
+        v1_quota = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        v1_period = _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if v1_quota and v1_period and int(v1_quota) > 0:
+            quota, period = int(v1_quota), int(v1_period)
+    if quota and period:
+        cpus = min(cpus, max(1, math.ceil(quota / period)))
+    return max(1, cpus)
+
+
+def detect_memory_mb() -> Optional[int]:
+    """Memory this process may use (MB), honouring a cgroup limit; None if unknown."""
+    limits = []
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read(path)
+        if value and value.isdigit():
+            limits.append(int(value))
+    try:
+        limits.append(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES'))
+    except (AttributeError, OSError, ValueError):
+        pass
+    # Unlimited cgroups report a huge number, so the smallest limit is the real one
+    return min(limits) // (1024 * 1024) if limits else None
+
+
+class Grant:
+    """Threads and hash an engine was given for one analysis."""
+
+    def __init__(self, key: Hashable, threads: int, hash_mb: int):
+        self.key = key
+        self.threads = threads
+        self.hash_mb = hash_mb
+
+    def __repr__(self) -> str:
+        return f"Grant(threads={self.threads}, hash_mb={self.hash_mb})"
+
+
+class ResourceGovernor:
+    """Global CPU and memory budget shared by every engine.
+
+    Threads are charged while an engine is analyzing; hash memory is charged
+    for as long as an engine holds a table of that size, idle or not, since
+    the engine keeps it allocated. A request's threads and hash are first
+    clamped to the per-request caps (``clamp``), then cut down to what the
+    budget has left when its engine is handed out (``reserve``), so the more
+    engines are busy, the smaller each one's share. Every engine gets at least
+    one thread and RESOURCE_MIN_HASH_MB.
+    """
+
+    def __init__(self,
+                 cpu_threads: int = RESOURCE_CPU_THREADS,
+                 hash_mb: int = RESOURCE_HASH_MB,
+                 max_threads: int = RESOURCE_MAX_THREADS,
+                 max_hash_mb: int = RESOURCE_MAX_HASH_MB,
+                 min_hash_mb: int = RESOURCE_MIN_HASH_MB):
+        self.cpu_threads = int(cpu_threads) or detect_cpus()
+        if not hash_mb:
+            memory_mb = detect_memory_mb()
+            hash_mb = int(memory_mb * RESOURCE_MEMORY_SHARE) if memory_mb else 512
+        self.min_hash_mb = max(1, int(min_hash_mb))
+        self.hash_mb = max(self.min_hash_mb, int(hash_mb))
+        self.max_threads = min(int(max_threads) or self.cpu_threads, self.cpu_threads)
+        self.max_hash_mb = min(int(max_hash_mb) or self.hash_mb, self.hash_mb)
+        self._lock = threading.Lock()
+        # Threads of engines that are analyzing, and hash held by every live engine
+        self._threads: Dict[Hashable, int] = {}
+        self._hash: Dict[Hashable, int] = {}
+        RESOURCE_BUDGET.labels('threads').set(self.cpu_threads)
+        RESOURCE_BUDGET.labels('hash_mb').set(self.hash_mb)
+        self._publish()
+        logger.info(f"Resource budget: {self.cpu_threads} threads, {self.hash_mb} MB hash")
+
+    @property
+    def threads_used(self) -> int:
+        with self._lock:
+            return sum(self._threads.values())
+
+    @property
+    def hash_used_mb(self) -> int:
+        with self._lock:
+            return sum(self._hash.values())
+
+    def engine_defaults(self, engines: int) -> Tuple[int, int]:
+        """Threads and hash (MB) for each of `engines` idle pooled engines.
+
+        Idle engines split the CPUs and keep half the hash budget between
+        them, rounded down to a power of two, so busy ones can grow into the rest.
+        """
+        engines = max(1, int(engines))
+        threads = max(1, self.cpu_threads // engines)
+        share = min(RESOURCE_DEFAULT_HASH_CAP_MB, self.hash_mb // (2 * engines))
+        hash_mb = max(self.min_hash_mb, 2 ** int(math.log2(share)) if share >= 1 else 0)
+        return threads, hash_mb
+
+    def clamp(self, threads: Optional[int], hash_mb: Optional[int]) -> Tuple[int, int]:
+        """A request's threads and hash (MB), within the per-request caps."""
+        threads = max(1, min(int(threads or 1), self.max_threads))
+        hash_mb = max(self.min_hash_mb, min(int(hash_mb or self.min_hash_mb), self.max_hash_mb))
+        return threads, hash_mb
+
+    def hold(self, key: Hashable, hash_mb: int) -> None:
+        """Charge an engine's hash table, e.g. when it is spawned with the pool defaults."""
+        with self._lock:
+            self._hash[key] = int(hash_mb)
+        self._publish()
+
+    def reserve(self, key: Hashable, threads: Optional[int], hash_mb: Optional[int]) -> Grant:
+        """Give engine `key` up to the requested threads and hash for one analysis.
+
+        Whatever the engine already holds counts towards its new hash, so an
+        engine that keeps its size costs nothing extra. A thread is kept back
+        for every other idle engine, so the next one to start is not squeezed out.
+        """
+        threads, hash_mb = self.clamp(threads, hash_mb)
+        with self._lock:
+            idle = sum(1 for k in self._hash if k != key and k not in self._threads)
+            free_threads = self.cpu_threads - sum(t for k, t in self._threads.items() if k != key) - idle
+            free_hash = self.hash_mb - sum(h for k, h in self._hash.items() if k != key)
+            grant = Grant(key, max(1, min(threads, free_threads)), max(self.min_hash_mb, min(hash_mb, free_hash)))
+            self._threads[key] = grant.threads
+            self._hash[key] = grant.hash_mb
+        self._publish()
+        return grant
+
+    def release(self, grant: Grant) -> None:
+        """The engine finished its analysis; its threads are free, its hash stays held."""
+        with self._lock:
+            self._threads.pop(grant.key, None)
+        self._publish()
+
+    def forget(self, key: Hashable) -> None:
+        """The engine is gone; nothing it held is charged any more."""
+        with self._lock:
+            self._threads.pop(key, None)
+            self._hash.pop(key, None)
+        self._publish()
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            threads, hash_mb = sum(self._threads.values()), sum(self._hash.values())
+        return {
+            "threads_budget": self.cpu_threads,
+            "threads_used": threads,
+            "hash_budget_mb": self.hash_mb,
+            "hash_used_mb": hash_mb,
+        }
+
+    def _publish(self) -> None:
+        status = self.status()
+        RESOURCE_USED.labels('threads').set(status["threads_used"])
+        RESOURCE_USED.labels('hash_mb').set(status["hash_used_mb"])
+        RESOURCE_AVAILABLE.labels('threads').set(max(0, self.cpu_threads - status["threads_used"]))
+        RESOURCE_AVAILABLE.labels('hash_mb').set(max(0, self.hash_mb - status["hash_used_mb"]))
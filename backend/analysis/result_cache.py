@@ -0,0 +1,141 @@
+# backend/analysis/result_cache.py
+
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import chess.pgn
+
+logger = logging.getLogger(__name__)
+
+# -------- CONFIG --------
+RESULT_CACHE_DIR = os.getenv(
+    'RESULT_CACHE_DIR',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".cache", "results")))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', str(7 * 24 * 3600)))
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '2000'))
+
+# analyze_game arguments that change the analysis a client gets back
+KEY_PARAMS = ('depth', 'multipv', 'use_time', 'time_limit', 'syzygy_path', 'adaptive', 'sweep_depth',
+              'telemetry', 'deadline')
+
+
+def result_key(pgn_text: str, params: Dict[str, Any]) -> Optional[str]:
+    """Content hash of a game's moves plus the analysis parameters.
+
+    Only the starting position and the mainline moves are hashed, so the same
+    game with different PGN headers, comments or move-number formatting maps to
+    the same key. Returns None if the PGN cannot be parsed.
+    """
+    try:
+        game = chess.pgn.read_game(io.StringIO(pgn_text))
+    except Exception:
+        return None
+    if game is None:
+        return None
+    payload = {
+        'fen': game.board().fen(),
+        'moves': [move.uci() for move in game.mainline_moves()],
+        'params': {k: params.get(k) for k in KEY_PARAMS},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Disk-backed cache of complete analyze_game results.
+
+    Each entry is one JSON file named after its key, holding the result and its
+    ETag (a hash of the result). An in-memory index tracks recency and expiry;
+    entries expire `ttl` seconds after they were written and the least recently
+    used ones are evicted beyond `max_entries`. The index is rebuilt from the
+    directory on startup, so results survive restarts.
+    """
+
+    def __init__(self,
+                 directory: str = RESULT_CACHE_DIR,
+                 ttl: float = RESULT_CACHE_TTL,
+                 max_entries: int = RESULT_CACHE_SIZE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self._index: "OrderedDict[str, float]" = OrderedDict()  # key -> expiry time
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    path = os.path.join(self.directory, name)
+                    entries.append((os.path.getmtime(path), name[:-len('.json')]))
+        except OSError as e:
+            logger.warning(f"Result cache directory unavailable: {e}")
+            return
+        for mtime, key in sorted(entries):
+            self._index[key] = mtime + self.ttl
+        self._evict()
+        logger.info(f"Result cache loaded {len(self._index)} entries from {self.directory}")
+
+    def _remove(self, key: str) -> None:
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        now = time.time()
+        for key in [k for k, expires in self._index.items() if expires <= now]:
+            self._remove(key)
+        while len(self._index) > self.max_entries:
+            self._remove(next(iter(self._index)))
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Return (result, etag) for a live entry, or None."""
+        with self._lock:
+            expires = self._index.get(key)
+            if expires is None:
+                return None
+            if expires <= time.time():
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry['result'], entry['etag']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Dropping unreadable result cache entry {key}: {e}")
+            with self._lock:
+                self._remove(key)
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> str:
+        """Store a result and return its ETag."""
+        body = json.dumps(result, sort_keys=True)
+        etag = hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'etag': etag, 'result': result}))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to persist result cache entry {key}: {e}")
+            return etag
+        with self._lock:
+            self._index[key] = time.time() + self.ttl
+            self._index.move_to_end(key)
+            self._evict()
+        return etag
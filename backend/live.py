@@ -0,0 +1,303 @@
+import os
+import json
+import asyncio
+import logging
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import quote
+
+import chess
+import chess.engine
+import httpx
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from analysis.analyzer import LiveAnalysis
+from analysis.engine_pool import EnginePool
+from analysis.metrics import LIVE_ENGINES, LIVE_SESSIONS
+from scheduler import FairScheduler, QueueFull, Ticket
+from upstream import iter_ndjson, LICHESS_API_BASE
+
+logger = logging.getLogger(__name__)
+
+# -------- CONFIG --------
+# Seconds without a move after which a session gives its engine back to the pool
+LIVE_IDLE_RELEASE = float(os.getenv('LIVE_IDLE_RELEASE', '20'))
+# Concurrent sessions; further connections are closed with 1013 (try again later)
+LIVE_MAX_SESSIONS = int(os.getenv('LIVE_MAX_SESSIONS', '8'))
+# Game event stream tailed for {"type": "follow"}; Lichess-shaped NDJSON
+LIVE_STREAM_URL = os.getenv('LIVE_STREAM_URL', f'{LICHESS_API_BASE}/api/stream/game/{{game_id}}')
+# Seconds between 'queued' events while a session waits for an engine
+LIVE_QUEUE_UPDATE = float(os.getenv('LIVE_QUEUE_UPDATE', '2'))
+
+# Messages that may need the session's engine
+ENGINE_MESSAGES = ('start', 'move', 'moves', 'position')
+
+
+def _stream_message(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Translate one line of a game event stream into a session message.
+
+    Understands full move lists (Lichess board API 'gameFull' / 'gameState':
+    'moves' as space-separated UCI), single moves ('lm' with the resulting
+    'fen', as /api/stream/game sends them) and bare positions (the first line
+    of /api/stream/game, whose history is not part of the stream).
+    """
+    state = item.get('state') if isinstance(item.get('state'), dict) else item
+    if isinstance(state.get('moves'), str):
+        fen = item.get('initialFen')
+        return {'type': 'moves', 'moves': state['moves'].split(),
+                'fen': None if fen in (None, 'startpos') else fen}
+    if item.get('lm'):
+        return {'type': 'move', 'uci': item['lm'], 'fen': item.get('fen')}
+    if item.get('fen'):
+        return {'type': 'position', 'fen': item['fen']}
+    return None
+
+
+class LiveSession:
+    """One /live WebSocket connection following one game in progress.
+
+    Messages from the client (JSON):
+        {"type": "start", "fen": ..., "options": {...}}  start over; both optional,
+                                                         options as for /analyze
+        {"type": "move", "uci": "e2e4"}                  the next move
+        {"type": "moves", "moves": ["e2e4", ...]}        the whole move list so far;
+                                                         takebacks are detected
+        {"type": "follow", "game_id": ...}               tail the game on LIVE_STREAM_URL
+
+    Messages to the client are LiveAnalysis's 'start', 'ply' and 'takeback'
+    events, 'end' when a followed stream closes, 'queued' while waiting for an
+    engine and 'error' for a message that could not be handled; the session
+    stays open after an error.
+
+    A pooled engine is borrowed for the first search and stays attached while
+    moves keep coming, so each move is answered after one search. After
+    LIVE_IDLE_RELEASE seconds without a message it goes back to the pool and
+    another one is borrowed on the next move. The engine is only borrowed
+    once the scheduler has given the session a slot, which it keeps for as
+    long as it holds the engine.
+    """
+
+    active = 0
+
+    def __init__(self,
+                 websocket: WebSocket,
+                 engine_pool: EnginePool,
+                 make_analysis: Callable[[str, Dict[str, Any]], LiveAnalysis],
+                 client: httpx.AsyncClient,
+                 scheduler: FairScheduler,
+                 client_key: str):
+        """
+        Args:
+            websocket: The connection, not yet accepted
+            engine_pool: Pool the session borrows its engine from
+            make_analysis: Builds a LiveAnalysis from a starting FEN and the
+                client's options
+            client: Client used to tail followed games
+            scheduler: Scheduler the session queues on before borrowing an engine
+            client_key: Key the session is queued under
+        """
+        self.websocket = websocket
+        self.engine_pool = engine_pool
+        self.make_analysis = make_analysis
+        self.client = client
+        self.scheduler = scheduler
+        self.client_key = client_key
+        self._ticket: Optional[Ticket] = None
+        self._closed = False
+        self.options: Dict[str, Any] = {}
+        self.analysis: Optional[LiveAnalysis] = None
+        self.engine: Optional[chess.engine.SimpleEngine] = None
+        self._engine_stack: Optional[ExitStack] = None
+        # Client messages and followed stream events, in arrival order; None ends the session
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._follow_task: Optional[asyncio.Future] = None
+
+    async def run(self) -> None:
+        """Serve the connection until the client disconnects."""
+        await self.websocket.accept()
+        if LiveSession.active >= LIVE_MAX_SESSIONS:
+            await self.websocket.close(code=1013)
+            return
+
+        LiveSession.active += 1
+        LIVE_SESSIONS.inc()
+        loop = asyncio.get_event_loop()
+        reader = asyncio.ensure_future(self._read())
+        try:
+            while True:
+                try:
+                    # Only time out while an engine is held
+                    message = await asyncio.wait_for(self._inbox.get(),
+                                                     LIVE_IDLE_RELEASE if self._engine_stack else None)
+                except asyncio.TimeoutError:
+                    await self._give_back(loop)
+                    continue
+                if message is None:
+                    break
+                if message.get('type') == 'follow':
+                    self._follow(message.get('game_id'))
+                    continue
+                if message.get('type') in ENGINE_MESSAGES and not await self._take_slot():
+                    continue
+
+                # Engine work runs off the event loop; events are sent as they are produced
+                events = self._handle(message)
+                while True:
+                    try:
+                        event = await loop.run_in_executor(None, next, events, None)
+                    except Exception as e:
+                        event = {'type': 'error', 'error': str(e)}
+                        events = iter(())
+                    if event is None:
+                        break
+                    await self.websocket.send_json(event)
+                if self._engine_stack is None:
+                    # The message needed no engine after all
+                    self._free_slot()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            reader.cancel()
+            if self._follow_task is not None:
+                self._follow_task.cancel()
+            await self._give_back(loop)
+            LiveSession.active -= 1
+            LIVE_SESSIONS.dec()
+
+    async def _read(self) -> None:
+        try:
+            while True:
+                text = await self.websocket.receive_text()
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    message = {'type': 'invalid'}
+                await self._inbox.put(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._closed = True
+            await self._inbox.put(None)
+
+    async def _take_slot(self) -> bool:
+        """Hold a scheduler slot before an engine is borrowed; False if none was given."""
+        if self._ticket is not None:
+            return True
+        try:
+            # The slot is held until the engine goes back, at least LIVE_IDLE_RELEASE
+            ticket = self.scheduler.submit(self.client_key, 1, hold=LIVE_IDLE_RELEASE)
+        except QueueFull as e:
+            await self.websocket.send_json({'type': 'error', 'error': str(e), 'retry_after': int(e.retry_after)})
+            return False
+        self._ticket = ticket
+        while ticket.started is None:
+            if self._closed:
+                self._free_slot()
+                return False
+            await self.websocket.send_json({'type': 'queued', **self.scheduler.position(ticket)})
+            await self.scheduler.wait(ticket, LIVE_QUEUE_UPDATE)
+        return True
+
+    def _free_slot(self) -> None:
+        if self._ticket is not None:
+            ticket, self._ticket = self._ticket, None
+            self.scheduler.release(ticket)
+
+    async def _give_back(self, loop) -> None:
+        """Return the engine to the pool, then its scheduler slot."""
+        await loop.run_in_executor(None, self._release)
+        self._free_slot()
+
+    def _follow(self, game_id: Any) -> None:
+        if self._follow_task is not None:
+            self._follow_task.cancel()
+        if not isinstance(game_id, str) or not game_id:
+            self._inbox.put_nowait({'type': 'invalid'})
+            return
+        self._follow_task = asyncio.ensure_future(self._tail(LIVE_STREAM_URL.format(game_id=quote(game_id, safe=''))))
+
+    async def _tail(self, url: str) -> None:
+        reason = 'finished'
+        try:
+            # The stream stays open for the whole game, with long gaps between moves
+            async for item in iter_ndjson(self.client, url, timeout=httpx.Timeout(None, connect=5.0)):
+                message = _stream_message(item) if isinstance(item, dict) else None
+                if message is not None:
+                    await self._inbox.put(message)
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Following {url} failed: {e}")
+            reason = f"Stream failed: {e}"
+        await self._inbox.put({'type': 'end', 'reason': reason})
+
+    def _handle(self, message: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Events answering one message; runs on a worker thread."""
+        kind = message.get('type')
+        if kind == 'start' or self.analysis is None:
+            if kind == 'start':
+                self.options = message.get('options') or {}
+            # A 'move' message's fen is the position after the move
+            fen = message.get('fen') if kind in ('start', 'moves', 'position') else None
+            analysis = self.make_analysis(fen or chess.STARTING_FEN, self.options)
+            if self.engine is not None:
+                # Keeps the size the engine was given when the session borrowed it
+                analysis.attach(self.engine, sized=True)
+            self.analysis = analysis
+            yield analysis.reset(analysis.board.fen())
+            if kind == 'start':
+                # Search the starting position now, so the first move costs one search too
+                self._attach()
+                self.analysis.evaluate_current()
+                return
+
+        if kind == 'move':
+            move = chess.Move.from_uci(str(message.get('uci')))
+            if message.get('fen') and not self.analysis.board.is_legal(move):
+                # Part of a followed game was missed: pick it up from where it is now
+                yield from self._resync(message['fen'])
+                return
+            self._attach()
+            yield self.analysis.push(move)
+        elif kind == 'moves':
+            moves = [chess.Move.from_uci(str(uci)) for uci in message.get('moves') or []]
+            fen = message.get('fen') or chess.STARTING_FEN
+            if chess.Board(fen).fen() != self.analysis.board.root().fen():
+                yield self.analysis.reset(fen)
+            self._attach()
+            yield from self.analysis.sync(moves)
+        elif kind == 'position':
+            if message['fen'].split()[0] != self.analysis.board.board_fen():
+                yield from self._resync(message['fen'])
+        elif kind == 'end':
+            yield {'type': 'end', 'reason': message.get('reason')}
+        elif kind == 'invalid':
+            raise ValueError("Messages must be JSON objects; follow needs a game_id")
+        elif kind != 'start':
+            raise ValueError(f"Unsupported message type: {kind!r}")
+
+    def _resync(self, fen: str) -> Iterator[Dict[str, Any]]:
+        yield self.analysis.reset(fen)
+        self._attach()
+        self.analysis.evaluate_current()
+
+    def _attach(self) -> None:
+        if self.engine is None:
+            stack = ExitStack()
+            self.engine = stack.enter_context(
+                self.engine_pool.acquire(threads=self.analysis.threads, hash_mb=self.analysis.hash_mb))
+            self._engine_stack = stack
+            LIVE_ENGINES.inc()
+        if not self.analysis.attached:
+            self.analysis.attach(self.engine, sized=True)
+
+    def _release(self) -> None:
+        if self._engine_stack is None:
+            return
+        if self.analysis is not None:
+            self.analysis.detach()
+        stack, self._engine_stack, self.engine = self._engine_stack, None, None
+        # Returns the engine to the pool (or discards it if it died)
+        stack.close()
+        LIVE_ENGINES.dec()
+        logger.debug("Live session released its engine")
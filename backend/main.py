@@ -1,20 +1,87 @@
-from fastapi import FastAPI, UploadFile, Form, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, Form, Request, HTTPException, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from analysis.analyzer import analyze_game
+from fastapi.requests import HTTPConnection
+from analysis.analyzer import (analyze_game, iter_analysis, collect_result, replay_result, compact_result,
+                               split_pgn_games, LiveAnalysis, STOCKFISH_PATH, SYZYGY_PATH)
+from analysis.engine_pool import EnginePool, ENGINE_POOL_SIZE
+from analysis.resources import ResourceGovernor
+from analysis.result_cache import ResultCache, result_key
+from analysis.metrics import ANALYSIS_QUEUE_DEPTH, METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
 import chess.pgn
 import io
 import os
-import httpx
 import json
-from keep_alive import start_keep_alive
+import math
+import asyncio
+import functools
+import hashlib
+import gzip
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from warmup import Warmup, WARMUP_CLIENT
+from scheduler import FairScheduler, QueueFull, estimate_plies
+from live import LiveSession
+from upstream import (create_client, UpstreamCache, fetch_archives, stream_ndjson,
+                      CHESSCOM_API_BASE, LICHESS_API_BASE, ARCHIVE_LIST_TTL)
 from pathlib import Path
 
 app = FastAPI(title="ChessGod API", version="1.1.0")
 
+# Number of games analyzed concurrently; analysis runs on worker threads so the
+# event loop stays free for light endpoints while Stockfish does the heavy lifting
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', str(ENGINE_POOL_SIZE)))
+# Upper bound on the number of games accepted by one /analyze/batch request
+MAX_BATCH_GAMES = int(os.getenv('MAX_BATCH_GAMES', '50'))
+# JSON responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv('GZIP_MIN_BYTES', '1024'))
+# Media type a client sends in Accept to get the columnar /analyze encoding
+COMPACT_MEDIA_TYPE = "application/vnd.chessgod.compact+json"
+# Seconds between 'queued' events while a streamed analysis waits for a slot
+QUEUE_UPDATE_SECONDS = float(os.getenv('QUEUE_UPDATE_SECONDS', '2'))
+
 @app.on_event("startup")
 async def startup_event():
-    start_keep_alive()
+    # CPU and hash budget every engine's threads and hash table come out of
+    app.state.governor = ResourceGovernor()
+    # Long-lived Stockfish processes shared by all /analyze requests; spawned
+    # and primed by the warm-up task below
+    app.state.engine_pool = EnginePool(STOCKFISH_PATH, governor=app.state.governor)
+    app.state.analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+    # Admission control in front of the executor: one slot per worker, handed
+    # out fairly across clients
+    app.state.scheduler = FairScheduler(ANALYSIS_WORKERS)
+    # Loop the scheduler lives on, for jobs submitted from worker threads
+    app.state.loop = asyncio.get_event_loop()
+    # Sampled at scrape time; jobs admitted but still waiting for a slot
+    ANALYSIS_QUEUE_DEPTH.set_function(lambda: app.state.scheduler.queued)
+    # Complete results of previously analyzed games, persisted on local disk
+    app.state.result_cache = ResultCache()
+    # One pooled keep-alive client and document cache for Chess.com/Lichess
+    app.state.http_client = create_client()
+    app.state.upstream_cache = UpstreamCache()
+    # Warm engines and opening evaluations in the background; /ready reports progress
+    app.state.warmup = Warmup(app.state.engine_pool, _preload_opening, app.state.http_client,
+                              app.state.scheduler)
+    app.state.warmup_task = asyncio.ensure_future(app.state.warmup.run())
+
+def _preload_opening(pgn: str) -> dict:
+    """Analyze an opening line for the warm-up; runs on a worker thread.
+
+    It is queued on the scheduler like any request, so warming the cache never
+    takes an engine that an admitted job is counting on.
+    """
+    kwargs = _analysis_kwargs({})
+    job = functools.partial(analyze_game, pgn, **kwargs)
+    return asyncio.run_coroutine_threadsafe(
+        _run_scheduled(WARMUP_CLIENT, _job_cost(pgn, kwargs), kwargs["deadline"], job), app.state.loop).result()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.warmup_task.cancel()
+    await app.state.http_client.aclose()
+    app.state.analysis_executor.shutdown(wait=False)
+    app.state.engine_pool.close()
 
 # Allow requests from the extension and localhost development
 app.add_middleware(
@@ -31,6 +98,8 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
     expose_headers=["*"]  # Expose all headers to the client
 )
+# Per-route request latency for /metrics
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 def root():
@@ -41,42 +110,50 @@ def health_check():
     """Health check endpoint for the backend"""
     return {"status": "healthy", "stockfish": os.path.exists(Path(__file__).parent / "stockfish" / "stockfish")}
 
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once engines are warm and common openings are cached, 503 until then"""
+    status = app.state.warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: request latency, analysis, engine and upstream instrumentation"""
+    return Response(content=render_metrics(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+@app.get("/queue")
+def queue_status(request: Request):
+    """Analysis load, and the queue positions and estimated waits of the caller's jobs"""
+    return {**app.state.scheduler.status(_client_key(request)), "resources": app.state.governor.status()}
+
 @app.get("/games/{platform}/{username}")
 async def get_games(platform: str, username: str, limit: int = 10):
     """Fetch recent games for a user from Chess.com or Lichess"""
+    client = app.state.http_client
     try:
         if platform.lower() == "chess.com":
-            # Chess.com API endpoint
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"https://api.chess.com/pub/player/{username}/games/archives")
-                if response.status_code != 200:
-                    raise HTTPException(status_code=404, detail=f"User {username} not found on Chess.com")
-                
-                archives = response.json()["archives"]
-                games = []
-                # Get most recent archive
-                if archives:
-                    recent_archive = archives[-1]
-                    archive_response = await client.get(recent_archive)
-                    if archive_response.status_code == 200:
-                        games = archive_response.json()["games"][-limit:]
-                
-                return {"games": games}
-                
+            # Chess.com API endpoint; archive list and archives are cached and revalidated
+            cache = app.state.upstream_cache
+            status, data = await cache.get_json(
+                client, f"{CHESSCOM_API_BASE}/pub/player/{username}/games/archives", ARCHIVE_LIST_TTL)
+            if status != 200:
+                raise HTTPException(status_code=404, detail=f"User {username} not found on Chess.com")
+
+            # Walk back through as many months as the limit needs
+            games = await fetch_archives(client, cache, data["archives"], limit)
+            return {"games": games}
+
         elif platform.lower() == "lichess":
-            # Lichess API endpoint
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://lichess.org/api/games/user/{username}",
-                    params={"max": limit, "pgnInJson": "true"},
-                    headers={"Accept": "application/x-ndjson"}
-                )
-                if response.status_code != 200:
-                    raise HTTPException(status_code=404, detail=f"User {username} not found on Lichess")
-                
-                # Parse ndjson response
-                games = [json.loads(line) for line in response.text.strip().split("\n")]
-                return {"games": games}
+            # Lichess API endpoint; NDJSON is parsed line by line as it arrives
+            status, games = await stream_ndjson(
+                client,
+                f"{LICHESS_API_BASE}/api/games/user/{username}",
+                params={"max": limit, "pgnInJson": "true"},
+                headers={"Accept": "application/x-ndjson"}
+            )
+            if status != 200:
+                raise HTTPException(status_code=404, detail=f"User {username} not found on Lichess")
+            return {"games": games}
         
         else:
             raise HTTPException(status_code=400, detail="Platform must be 'chess.com' or 'lichess'")
@@ -86,6 +163,226 @@ async def get_games(platform: str, username: str, limit: int = 10):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch games: {str(e)}")
 
+class OptionError(ValueError):
+    """An analysis option the client sent cannot be used; answered with a 400."""
+
+def _deadline_option(options: dict):
+    """options.deadline as a positive number of seconds, or None if not given."""
+    deadline = options.get("deadline")
+    if deadline is None:
+        return None
+    try:
+        deadline = float(deadline)
+    except (TypeError, ValueError):
+        raise OptionError("options.deadline must be a number of seconds")
+    if not math.isfinite(deadline) or deadline <= 0:
+        raise OptionError("options.deadline must be a positive number of seconds")
+    return deadline
+
+def _analysis_kwargs(options: dict) -> dict:
+    """Map the client's analysis options onto analyze_game keyword arguments.
+
+    Threads and hash are clamped to the per-request caps here; the engine pool
+    cuts them further to what the resource budget has left when the game runs.
+
+    Raises:
+        OptionError: If an option has an unusable value
+    """
+    pool = app.state.engine_pool
+    threads, hash_mb = app.state.governor.clamp(options.get("threads", pool.threads), options.get("hash", pool.hash_mb))
+    return {
+        "depth": max(5, min(25, options.get("depth", 18))),  # Default depth 18, clamped 5-25
+        "multipv": options.get("multipv", 3),  # Default to 3 lines
+        "threads": threads,
+        "hash_mb": hash_mb,
+        "adaptive": bool(options.get("adaptive", False)),
+        "sweep_depth": options.get("sweep_depth"),
+        "syzygy_path": SYZYGY_PATH,
+        "telemetry": bool(options.get("telemetry", False)),
+        "deadline": _deadline_option(options),
+        "engine_pool": app.state.engine_pool,
+    }
+
+def _live_analysis(fen: str, options: dict) -> LiveAnalysis:
+    """A LiveAnalysis with the client's options, for /live sessions."""
+    kwargs = _analysis_kwargs(options)
+    return LiveAnalysis(fen, **{k: kwargs[k] for k in ("depth", "multipv", "threads", "hash_mb", "syzygy_path")})
+
+def _client_key(request: HTTPConnection) -> str:
+    """Key a caller's jobs are queued under: its X-Client-Id header, else its address."""
+    client_id = request.headers.get("x-client-id", "").strip()
+    if client_id:
+        return "id:" + client_id[:64]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+def _job_cost(pgn: str, kwargs: dict) -> float:
+    """Scheduler cost of analyzing `pgn` with analyze_game `kwargs`."""
+    return FairScheduler.cost(estimate_plies(pgn), kwargs["depth"], kwargs["multipv"])
+
+def _busy_response(error: QueueFull) -> JSONResponse:
+    """429 for a job the scheduler turned away."""
+    retry_after = int(error.retry_after)
+    return JSONResponse(status_code=429, headers={"Retry-After": str(retry_after)},
+                        content={"error": str(error), "retry_after": retry_after,
+                                 "queue": app.state.scheduler.status()})
+
+def _player_names(pgn: str):
+    """Try to extract player names from PGN tags"""
+    try:
+        game = chess.pgn.read_game(io.StringIO(pgn))
+        white = game.headers.get('White', '') if game else ''
+        black = game.headers.get('Black', '') if game else ''
+    except Exception:
+        white = ''
+        black = ''
+    return white, black
+
+def _response_etag(result_etag, extra: dict):
+    """ETag of a response: the cached result's ETag plus the per-request fields."""
+    if not result_etag:
+        return None
+    payload = json.dumps([result_etag, extra], sort_keys=True).encode("utf-8")
+    return '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+
+def _etag_matches(request: Request, etag) -> bool:
+    if not etag:
+        return False
+    candidates = request.headers.get("if-none-match", "").split(",")
+    return any(c.strip().replace("W/", "", 1) == etag for c in candidates)
+
+def _wants_compact(request: Request, options: dict) -> bool:
+    """True if the client asked for the compact encoding, via Accept or options.format."""
+    return COMPACT_MEDIA_TYPE in request.headers.get("accept", "") or options.get("format") == "compact"
+
+def _json_response(request: Request, content, headers=None, media_type: str = "application/json") -> Response:
+    """Serialize `content` as JSON, gzipped when the client accepts it and it is worth it.
+
+    Streaming endpoints are left alone: gzip would hold back NDJSON lines until
+    the compressor flushes.
+    """
+    body = json.dumps(content, separators=(",", ":")).encode("utf-8")
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept, Accept-Encoding"
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def _previous_result(body: dict):
+    """An earlier result to re-analyze incrementally from: the stored result
+    the body's 'previous_id' names.
+
+    Only results this server produced are used. Their evaluations are trusted
+    and end up in the shared result cache, so a client-supplied result could
+    plant made-up evaluations for every later request of the same game.
+    """
+    previous_id = body.get("previous_id")
+    if not isinstance(previous_id, str) or not previous_id:
+        return None
+    loop = asyncio.get_event_loop()
+    cached = await loop.run_in_executor(None, app.state.result_cache.get, previous_id)
+    return cached[0] if cached else None
+
+async def _analyze_cached(pgn: str, kwargs: dict, client: str, previous=None):
+    """Analyze a game through the whole-game result cache.
+
+    Returns (result, result_etag); the etag is None when the PGN could not be
+    keyed. Cache file I/O runs on the default executor so hits never wait
+    behind analyses queued on the analysis executor. A `previous` result is
+    only used on a cache miss, to skip positions it already evaluated.
+
+    Misses wait for a scheduler slot under `client`.
+
+    Raises:
+        QueueFull: If the scheduler does not admit the job
+    """
+    loop = asyncio.get_event_loop()
+    key = result_key(pgn, kwargs)
+    cached = await loop.run_in_executor(None, app.state.result_cache.get, key) if key else None
+    if cached:
+        return cached
+
+    result = await _run_scheduled(client, _job_cost(pgn, kwargs), kwargs["deadline"],
+                                  functools.partial(analyze_game, pgn, **kwargs, previous=previous))
+    result_etag = await loop.run_in_executor(None, app.state.result_cache.put, key, result) if key else None
+    return result, result_etag
+
+async def _run_scheduled(client: str, cost: float, deadline, job):
+    """Run blocking `job` on the analysis executor once the scheduler gives
+    `client` a slot, and return its result.
+
+    The slot is held until the worker thread has finished, even if the caller
+    is cancelled first, so the scheduler never counts an engine as free while
+    a search is still running on it.
+
+    Raises:
+        QueueFull: If the scheduler does not admit the job
+    """
+    loop = asyncio.get_event_loop()
+    scheduler = app.state.scheduler
+    ticket = scheduler.submit(client, cost, deadline)
+    try:
+        await scheduler.wait(ticket)
+        # Run analysis on the worker pool so the event loop is never blocked
+        future = loop.run_in_executor(app.state.analysis_executor, job)
+    except BaseException:
+        scheduler.release(ticket)
+        raise
+    future.add_done_callback(lambda _: scheduler.release(ticket))
+    return await asyncio.shield(future)
+
+async def _relay_from_executor(make_events, client: str, cost: float, deadline=None):
+    """Run a blocking event generator on the analysis executor and relay its
+    events as NDJSON lines as soon as they are produced.
+
+    The job is queued on the scheduler under `client` once the response
+    starts, so a client that is gone before then never holds a slot. Until it
+    gets one, a 'queued' event with its queue position and estimated wait is
+    sent every QUEUE_UPDATE_SECONDS. The slot is released when the generator
+    finishes.
+    """
+    loop = asyncio.get_event_loop()
+    scheduler = app.state.scheduler
+    try:
+        ticket = scheduler.submit(client, cost, deadline)
+    except QueueFull as e:
+        yield json.dumps({"type": "error", "error": str(e), "retry_after": int(e.retry_after)}) + "\n"
+        return
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for event in make_events():
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+                if cancelled.is_set():
+                    # Client went away; closing the generator returns its engine
+                    break
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "error": f"Analysis failed: {str(e)}"})
+        finally:
+            loop.call_soon_threadsafe(scheduler.release, ticket)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    producing = False
+    try:
+        while ticket.started is None:
+            yield json.dumps({"type": "queued", **scheduler.position(ticket)}) + "\n"
+            await scheduler.wait(ticket, QUEUE_UPDATE_SECONDS)
+        loop.run_in_executor(app.state.analysis_executor, produce)
+        producing = True
+        while True:
+            event = await queue.get()
+            if event is done:
+                break
+            yield json.dumps(event) + "\n"
+    finally:
+        cancelled.set()
+        if not producing:
+            # Client went away while queued
+            scheduler.release(ticket)
+
 @app.post("/analyze")
 async def analyze(request: Request):
     """Analyze a chess game with Stockfish.
@@ -97,9 +394,34 @@ async def analyze(request: Request):
     - options: dict (Optional)
         - depth: int
         - multipv: int
-        - threads: int
-        - hash: int
-        - use_nnue: bool
+        - threads: int (capped by the resource budget; see ResourceGovernor)
+        - hash: int (MB, capped the same way)
+        - adaptive: bool (shallow sweep, then full depth only on critical plies)
+        - sweep_depth: int
+        - telemetry: bool (per-ply engine depth/nodes/nps/hashfull and timing)
+        - deadline: float (seconds to finish the whole game in; plies that ran
+          out of time are marked budget_limited)
+        - format: "compact" (same as sending Accept: application/vnd.chessgod.compact+json)
+    - previous_id: string (Optional) result_id of an earlier analysis of this
+      game with the same multipv and the same or a lower depth, e.g. before
+      more moves were played or before the depth was raised
+
+    Only what the earlier analysis did not already cover is searched; the
+    result is the same as without it. Responses carry the 'result_id' to pass
+    as previous_id next time.
+
+    Results are cached by move sequence and options. Responses carry an ETag;
+    a request with a matching If-None-Match header gets 304 Not Modified.
+
+    Analyses run on a limited number of engine slots, shared fairly between
+    clients (the X-Client-Id header, else the caller's address); see
+    FairScheduler. When the queue is full the response is 429 with a
+    Retry-After header; GET /queue shows the caller's queue positions.
+
+    The compact format replaces fen_history and moves_meta with the start FEN,
+    the played moves and one array per per-ply field (see compact_result);
+    the extension rebuilds the full result with decodeCompactResult. Responses
+    are gzipped when the client sends Accept-Encoding: gzip.
     """
     try:
         body = await request.json()
@@ -110,60 +432,224 @@ async def analyze(request: Request):
                 content={"error": "No PGN provided"}
             )
 
-        # Get analysis options
         options = body.get("options", {})
-        depth = max(5, min(25, options.get("depth", 18)))  # Default depth 18, clamped 5-25
-        multipv = options.get("multipv", 3)  # Default to 3 lines
-        
-        # Run analysis
-        result = analyze_game(
-            pgn,
-            depth=depth,
-            multipv=multipv,
-            threads=options.get("threads", 4),
-            hash_mb=options.get("hash", 128),
-            use_nnue=options.get("use_nnue", True)
-        )
-
-        # Try to extract player names from PGN
-        try:
-            game = chess.pgn.read_game(io.StringIO(pgn))
-            white = game.headers.get('White', '') if game else ''
-            black = game.headers.get('Black', '') if game else ''
-        except Exception:
-            white = ''
-            black = ''
+        kwargs = _analysis_kwargs(options)
+        result, result_etag = await _analyze_cached(pgn, kwargs, _client_key(request), await _previous_result(body))
 
-        # Construct response
-        response = {
+        white, black = _player_names(pgn)
+        extra = {
             "white_name": white,
             "black_name": black,
             "game_id": body.get("game_id", ""),
             "platform": body.get("platform", ""),
+            "result_id": result_key(pgn, kwargs),
+        }
+        compact = _wants_compact(request, options)
+        # The two encodings are different representations, so they get different ETags
+        etag = _response_etag(result_etag, {**extra, "compact": True} if compact else extra)
+        headers = {"ETag": etag} if etag else None
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        # Construct response
+        if compact:
+            return _json_response(request, {**extra, **compact_result(result)}, headers, COMPACT_MEDIA_TYPE)
+        response = {
+            **extra,
             **result
         }
-        return JSONResponse(content=response)
-        
+        return _json_response(request, response, headers)
+
+    except OptionError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except QueueFull as e:
+        return _busy_response(e)
     except Exception as e:
         return JSONResponse(
             status_code=500,
             content={"error": f"Analysis failed: {str(e)}"}
         )
 
-    # Try to extract player names from PGN tags
+def _batch_pgns(body: dict):
+    """Collect the games of a batch request from 'pgns' (list) and/or a multi-game 'pgn'."""
+    pgns = [p for p in body.get("pgns", []) if p]
+    if body.get("pgn"):
+        pgns.extend(split_pgn_games(body["pgn"]))
+    return pgns
+
+def _batch_kwargs(options: dict) -> dict:
+    """analyze_game keyword arguments for every game of a batch.
+
+    Each game gets its own engine from the pool and runs single-threaded by
+    default, so a batch spreads across cores one game per worker.
+
+    Raises:
+        OptionError: If an option has an unusable value
+    """
+    return _analysis_kwargs({"threads": 1, **options})
+
+def _schedule_batch(pgns, kwargs: dict, client: str):
+    """Queue every game of a batch on the analysis executor; the games queue
+    under `client` like separate /analyze requests."""
+    async def run(index: int, pgn: str):
+        try:
+            result, _ = await _analyze_cached(pgn, kwargs, client)
+        except QueueFull as e:
+            return {"index": index, "error": str(e), "retry_after": int(e.retry_after)}
+        except Exception as e:
+            return {"index": index, "error": f"Analysis failed: {str(e)}"}
+        white, black = _player_names(pgn)
+        return {"index": index, "white_name": white, "black_name": black, **result}
+
+    return [asyncio.ensure_future(run(i, pgn)) for i, pgn in enumerate(pgns)]
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: Request):
+    """Analyze many games in parallel.
+
+    Accepts JSON body with:
+    - pgns: list of strings and/or pgn: string with one or more games
+    - options: dict (Optional), as for /analyze; threads default to 1
+
+    Returns {"results": [...]} in input order; each entry carries its 'index'
+    and either the /analyze result fields or an 'error'.
+    """
+    body = await request.json()
+    pgns = _batch_pgns(body)
+    if not pgns:
+        return JSONResponse(status_code=400, content={"error": "No PGN provided"})
+    if len(pgns) > MAX_BATCH_GAMES:
+        return JSONResponse(status_code=413, content={"error": f"At most {MAX_BATCH_GAMES} games per batch"})
     try:
-        game = chess.pgn.read_game(io.StringIO(pgn_text))
-        white = game.headers.get('White', '') if game else ''
-        black = game.headers.get('Black', '') if game else ''
-    except Exception:
-        white = ''
-        black = ''
+        kwargs = _batch_kwargs(body.get("options", {}))
+    except OptionError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    client = _client_key(request)
+    try:
+        # Turn the whole batch away up front rather than game by game
+        app.state.scheduler.admit(client, len(pgns))
+    except QueueFull as e:
+        return _busy_response(e)
+
+    results = await asyncio.gather(*_schedule_batch(pgns, kwargs, client))
+    return _json_response(request, {"results": list(results)})
+
+@app.post("/analyze/batch/stream")
+async def analyze_batch_stream(request: Request):
+    """Analyze many games in parallel, streaming each game's result as NDJSON
+    as soon as it finishes (in completion order, tagged with its 'index')."""
+    body = await request.json()
+    pgns = _batch_pgns(body)
+    if not pgns:
+        return JSONResponse(status_code=400, content={"error": "No PGN provided"})
+    if len(pgns) > MAX_BATCH_GAMES:
+        return JSONResponse(status_code=413, content={"error": f"At most {MAX_BATCH_GAMES} games per batch"})
+    try:
+        kwargs = _batch_kwargs(body.get("options", {}))
+    except OptionError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    client = _client_key(request)
+    try:
+        # Turn the whole batch away up front rather than game by game
+        app.state.scheduler.admit(client, len(pgns))
+    except QueueFull as e:
+        return _busy_response(e)
+
+    tasks = _schedule_batch(pgns, kwargs, client)
+
+    async def results():
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Drop games that have not started yet if the client went away
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/analyze/stream")
+async def analyze_stream(request: Request):
+    """Analyze a chess game and stream results as newline-delimited JSON.
 
-    # result may now include 'fen_history' and 'moves_meta'
-    response = {
+    Accepts the same body as /analyze. Emits a 'start' event with the player
+    names, result_id and initial FEN, one 'ply' event per move (a moves_meta entry plus
+    'fen' and 'eval') as soon as it is scored, and a final 'summary' event with
+    the white/black statistics and the response 'etag'. Failures are reported
+    as an 'error' event. While the game waits for an engine slot, 'queued'
+    events carry its queue 'position' and estimated wait 'eta_s'; a full
+    queue is a 429 with Retry-After.
+
+    Cached games are replayed immediately (with an ETag header, or 304 Not
+    Modified if it matches If-None-Match); fresh results are cached once the
+    summary is reached.
+    """
+    body = await request.json()
+    pgn = body.get("pgn")
+    if not pgn:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "No PGN provided"}
+        )
+
+    try:
+        kwargs = _analysis_kwargs(body.get("options", {}))
+    except OptionError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    key = result_key(pgn, kwargs)
+    white, black = _player_names(pgn)
+    extra = {
         "white_name": white,
         "black_name": black,
-        "game_url": url or "",
-        **result,
+        "game_id": body.get("game_id", ""),
+        "platform": body.get("platform", ""),
+        "result_id": key,
     }
-    return JSONResponse(content=response)
+
+    loop = asyncio.get_event_loop()
+    cached = await loop.run_in_executor(None, app.state.result_cache.get, key) if key else None
+
+    def events(source, result_etag=None):
+        seen = []
+        for event in source:
+            if event["type"] == "start":
+                event.update(extra)
+            elif event["type"] == "summary":
+                if result_etag is None and key:
+                    result_etag = app.state.result_cache.put(key, collect_result(seen + [event]))
+                event["etag"] = _response_etag(result_etag, extra)
+            seen.append(event)
+            yield event
+
+    if cached:
+        result, result_etag = cached
+        etag = _response_etag(result_etag, extra)
+        if _etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        lines = [json.dumps(event) + "\n" for event in events(replay_result(result), result_etag)]
+        return StreamingResponse(iter(lines), media_type="application/x-ndjson", headers={"ETag": etag})
+
+    client = _client_key(request)
+    try:
+        app.state.scheduler.admit(client)
+    except QueueFull as e:
+        return _busy_response(e)
+    previous = await _previous_result(body)
+    return StreamingResponse(_relay_from_executor(lambda: events(iter_analysis(pgn, **kwargs, previous=previous)),
+                                                  client, _job_cost(pgn, kwargs), kwargs["deadline"]),
+                             media_type="application/x-ndjson")
+
+@app.websocket("/live")
+async def live(websocket: WebSocket):
+    """Follow a game in progress over a WebSocket.
+
+    The client sends moves as they are played ({"type": "move", "uci": ...}
+    or the whole list as {"type": "moves", "moves": [...]}), or asks the server
+    to tail the game's event stream ({"type": "follow", "game_id": ...}).
+    Each new ply is answered with a 'ply' event, the same as /analyze/stream
+    emits, after a single search on an engine kept attached to the session;
+    see LiveSession for the full protocol. Idle sessions give their engine
+    back to the pool.
+    """
+    await LiveSession(websocket, app.state.engine_pool, _live_analysis, app.state.http_client,
+                      app.state.scheduler, _client_key(websocket)).run()
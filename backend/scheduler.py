@@ -0,0 +1,278 @@
+import os
+import re
+import math
+import time
+import heapq
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from analysis.metrics import ANALYSIS_QUEUE_WAIT, ANALYSIS_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# -------- CONFIG --------
+# Jobs waiting for a slot, in total and per client; beyond that requests get a 429
+SCHEDULER_MAX_QUEUE = int(os.getenv('SCHEDULER_MAX_QUEUE', '200'))
+SCHEDULER_CLIENT_QUEUE = int(os.getenv('SCHEDULER_CLIENT_QUEUE', '60'))
+# Jobs estimated to take at most this many seconds go ahead of longer ones
+SCHEDULER_QUICK_SECONDS = float(os.getenv('SCHEDULER_QUICK_SECONDS', '5'))
+# A longer job that has waited this long is treated as quick, so it cannot starve
+SCHEDULER_AGING_SECONDS = float(os.getenv('SCHEDULER_AGING_SECONDS', '60'))
+# Initial guess of the time one ply takes at depth 18 with one line; refined
+# from the jobs that finish
+SCHEDULER_PLY_SECONDS = float(os.getenv('SCHEDULER_PLY_SECONDS', '0.25'))
+# Growth of search time per extra ply of depth
+SCHEDULER_DEPTH_GROWTH = float(os.getenv('SCHEDULER_DEPTH_GROWTH', '1.5'))
+
+# SAN moves, for a ply count that does not need a full PGN parse
+_SAN_MOVE = re.compile(r'(?<![\w-])(?:[NBRQK]?[a-h]?[1-8]?x?[a-h][1-8](?:=[NBRQ])?|O-O(?:-O)?)[+#]?')
+_PGN_NOISE = re.compile(r'\[[^\]]*\]|\{[^}]*\}|;[^\n]*')
+
+
+def estimate_plies(pgn: str) -> int:
+    """Approximate number of plies in a PGN's movetext (variations included)."""
+    return len(_SAN_MOVE.findall(_PGN_NOISE.sub(' ', pgn)))
+
+
+class QueueFull(Exception):
+    """The scheduler cannot take another job; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A job's place in the scheduler: queued until `started` is set, running until released."""
+
+    def __init__(self, client: str, cost: float, estimate: float, seq: int):
+        self.client = client
+        self.cost = cost
+        self.estimate = estimate
+        self.seq = seq
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.learn = True
+        self.event = asyncio.Event()
+
+    def quick(self, now: float) -> bool:
+        return self.estimate <= SCHEDULER_QUICK_SECONDS or now - self.submitted >= SCHEDULER_AGING_SECONDS
+
+
+class FairScheduler:
+    """Admission control and fair ordering for analysis jobs.
+
+    At most `slots` jobs run at once (one per engine), so everything that
+    takes a pooled engine must go through the scheduler: a job that is
+    started is sure to get one. Waiting jobs are kept
+    in per-client queues and slots are handed out round-robin across
+    clients, fewest running jobs first, so a client with many or deep games
+    cannot starve the others.
+    Quick jobs (estimated at most SCHEDULER_QUICK_SECONDS) go ahead of longer
+    ones until those have waited SCHEDULER_AGING_SECONDS; within a client the
+    cheapest job goes first.
+
+    A job's cost is estimated from its ply count, depth and MultiPV; the
+    seconds per unit of cost are learned from finished jobs and turn queue
+    positions into estimated waits.
+    """
+
+    def __init__(self,
+                 slots: int,
+                 max_queue: int = SCHEDULER_MAX_QUEUE,
+                 client_queue: int = SCHEDULER_CLIENT_QUEUE):
+        self.slots = max(1, int(slots))
+        self.max_queue = max(0, int(max_queue))
+        self.client_queue = max(1, int(client_queue))
+        self.unit_seconds = SCHEDULER_PLY_SECONDS
+        # Waiting tickets by client; the order of the clients is the round-robin order
+        self._queues: "OrderedDict[str, List[Ticket]]" = OrderedDict()
+        self._running: List[Ticket] = []
+        self._seq = 0
+        # When each client with queued or running jobs last got a slot, so the
+        # one that waited longest goes first among equals
+        self._last_turn: Dict[str, int] = {}
+        self._turns = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @staticmethod
+    def cost(plies: int, depth: int, multipv: int = 1) -> float:
+        """Cost of analyzing `plies` plies, in units of one ply at depth 18 with one line."""
+        return max(1, plies) * SCHEDULER_DEPTH_GROWTH ** (depth - 18) * max(1, multipv) ** 0.6
+
+    def admit(self, client: str, count: int = 1) -> None:
+        """Check that `count` more jobs from `client` would be accepted.
+
+        Raises:
+            QueueFull: If the queue, or the client's share of it, is full
+        """
+        # Jobs that get a free slot right away do not wait
+        overflow = count - max(0, self.slots - self.running)
+        if overflow <= 0:
+            return
+        waiting = len(self._queues.get(client, ()))
+        if waiting + overflow > self.client_queue:
+            ANALYSIS_REJECTED.labels('client').inc()
+            ahead = self._queues[client][0] if waiting else None
+            raise QueueFull("Too many analyses queued for this client", self._retry_after(ahead))
+        if self.queued + overflow > self.max_queue:
+            ANALYSIS_REJECTED.labels('global').inc()
+            raise QueueFull("Analysis queue is full", self._retry_after(None))
+
+    def submit(self, client: str, cost: float, deadline: Optional[float] = None,
+               hold: Optional[float] = None) -> Ticket:
+        """Queue a job; it may run once its ticket is started (see wait).
+
+        Args:
+            client: Key the job is queued and rotated under
+            cost: Estimated cost (see cost)
+            deadline: The job's own time budget, which caps its estimate
+            hold: Seconds the job is expected to keep its slot, for jobs whose
+                duration does not follow from their cost (e.g. a live session
+                holding an engine between moves); overrides the estimate
+
+        Raises:
+            QueueFull: If the job is not admitted
+        """
+        self.admit(client)
+        estimate = cost * self.unit_seconds
+        if deadline is not None:
+            estimate = min(estimate, deadline)
+        if hold is not None:
+            estimate = hold
+        self._seq += 1
+        ticket = Ticket(client, cost, estimate, self._seq)
+        # A deadline or held job's duration says little about its cost
+        ticket.learn = deadline is None and hold is None
+        self._queues.setdefault(client, []).append(ticket)
+        self._dispatch()
+        return ticket
+
+    async def wait(self, ticket: Ticket, timeout: Optional[float] = None) -> bool:
+        """Wait until `ticket` holds a slot; False if `timeout` passed first."""
+        try:
+            await asyncio.wait_for(ticket.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def release(self, ticket: Ticket) -> None:
+        """Free the ticket's slot, or drop it from the queue if it never started."""
+        if ticket.started is None:
+            self._dequeue(ticket)
+            return
+        if ticket in self._running:
+            self._running.remove(ticket)
+            self._forget_idle(ticket.client)
+            if ticket.learn:
+                # Learn the time per unit of cost, smoothed over recent jobs
+                elapsed = time.monotonic() - ticket.started
+                self.unit_seconds = 0.8 * self.unit_seconds + 0.2 * (elapsed / ticket.cost)
+            self._dispatch()
+
+    def position(self, ticket: Ticket) -> Dict[str, Any]:
+        """Queue position (1 = next to run) and estimated wait of a ticket."""
+        if ticket.started is not None:
+            return {"position": 0, "eta_s": 0.0}
+        for position, (queued, start) in enumerate(self._schedule(), 1):
+            if queued is ticket:
+                return {"position": position, "eta_s": round(start, 1)}
+        return {"position": None, "eta_s": None}
+
+    def status(self, client: Optional[str] = None) -> Dict[str, Any]:
+        """Overall load, plus the positions of `client`'s queued jobs."""
+        schedule = self._schedule()
+        status = {
+            "slots": self.slots,
+            "running": self.running,
+            "queued": len(schedule),
+            "clients_waiting": len(self._queues),
+            "eta_s": round(schedule[-1][1], 1) if schedule else 0.0,
+        }
+        if client is not None:
+            status["jobs"] = [{"position": position, "eta_s": round(start, 1)}
+                              for position, (ticket, start) in enumerate(schedule, 1) if ticket.client == client]
+            status["running_jobs"] = sum(1 for t in self._running if t.client == client)
+        return status
+
+    def _order(self) -> List[Ticket]:
+        """Every queued ticket in the order it would be started."""
+        now = time.monotonic()
+        queues = OrderedDict((client, sorted(queue, key=lambda t: (not t.quick(now), t.estimate, t.seq)))
+                             for client, queue in self._queues.items())
+        # Jobs each client has running or ahead in this order; the client with
+        # the fewest goes next, so one that already holds slots yields to one that has none
+        share: Dict[str, int] = {}
+        for ticket in self._running:
+            share[ticket.client] = share.get(ticket.client, 0) + 1
+        turns, turn = dict(self._last_turn), self._turns
+        order = []
+        while queues:
+            # Clients with a quick job first; among them, the smallest share, then
+            # the one whose last turn is longest ago, then round-robin order
+            candidates = [c for c, q in queues.items() if q[0].quick(now)] or list(queues)
+            client = min(candidates, key=lambda c: (share.get(c, 0), turns.get(c, 0)))
+            share[client] = share.get(client, 0) + 1
+            turn += 1
+            turns[client] = turn
+            order.append(queues[client].pop(0))
+            if queues[client]:
+                queues.move_to_end(client)
+            else:
+                del queues[client]
+        return order
+
+    def _schedule(self):
+        """(ticket, estimated seconds until it starts) for every queued ticket, in start order."""
+        now = time.monotonic()
+        free_at = [max(0.0, t.estimate - (now - t.started)) for t in self._running]
+        free_at += [0.0] * (self.slots - len(free_at))
+        heapq.heapify(free_at)
+        schedule = []
+        for ticket in self._order():
+            start = heapq.heappop(free_at)
+            schedule.append((ticket, start))
+            heapq.heappush(free_at, start + ticket.estimate)
+        return schedule
+
+    def _retry_after(self, ticket: Optional[Ticket]) -> float:
+        # When the client's next job (or else any job) leaves the queue, there is room again
+        schedule = self._schedule()
+        starts = [start for queued, start in schedule if ticket is None or queued is ticket]
+        return max(1.0, math.ceil(starts[0] if starts else 1.0))
+
+    def _dequeue(self, ticket: Ticket) -> None:
+        queue = self._queues.get(ticket.client)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.client]
+                self._forget_idle(ticket.client)
+
+    def _forget_idle(self, client: str) -> None:
+        # A client with nothing queued or running starts afresh next time
+        if client not in self._queues and not any(t.client == client for t in self._running):
+            self._last_turn.pop(client, None)
+
+    def _dispatch(self) -> None:
+        while len(self._running) < self.slots and self._queues:
+            ticket = self._order()[0]
+            self._dequeue(ticket)
+            ticket.started = time.monotonic()
+            self._running.append(ticket)
+            self._turns += 1
+            self._last_turn[ticket.client] = self._turns
+            # The client just had its turn; the others go first next time
+            if ticket.client in self._queues:
+                self._queues.move_to_end(ticket.client)
+            ANALYSIS_QUEUE_WAIT.observe(ticket.started - ticket.submitted)
+            ticket.event.set()
@@ -0,0 +1,39 @@
+# backend/tests/conftest.py
+
+import io
+import sys
+from pathlib import Path
+
+import chess.pgn
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from analysis.engine_pool import EnginePool  # noqa: E402
+
+FAKE_ENGINE = BACKEND_DIR / "tools" / "fake_uci_engine.py"
+CORPUS = BACKEND_DIR / "tools" / "bench" / "corpus.pgn"
+
+OPERA_GAME = ('[Event "Opera"]\n[White "Morphy"]\n[Black "Duke"]\n\n'
+              '1. e4 e5 2. Nf3 d6 3. d4 Bg4 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7 8. Nc3 c6 '
+              '9. Bg5 b5 10. Nxb5 cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 14. Rd1 Qe6 '
+              '15. Bxd7+ Nxd7 16. Qb8+ Nxb8 17. Rd8# 1-0\n')
+SCHOLARS_MATE = '[Event "Test"]\n[White "Alice"]\n[Black "Bob"]\n\n1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0\n'
+
+
+def fake_engine(latency_ms: float = 0) -> list:
+    """Command line of the deterministic fake UCI engine."""
+    return [sys.executable, str(FAKE_ENGINE), "--latency-ms", str(latency_ms)]
+
+
+@pytest.fixture
+def engine_pool():
+    pool = EnginePool(fake_engine(), size=1, threads=1, hash_mb=16)
+    yield pool
+    pool.close()
+
+
+def mainline_uci(pgn: str) -> list:
+    """UCI moves of a PGN's mainline."""
+    return [move.uci() for move in chess.pgn.read_game(io.StringIO(pgn)).mainline_moves()]
@@ -0,0 +1,114 @@
+# backend/tests/test_analyzer.py
+
+import io
+from collections import Counter
+
+import chess.engine
+import chess.pgn
+
+from analysis.analyzer import analyze_game
+from analysis.eval_cache import EvalCache
+
+from conftest import OPERA_GAME
+
+
+def _truncated(pgn: str, plies: int) -> str:
+    game = chess.pgn.read_game(io.StringIO(pgn))
+    node = game
+    for _ in range(plies):
+        node = node.variations[0]
+    node.variations = []
+    return str(game)
+
+
+def _moves(result):
+    return [{k: v for k, v in meta.items() if k != 'telemetry'} for meta in result['moves_meta']]
+
+
+def _count_searches(monkeypatch) -> Counter:
+    searches = Counter()
+    analyse = chess.engine.SimpleEngine.analyse
+
+    def counting(self, board, *args, **kwargs):
+        searches[board.fen()] += 1
+        return analyse(self, board, *args, **kwargs)
+
+    monkeypatch.setattr(chess.engine.SimpleEngine, 'analyse', counting)
+    return searches
+
+
+def test_every_position_is_searched_once(engine_pool, monkeypatch):
+    searches = _count_searches(monkeypatch)
+    result = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=EvalCache())
+    assert len(result['moves_meta']) == 33
+    assert max(searches.values()) == 1
+    # 34 positions, less the final mate and the one with a single legal move
+    assert len(searches) == 32
+
+
+def test_previous_result_is_reused_for_appended_moves(engine_pool):
+    earlier = analyze_game(_truncated(OPERA_GAME, 20), depth=6, engine_pool=engine_pool, eval_cache=None)
+    fresh = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None)
+    seeded = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None, previous=earlier)
+    assert seeded['analysis_params']['reused_positions'] >= 19
+    assert _moves(seeded) == _moves(fresh)
+    assert seeded['white'] == fresh['white'] and seeded['black'] == fresh['black']
+
+
+def test_previous_result_at_a_greater_depth_is_ignored(engine_pool):
+    deeper = analyze_game(OPERA_GAME, depth=8, engine_pool=engine_pool, eval_cache=None)
+    shallower = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None, previous=deeper)
+    assert shallower['analysis_params']['reused_positions'] == 0
+
+
+def test_raising_the_depth_searches_again_from_the_previous_lines(engine_pool, monkeypatch):
+    earlier = analyze_game(OPERA_GAME, depth=15, engine_pool=engine_pool, eval_cache=None)
+    fresh = analyze_game(OPERA_GAME, depth=20, engine_pool=engine_pool, eval_cache=None)
+    root_moves = []
+    analyse = chess.engine.SimpleEngine.analyse
+
+    def recording(self, board, limit, **kwargs):
+        root_moves.append(kwargs.get('root_moves'))
+        return analyse(self, board, limit, **kwargs)
+
+    monkeypatch.setattr(chess.engine.SimpleEngine, 'analyse', recording)
+    deeper = analyze_game(OPERA_GAME, depth=20, engine_pool=engine_pool, eval_cache=None, previous=earlier)
+    assert deeper['analysis_params']['reused_positions'] > 0
+    assert _moves(deeper) == _moves(fresh)
+    assert deeper['white'] == fresh['white'] and deeper['black'] == fresh['black']
+    # Every position is searched again, the previous best move first; the
+    # starting position is not part of a result
+    assert root_moves[0] is None and all(root_moves[1:])
+    assert len(root_moves) - 1 == deeper['analysis_params']['reused_positions']
+    assert root_moves[1][0].uci() == earlier['moves_meta'][1]['best_uci']
+
+
+def test_adaptive_deepens_only_critical_plies(engine_pool, monkeypatch):
+    deep_searches = _count_searches(monkeypatch)
+    result = analyze_game(OPERA_GAME, depth=8, adaptive=True, sweep_depth=4, engine_pool=engine_pool,
+                          eval_cache=EvalCache())
+    deepened = result['analysis_params']['deepened_plies']
+    assert 0 < deepened < 33
+    # The sweep follows iterative deepening; only the deep pass calls analyse()
+    assert 0 < sum(deep_searches.values()) <= 2 * deepened
+    assert len(result['moves_meta']) == 33
+
+
+def test_telemetry_reports_every_search(engine_pool):
+    cache = EvalCache()
+    plain = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None)
+    assert 'telemetry' not in plain['analysis_params']
+    assert not any('telemetry' in meta for meta in plain['moves_meta'])
+
+    result = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=cache, telemetry=True)
+    summary = result['analysis_params']['telemetry']
+    searched = [meta['telemetry'] for meta in result['moves_meta'] if 'nodes' in meta['telemetry']]
+    assert summary['searches'] == 32
+    assert summary['min_depth'] == summary['mean_depth'] == 6
+    assert summary['total_nodes'] >= sum(t['nodes'] for t in searched) > 0
+    assert result['moves_meta'][-1]['telemetry']['fast_path'] == 'terminal'
+    assert summary['slowest_plies'][0]['ply_ms'] == max(m['telemetry']['ply_ms'] for m in result['moves_meta'])
+
+    again = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=cache, telemetry=True)
+    assert again['analysis_params']['telemetry']['searches'] == 0
+    assert all(m['telemetry'].get('cached') or m['telemetry'].get('fast_path') for m in again['moves_meta'])
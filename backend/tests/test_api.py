@@ -0,0 +1,210 @@
+# backend/tests/test_api.py
+
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import main
+from analysis.analyzer import analyze_game
+import warmup
+from analysis.engine_pool import EnginePool
+from analysis.resources import ResourceGovernor
+from analysis.result_cache import ResultCache
+from scheduler import FairScheduler
+from warmup import Warmup
+
+from conftest import OPERA_GAME, SCHOLARS_MATE, fake_engine
+
+
+@pytest.fixture
+def api(tmp_path):
+    """The app's state as startup builds it, on the fake engine and a scratch result cache."""
+    state = main.app.state
+    state.governor = ResourceGovernor(cpu_threads=2, hash_mb=64)
+    state.engine_pool = EnginePool(fake_engine(), size=2, governor=state.governor)
+    state.analysis_executor = ThreadPoolExecutor(max_workers=2)
+    state.scheduler = FairScheduler(2)
+    state.result_cache = ResultCache(str(tmp_path / "results"))
+    yield state
+    state.analysis_executor.shutdown()
+    state.engine_pool.close()
+
+
+def request(method: str, path: str, **kwargs) -> httpx.Response:
+    async def send():
+        main.app.state.loop = asyncio.get_running_loop()
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+
+    return asyncio.run(send())
+
+
+def post(path: str, body: dict, **kwargs) -> httpx.Response:
+    return request("POST", path, json=body, **kwargs)
+
+
+def _events(response: httpx.Response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_results_keep_input_order(api):
+    response = post("/analyze/batch", {"pgns": [OPERA_GAME, SCHOLARS_MATE, "   \n"],
+                                       "options": {"depth": 6}})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["white_name"] == "Morphy" and len(results[0]["moves_meta"]) == 33
+    assert results[1]["white_name"] == "Alice" and len(results[1]["moves_meta"]) == 7
+    assert "error" in results[2]
+
+
+def test_batch_splits_a_multi_game_pgn(api):
+    response = post("/analyze/batch", {"pgn": OPERA_GAME + "\n" + SCHOLARS_MATE, "options": {"depth": 6}})
+    assert [r["black_name"] for r in response.json()["results"]] == ["Duke", "Bob"]
+
+
+def test_batch_size_is_limited(api, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_GAMES", 1)
+    assert post("/analyze/batch", {"pgns": [SCHOLARS_MATE] * 2}).status_code == 413
+    assert post("/analyze/batch", {"pgns": []}).status_code == 400
+
+
+def test_repeated_analysis_revalidates_with_the_etag(api):
+    body = {"pgn": SCHOLARS_MATE, "game_id": "g1", "options": {"depth": 6}}
+    first = post("/analyze", body)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag
+    again = post("/analyze", body)
+    assert again.headers["etag"] == etag
+    assert again.json() == first.json()
+    assert post("/analyze", body, headers={"If-None-Match": etag}).status_code == 304
+    # Per-request fields are part of the response, so they change the ETag
+    assert post("/analyze", {**body, "game_id": "g2"}).headers["etag"] != etag
+
+
+def test_streamed_analysis_is_cached_for_replay(api):
+    body = {"pgn": SCHOLARS_MATE, "options": {"depth": 6}}
+    streamed = post("/analyze/stream", body)
+    assert streamed.status_code == 200 and "etag" not in streamed.headers
+    replayed = post("/analyze/stream", body)
+    assert replayed.headers["etag"]
+    assert _events(replayed) == _events(streamed)
+    assert post("/analyze/stream", body, headers={"If-None-Match": replayed.headers["etag"]}).status_code == 304
+
+
+def test_metrics_cover_requests_and_engines(api):
+    post("/analyze", {"pgn": OPERA_GAME, "options": {"depth": 6}})
+    metrics = request("GET", "/metrics")
+    assert metrics.status_code == 200
+    samples = dict(line.rsplit(" ", 1) for line in metrics.text.splitlines() if line and not line.startswith("#"))
+    assert float(samples['chessgod_analysis_fast_paths_total{kind="forced"}']) >= 1
+    assert float(samples['chessgod_resource_budget{resource="threads"}']) == 2
+    assert any(name.startswith('chessgod_http_request_duration_seconds_count{') and '/analyze"' in name
+               for name in samples)
+    assert any(name.startswith('chessgod_engine_nps_count') for name in samples)
+
+
+def test_compact_encoding_is_negotiated(api):
+    body = {"pgn": OPERA_GAME, "options": {"depth": 6}}
+    full = post("/analyze", body)
+    compact = post("/analyze", body, headers={"Accept": main.COMPACT_MEDIA_TYPE})
+    assert compact.headers["content-type"] == main.COMPACT_MEDIA_TYPE
+    assert compact.json()["moves"][-1] == "d1d8"
+    assert "moves_meta" not in compact.json()
+    assert compact.json()["result_id"] == full.json()["result_id"]
+    # The two encodings must not satisfy each other's If-None-Match
+    assert compact.headers["etag"] != full.headers["etag"]
+    assert post("/analyze", {**body, "options": {"depth": 6, "format": "compact"}}).json() == compact.json()
+
+
+def test_full_queue_is_a_429_with_retry_after(api):
+    api.scheduler = FairScheduler(1, max_queue=0)
+    busy = api.scheduler.submit("ip:someone-else", 1)
+    body = {"pgn": OPERA_GAME, "options": {"depth": 6}}
+    for path in ("/analyze", "/analyze/stream", "/analyze/batch"):
+        response = post(path, body)
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        assert response.json()["queue"]["running"] == 1
+    api.scheduler.release(busy)
+    assert post("/analyze", body).status_code == 200
+
+
+def test_client_supplied_results_never_reach_the_cache(api):
+    honest = analyze_game(OPERA_GAME, depth=6, multipv=3, engine_pool=api.engine_pool, eval_cache=None)
+    forged = {**honest, "moves_meta": [{**meta, "eval": 0} for meta in honest["moves_meta"]],
+              "analysis_params": {**honest["analysis_params"], "reused_positions": 33}}
+    body = {"pgn": OPERA_GAME, "options": {"depth": 6}}
+    for path in ("/analyze", "/analyze/stream"):
+        post(path, {**body, "previous": forged})
+    clean = post("/analyze", body).json()
+    assert [m["eval"] for m in clean["moves_meta"]] == [m["eval"] for m in honest["moves_meta"]]
+    assert [m["category"] for m in clean["moves_meta"]] == [m["category"] for m in honest["moves_meta"]]
+
+
+def test_unusable_deadlines_are_a_400(api):
+    for deadline in ("soon", -1, [5]):
+        body = {"pgn": SCHOLARS_MATE, "options": {"depth": 6, "deadline": deadline}}
+        for path in ("/analyze", "/analyze/stream", "/analyze/batch"):
+            response = post(path, body)
+            assert response.status_code == 400
+            assert "deadline" in response.json()["error"]
+    assert api.scheduler.running == 0
+
+
+def test_queue_reports_the_callers_jobs(api):
+    api.scheduler.submit("id:me", 1)
+    api.scheduler.submit("id:other", 1)
+    mine = api.scheduler.submit("id:me", 1)
+    queue = request("GET", "/queue", headers={"X-Client-Id": "me"}).json()
+    assert queue["running"] == 2 and queue["queued"] == 1
+    assert queue["running_jobs"] == 1
+    assert [job["position"] for job in queue["jobs"]] == [api.scheduler.position(mine)["position"]] == [1]
+    assert queue["resources"]["threads_budget"] == 2
+
+
+def test_ready_once_engines_are_warm_and_openings_preloaded(api, monkeypatch):
+    monkeypatch.setattr(warmup, "OPENING_LINES", warmup.OPENING_LINES[:3])
+    api.warmup = Warmup(api.engine_pool, main._preload_opening)
+    assert request("GET", "/ready").status_code == 503
+
+    async def warm_up():
+        api.loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(api.warmup.run())
+        while not api.warmup.ready:
+            await asyncio.sleep(0.02)
+        task.cancel()
+
+    asyncio.run(warm_up())
+    ready = request("GET", "/ready")
+    assert ready.status_code == 200
+    assert ready.json()["engines_warmed"] == 2
+    assert ready.json()["openings_preloaded"] == ready.json()["openings_total"] == 3
+    # Preloads queue on the scheduler like requests, and leave no slot behind
+    assert api.scheduler.running == 0
+
+
+def test_analysis_does_not_block_other_requests(api, monkeypatch):
+    def slow_analysis(pgn, **kwargs):
+        time.sleep(0.5)
+        return {"white": {}, "black": {}, "fen_history": [], "moves_meta": [], "analysis_params": {}}
+
+    monkeypatch.setattr(main, "analyze_game", slow_analysis)
+
+    async def run():
+        main.app.state.loop = asyncio.get_running_loop()
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            analysis = asyncio.ensure_future(client.post("/analyze", json={"pgn": SCHOLARS_MATE}))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            health = await client.get("/health")
+            waited = time.monotonic() - started
+            return (await analysis).status_code, health.status_code, waited
+
+    analysis, health, waited = asyncio.run(run())
+    assert analysis == health == 200
+    assert waited < 0.25
@@ -0,0 +1,49 @@
+# backend/tests/test_assessment.py
+
+import chess
+
+from analysis.analyzer import MATE_SCORE, _assess_move, _tablebase_score
+
+
+def _record(score, best="e2e4"):
+    return {'score': score, 'pv': [best], 'lines': [best], 'depth': 20}
+
+
+def test_keeping_a_mate_into_a_tablebase_win_loses_nothing():
+    # White mates in 4 (engine); the capture leaves a won 7-piece ending (tables)
+    before = _record(MATE_SCORE - 7, best="d1d8")
+    after = _record(_tablebase_score(2, 10))
+    assessed = _assess_move(chess.Move.from_uci("d1d8"), chess.WHITE, before, after, 1)
+    assert assessed['cp_loss'] == 0
+    assert assessed['category'] == "best"
+
+
+def test_throwing_away_a_mate_is_still_a_blunder():
+    before = _record(MATE_SCORE - 7, best="d1d8")
+    after = _record(_tablebase_score(0, 0))
+    assessed = _assess_move(chess.Move.from_uci("d1d2"), chess.WHITE, before, after, 1)
+    assert assessed['category'] == "blunder"
+
+
+def test_a_slower_mate_is_not_the_best_move():
+    # Mate in 3; the best move leaves mate in 2, another one mate in 5
+    before = _record(MATE_SCORE - 3, best="d1d8")
+    best = _assess_move(chess.Move.from_uci("d1d8"), chess.WHITE, before, _record(MATE_SCORE - 2), 1)
+    assert best['cp_loss'] == 0 and best['category'] == "best"
+    slower = _assess_move(chess.Move.from_uci("d1d2"), chess.WHITE, before, _record(MATE_SCORE - 5), 1)
+    assert slower['cp_loss'] == 2
+    assert slower['category'] != "best"
+    # The same from Black's side
+    before = _record(-(MATE_SCORE - 3), best="d8d1")
+    slower = _assess_move(chess.Move.from_uci("d8d2"), chess.BLACK, before, _record(-(MATE_SCORE - 5)), 1)
+    assert slower['cp_loss'] == 2
+
+
+def test_tablebase_score_respects_the_fifty_move_rule():
+    assert _tablebase_score(2, 10) > 0
+    assert _tablebase_score(-2, -10) < 0
+    assert _tablebase_score(2, 10, halfmove_clock=95) == 0
+    assert _tablebase_score(-2, -10, halfmove_clock=95) == 0
+    # Cursed wins and blessed losses
+    assert _tablebase_score(1, 50) == 0
+    assert _tablebase_score(-1, -50) == 0
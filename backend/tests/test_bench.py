@@ -0,0 +1,29 @@
+# backend/tests/test_bench.py
+
+import argparse
+import sys
+
+from conftest import BACKEND_DIR, CORPUS
+
+sys.path.insert(0, str(BACKEND_DIR / "tools"))
+
+import bench_analyzer  # noqa: E402
+
+
+def test_benchmark_reports_every_metric():
+    args = argparse.Namespace(corpus=str(CORPUS), engine=None, latency_ms=0.0, depth=6, multipv=2, hash=16,
+                              repeat=1, profile=False)
+    report = bench_analyzer.run_benchmark(args)
+    assert set(report['metrics']) == set(bench_analyzer.METRICS)
+    assert report['cold']['searches'] > 0
+    # The second pass over the same cache never reaches the engine
+    assert report['warm']['searches'] == 0
+
+
+def test_regressions_respect_the_direction_of_each_metric():
+    baseline = {'cold_plies_per_sec': 100.0, 'python_ms_per_ply': 1.0}
+    metrics = {**dict.fromkeys(bench_analyzer.METRICS, 1.0), **baseline}
+    assert bench_analyzer.compare({**metrics, 'cold_plies_per_sec': 80.0}, baseline, 0.15) == ['cold_plies_per_sec']
+    assert bench_analyzer.compare({**metrics, 'cold_plies_per_sec': 120.0}, baseline, 0.15) == []
+    assert bench_analyzer.compare({**metrics, 'python_ms_per_ply': 1.2}, baseline, 0.15) == ['python_ms_per_ply']
+    assert bench_analyzer.compare({**metrics, 'python_ms_per_ply': 0.5}, baseline, 0.15) == []
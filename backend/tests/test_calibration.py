@@ -0,0 +1,90 @@
+# backend/tests/test_calibration.py
+
+import json
+import itertools
+import random
+import sys
+
+import numpy as np
+
+import analysis.analyzer
+
+from conftest import BACKEND_DIR, CORPUS, FAKE_ENGINE
+
+sys.path.insert(0, str(BACKEND_DIR / "tools"))
+
+import calibrate_thresholds as ct  # noqa: E402
+
+
+def _moves(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    moves = []
+    for _ in range(count):
+        cp = rng.choice([-20, 0, 0] + list(range(5, 400, 40)))
+        # Labels follow cp_loss loosely, so no thresholds fit them perfectly
+        rank = min(4, max(0, int(cp / 80 + rng.gauss(0, 0.7))))
+        category = 'great' if cp < 0 else 'best' if cp == 0 else ct.SEGMENT_CATS[rank]
+        moves.append({'cp_loss': cp, 'ref_category': category})
+    return moves
+
+
+def test_vectorized_prediction_matches_map_category():
+    cp = np.array([-5, 0, 1, 10, 10.5, 25, 49, 50, 51, 99, 100, 101, 250, 301, 5000], dtype=np.float64)
+    expected = [ct.CATS.index(ct.map_category(v, ct.INITIAL_THRESHOLDS)) for v in cp]
+    assert ct.predict_codes(cp, ct.INITIAL_THRESHOLDS).tolist() == expected
+
+
+def test_fitted_thresholds_are_optimal():
+    moves = _moves(400)
+    fitted = ct.find_best_thresholds(moves, folds=1)
+    mismatches, _ = ct.score_thresholds(moves, fitted)
+
+    candidates = [0.0] + sorted({float(m['cp_loss']) for m in moves if m['cp_loss'] > 0})
+    best = min(
+        ct.score_thresholds(moves, {**ct.INITIAL_THRESHOLDS, **dict(zip(ct.BOUNDED_CATS, bounds))})[0]
+        for bounds in itertools.combinations_with_replacement(candidates, len(ct.BOUNDED_CATS))
+    )
+    assert mismatches == best
+
+
+def test_chunked_scan_gives_the_same_fit(monkeypatch):
+    moves = _moves(300, seed=2)
+    whole = ct.find_best_thresholds(moves, folds=3)
+    monkeypatch.setattr(ct, 'CHUNK_ROWS', 7)
+    assert ct.find_best_thresholds(moves, folds=3) == whole
+
+
+def test_reference_file_converts_to_memory_mapped_columns(tmp_path, monkeypatch):
+    moves = _moves(120, seed=3) + [{'cp_loss': None, 'ref_category': 'good'}]
+    source = tmp_path / "reference.json"
+    source.write_text(json.dumps(moves, indent=1), encoding='utf-8')
+    monkeypatch.setattr(ct, 'CONVERT_BATCH_ROWS', 50)
+    assert ct.convert_reference(str(source), str(tmp_path / "columns")) == 120
+
+    columns = ct.load_dataset(str(tmp_path / "columns"))
+    assert isinstance(columns['cp_loss'], np.memmap)
+    assert columns['cp_loss'].tolist() == [m['cp_loss'] for m in moves[:-1]]
+    assert ct.find_best_thresholds(columns, folds=1) == ct.find_best_thresholds(moves, folds=1)
+
+
+def test_json_records_stream_from_either_layout(tmp_path):
+    records = [{'cp_loss': i, 'note': '[,]' * i} for i in range(20)]
+    array, ndjson = tmp_path / "a.json", tmp_path / "b.ndjson"
+    array.write_text(json.dumps(records), encoding='utf-8')
+    ndjson.write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding='utf-8')
+    assert list(ct.iter_json_records(str(array), read_size=7)) == records
+    assert list(ct.iter_json_records(str(ndjson), read_size=7)) == records
+
+
+def test_parallel_analysis_keeps_file_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis.analyzer, 'get_stockfish_path', lambda: str(FAKE_ENGINE))
+    serial = ct.analyze_games_parallel(str(CORPUS), depth=4, workers=1, hash_mb=16)
+    parallel = ct.analyze_games_parallel(str(CORPUS), depth=4, workers=3, hash_mb=16)
+    assert set(parallel) == set(ct.DATASET_COLUMNS)
+    assert len(parallel['cp_loss']) > 200
+    for name in ct.DATASET_COLUMNS:
+        assert np.array_equal(parallel[name], serial[name])
+
+    ct.save_dataset(str(tmp_path / "evals.npz"), parallel)
+    loaded = ct.load_dataset(str(tmp_path / "evals.npz"))
+    assert all(np.array_equal(loaded[name], parallel[name]) for name in ct.DATASET_COLUMNS)
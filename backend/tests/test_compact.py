@@ -0,0 +1,56 @@
+# backend/tests/test_compact.py
+
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from analysis.analyzer import COMPACT_FORMAT, analyze_game, compact_result
+
+from conftest import BACKEND_DIR, OPERA_GAME
+
+UTILS_JS = BACKEND_DIR.parent / "extension" / "utils.js"
+EN_PASSANT_GAME = '[Event "Test"]\n\n1. e4 a6 2. e5 d5 3. exd6 e5 4. d4 exd4 5. c4 dxc3 *\n'
+
+# Loads the extension's utils.js and decodes the compact result on stdin with it
+DECODE_JS = """
+const fs = require('fs'), vm = require('vm');
+const context = vm.createContext({});
+vm.runInContext(fs.readFileSync(process.argv[1], 'utf8'), context);
+let input = '';
+process.stdin.on('data', chunk => input += chunk);
+process.stdin.on('end', () => process.stdout.write(JSON.stringify(context.decodeCompactResult(JSON.parse(input)))));
+"""
+
+
+def _decode(compact: dict) -> dict:
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip("node is needed to run the extension's decoder")
+    output = subprocess.run([node, '-e', DECODE_JS, str(UTILS_JS)], input=json.dumps(compact),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+@pytest.mark.parametrize('pgn', [OPERA_GAME, EN_PASSANT_GAME])
+def test_extension_decodes_the_full_result(engine_pool, pgn):
+    result = analyze_game(pgn, depth=6, multipv=3, engine_pool=engine_pool, eval_cache=None, telemetry=True)
+    # Results reach the client as JSON
+    result = json.loads(json.dumps(result))
+    compact = compact_result(result)
+    assert compact['format'] == COMPACT_FORMAT
+    assert _decode(compact) == result
+
+
+def test_en_passant_squares_are_marked(engine_pool):
+    result = analyze_game(EN_PASSANT_GAME, depth=6, engine_pool=engine_pool, eval_cache=None)
+    # After 2...d5 and 5. c4 a pawn can take en passant
+    assert compact_result(result)['ep_plies'] == [3, 8]
+
+
+def test_compact_result_is_smaller(engine_pool):
+    result = analyze_game(OPERA_GAME, depth=6, multipv=3, engine_pool=engine_pool, eval_cache=None)
+    compact = compact_result(result)
+    assert len(json.dumps(compact)) < len(json.dumps(result)) / 2
+    assert compact['ep_plies'] == []
@@ -0,0 +1,111 @@
+# backend/tests/test_deadline.py
+
+import time
+import types
+from contextlib import contextmanager
+
+import chess.engine
+import pytest
+
+from analysis import analyzer
+from analysis.analyzer import analyze_game, split_pgn_games
+from analysis.engine_pool import EnginePool
+
+from conftest import CORPUS, OPERA_GAME, fake_engine
+
+# Think time of the fake engine, and the overhead every search adds on top of
+# its movetime, with a slow stop every SPIKE_EVERY searches
+LATENCY_S = 0.04
+OVERHEAD_S = 0.002
+SPIKE_S = 0.04
+SPIKE_EVERY = 11
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class _ClockedEngine:
+    """Engine proxy whose searches take time on a FakeClock instead of the
+    wall clock, so the deadline scheduler sees the same timings on every run.
+
+    A search takes LATENCY_S, or its movetime if that is shorter (reaching a
+    proportionally lower depth, like fake_uci_engine.py), plus the overhead.
+    """
+
+    def __init__(self, engine, clock: FakeClock):
+        self._engine = engine
+        self._clock = clock
+        self.searches = 0
+
+    def _search(self, limit: chess.engine.Limit) -> chess.engine.Limit:
+        self.searches += 1
+        seconds, depth = LATENCY_S, limit.depth
+        if limit.time is not None and limit.time < LATENCY_S:
+            seconds, depth = limit.time, max(1, int(limit.depth * limit.time / LATENCY_S))
+        self._clock.now += seconds + OVERHEAD_S + (SPIKE_S if self.searches % SPIKE_EVERY == 0 else 0.0)
+        return chess.engine.Limit(depth=depth)
+
+    def analyse(self, board, limit, **kwargs):
+        return self._engine.analyse(board, self._search(limit), **kwargs)
+
+    def analysis(self, board, limit, **kwargs):
+        return self._engine.analysis(board, self._search(limit), **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._engine, name)
+
+
+class _ClockedPool(EnginePool):
+    def __init__(self, clock: FakeClock, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock = clock
+
+    @contextmanager
+    def acquire(self, timeout=None, **sizes):
+        with super().acquire(timeout, **sizes) as engine:
+            yield _ClockedEngine(engine, self.clock)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(analyzer, 'time', types.SimpleNamespace(monotonic=clock.monotonic,
+                                                                perf_counter=clock.monotonic))
+    return clock
+
+
+@pytest.fixture
+def slow_pool():
+    # 40ms per search, so a full-depth run of a long game takes seconds
+    pool = EnginePool(fake_engine(40), size=1, threads=1, hash_mb=16)
+    pool.start()
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize("deadline", [0.3, 0.5, 1.0, 2.0])
+def test_long_games_finish_within_the_deadline(clock, deadline):
+    pool = _ClockedPool(clock, fake_engine(), size=1, threads=1, hash_mb=16)
+    try:
+        for pgn in split_pgn_games(CORPUS.read_text(encoding='utf-8')):
+            started = clock.now
+            result = analyze_game(pgn, depth=18, engine_pool=pool, eval_cache=None, deadline=deadline)
+            # Slow stops included, not a single search runs past the deadline
+            assert clock.now - started <= deadline
+            assert result['analysis_params']['elapsed_s'] <= deadline
+            assert all('budget_limited' in meta for meta in result['moves_meta'])
+    finally:
+        pool.close()
+
+
+def test_waiting_for_an_engine_counts_against_the_deadline(slow_pool):
+    with slow_pool.acquire():
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            analyze_game(OPERA_GAME, depth=18, engine_pool=slow_pool, eval_cache=None, deadline=0.3)
+        assert time.monotonic() - started < 1
@@ -0,0 +1,67 @@
+# backend/tests/test_engine_pool.py
+
+import time
+
+import chess
+import chess.engine
+import pytest
+
+from analysis.analyzer import _evaluate_position
+from analysis.engine_pool import SEARCH_WATCHDOG, EnginePool
+
+from conftest import fake_engine
+
+
+def test_engines_are_reused_between_acquires(engine_pool):
+    with engine_pool.acquire() as first:
+        pass
+    with engine_pool.acquire() as second:
+        pass
+    assert first is second
+    assert engine_pool.spawn_count == 1
+
+
+def test_dead_engine_is_respawned(engine_pool):
+    with engine_pool.acquire() as engine:
+        engine.close()
+    with engine_pool.acquire() as replacement:
+        assert replacement is not engine
+        assert replacement.analyse(chess.Board(), chess.engine.Limit(depth=2))['score'] is not None
+    assert engine_pool.spawn_count == 2
+
+
+def test_acquire_times_out_when_every_engine_is_busy(engine_pool):
+    with engine_pool.acquire():
+        with pytest.raises(TimeoutError):
+            with engine_pool.acquire(timeout=0.05):
+                pass
+
+
+def test_engine_keeps_its_size_between_requests(engine_pool):
+    calls = []
+    with engine_pool.acquire(threads=1, hash_mb=32) as engine:
+        configure = engine.configure
+    engine.configure = lambda options: (calls.append(options), configure(options))
+    for _ in range(3):
+        with engine_pool.acquire(threads=1, hash_mb=32):
+            pass
+    assert calls == []
+    with engine_pool.acquire(threads=1, hash_mb=64):
+        pass
+    assert calls == [{'Threads': 1, 'Hash': 64}]
+
+
+def test_watchdog_kills_a_hung_search(monkeypatch):
+    monkeypatch.setattr(SEARCH_WATCHDOG, 'timeout', 0.3)
+    # Every search takes 30s, far past the watchdog's cap
+    pool = EnginePool(fake_engine(30000), size=1, threads=1, hash_mb=16)
+    try:
+        started = time.monotonic()
+        with pool.acquire() as engine:
+            record = _evaluate_position(engine, chess.Board(), chess.engine.Limit(depth=10), 1, object())
+        assert record is None
+        assert time.monotonic() - started < 5
+        assert pool.running == 0
+    finally:
+        pool.close()
+
@@ -0,0 +1,43 @@
+# backend/tests/test_eval_cache.py
+
+import chess
+import chess.engine
+
+from analysis.eval_cache import EvalCache
+
+DEPTH_12 = chess.engine.Limit(depth=12)
+DEPTH_18 = chess.engine.Limit(depth=18)
+
+
+def _record():
+    return {'score': 35, 'pv': ["e2e4", "e7e5", "g1f3", "b8c6"], 'lines': ["e2e4", "d2d4", "c2c4"],
+            'depth': 18, 'unstable': False}
+
+
+def test_round_trip_returns_the_stored_record():
+    cache = EvalCache()
+    cache.put(chess.Board(), DEPTH_18, 3, _record())
+    assert cache.get(chess.Board(), DEPTH_18, 3) == _record()
+
+
+def test_deeper_entry_serves_shallower_request_with_fewer_lines():
+    cache = EvalCache()
+    cache.put(chess.Board(), DEPTH_18, 3, _record())
+    record = cache.get(chess.Board(), DEPTH_12, 1)
+    assert record['lines'] == ["e2e4"]
+    assert record['pv'] == _record()['pv']
+    assert cache.get(chess.Board(), chess.engine.Limit(depth=20), 1) is None
+    assert cache.get(chess.Board(), DEPTH_12, 5) is None
+
+
+def test_cache_is_bounded_by_estimated_bytes():
+    cache = EvalCache(max_entries=1000, max_mb=0.002)
+    board = chess.Board()
+    for move in list(board.legal_moves):
+        board.push(move)
+        cache.put(board, DEPTH_18, 3, _record())
+        board.pop()
+    assert 0 < len(cache) < board.legal_moves.count()
+    assert cache.bytes <= cache.max_bytes
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
@@ -0,0 +1,64 @@
+# backend/tests/test_fast_paths.py
+
+import chess
+import chess.engine
+import pytest
+
+from analysis.analyzer import TABLEBASE_WIN_SCORE, _Evaluator, _probe_tablebase, analyze_game
+
+from conftest import OPERA_GAME
+
+STALEMATE_GAME = ('[Event "Loyd"]\n\n1. e3 a5 2. Qh5 Ra6 3. Qxa5 h5 4. h4 Rah6 5. Qxc7 f6 6. Qxd7+ Kf7 '
+                  '7. Qxb7 Qd3 8. Qxb8 Qh7 9. Qxc8 Kg6 10. Qe6 1/2-1/2\n')
+KQK = '8/8/8/8/8/2k5/8/KQ6 w - - 0 1'
+
+
+class FakeTablebase:
+    """Three-piece tables in which the side with the queen wins in five."""
+
+    def probe_wdl(self, board: chess.Board) -> int:
+        if chess.popcount(board.occupied) > 3:
+            raise KeyError("no table")
+        if board.pieces(chess.QUEEN, board.turn):
+            return 2
+        return -2 if board.pieces(chess.QUEEN, not board.turn) else 0
+
+    def probe_dtz(self, board: chess.Board) -> int:
+        wdl = self.probe_wdl(board)
+        return 5 if wdl > 0 else -5 if wdl < 0 else 0
+
+
+def test_tablebase_positions_are_scored_without_search():
+    record = _probe_tablebase(FakeTablebase(), chess.Board(KQK), 3)
+    assert record['score'] == TABLEBASE_WIN_SCORE - 5
+    assert len(record['lines']) == 3 and record['pv'] == record['lines'][:1]
+    black_to_move = _probe_tablebase(FakeTablebase(), chess.Board(KQK.replace(' w ', ' b ')), 1)
+    assert black_to_move['score'] == TABLEBASE_WIN_SCORE - 5
+
+
+def test_tablebase_wins_past_the_halfmove_clock_are_draws():
+    assert _probe_tablebase(FakeTablebase(), chess.Board(KQK.replace(' 0 1', ' 99 80')), 1)['score'] == 0
+
+
+@pytest.mark.parametrize('fen', [chess.STARTING_FEN, '8/8/8/8/8/2k5/8/KQ5r w - - 0 1'])
+def test_positions_the_tables_do_not_cover_are_searched(fen):
+    assert _probe_tablebase(FakeTablebase(), chess.Board(fen), 1) is None
+
+
+def test_tablebase_hits_skip_the_engine():
+    # No engine at all: any search would fail
+    evaluator = _Evaluator(None, object(), None, tablebase=FakeTablebase())
+    record = evaluator.evaluate(chess.Board(KQK), chess.engine.Limit(depth=20), 1)
+    assert record['score'] == TABLEBASE_WIN_SCORE - 5
+    assert evaluator.fast_paths == {'terminal': 0, 'tablebase': 1, 'forced': 0}
+
+
+def test_finished_and_forced_positions_skip_the_engine(engine_pool):
+    stalemate = analyze_game(STALEMATE_GAME, depth=6, engine_pool=engine_pool, eval_cache=None)
+    assert stalemate['analysis_params']['fast_paths']['terminal'] == 1
+    assert stalemate['moves_meta'][-1]['eval'] == 0
+
+    mate = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None)
+    # 16...Nxb8 is Black's only move
+    assert mate['analysis_params']['fast_paths'] == {'terminal': 1, 'tablebase': 0, 'forced': 1}
+    assert mate['moves_meta'][31]['category'] == 'best'
@@ -0,0 +1,105 @@
+# backend/tests/test_live.py
+
+import json
+import asyncio
+
+from starlette.websockets import WebSocketDisconnect
+
+from analysis.analyzer import LiveAnalysis, analyze_game
+import live
+from live import LiveSession
+from scheduler import FairScheduler
+
+from conftest import OPERA_GAME, mainline_uci
+
+
+class FakeWebSocket:
+    """Replays client messages, records what the session sends and
+    disconnects once `replies` events of type 'ply' or 'takeback' were sent."""
+
+    def __init__(self, messages, replies):
+        self.messages = [json.dumps(m) for m in messages]
+        self.replies = replies
+        self.sent = []
+        self._done = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        self.sent.append({'type': 'closed', 'code': code})
+
+    async def receive_text(self):
+        if self.messages:
+            return self.messages.pop(0)
+        await self._done.wait()
+        raise WebSocketDisconnect()
+
+    async def send_json(self, event):
+        self.sent.append(event)
+        if sum(1 for e in self.sent if e['type'] in ('ply', 'takeback')) >= self.replies:
+            self._done.set()
+
+
+def _session(engine_pool, websocket, scheduler) -> LiveSession:
+    make_analysis = lambda fen, options: LiveAnalysis(fen, depth=6, eval_cache=None)  # noqa: E731
+    return LiveSession(websocket, engine_pool, make_analysis, None, scheduler, "ip:test")
+
+
+def _run(engine_pool, messages, replies, scheduler=None):
+    async def session():
+        websocket = FakeWebSocket(messages, replies)
+        await _session(engine_pool, websocket, scheduler or FairScheduler(1)).run()
+        return websocket.sent
+
+    return asyncio.run(session())
+
+
+def test_moves_are_answered_like_a_full_analysis(engine_pool):
+    moves = mainline_uci(OPERA_GAME)
+    sent = _run(engine_pool, [{'type': 'start'}] + [{'type': 'move', 'uci': uci} for uci in moves], len(moves))
+    plies = [e for e in sent if e['type'] == 'ply']
+    whole = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None)
+    assert [{k: v for k, v in p.items() if k not in ('type', 'fen')} for p in plies] == whole['moves_meta']
+    assert engine_pool.running == 1
+
+
+def test_takebacks_keep_the_plies_in_common(engine_pool):
+    sent = _run(engine_pool, [{'type': 'moves', 'moves': ['e2e4', 'e7e5', 'g1f3']},
+                              {'type': 'moves', 'moves': ['e2e4', 'e7e5', 'f1c4', 'g8f6']}], 6)
+    assert [e['type'] for e in sent] == ['start', 'ply', 'ply', 'ply', 'takeback', 'ply', 'ply']
+    assert sent[4]['plies'] == 2
+    assert [e['played_uci'] for e in sent[5:]] == ['f1c4', 'g8f6']
+
+
+def test_bad_messages_are_reported_and_the_session_goes_on(engine_pool):
+    sent = _run(engine_pool, [{'type': 'start'}, {'type': 'move', 'uci': 'e2e5'}, {'type': 'bogus'},
+                              {'type': 'move', 'uci': 'e2e4'}], 1)
+    assert [e['type'] for e in sent] == ['start', 'error', 'error', 'ply']
+
+
+def test_sessions_wait_for_a_scheduler_slot(engine_pool, monkeypatch):
+    monkeypatch.setattr(live, 'LIVE_QUEUE_UPDATE', 0.05)
+    scheduler = FairScheduler(1)
+    busy = scheduler.submit("ip:someone-else", 1)
+
+    async def session():
+        asyncio.get_running_loop().call_later(0.2, scheduler.release, busy)
+        websocket = FakeWebSocket([{'type': 'start'}, {'type': 'move', 'uci': 'e2e4'}], 1)
+        await _session(engine_pool, websocket, scheduler).run()
+        return websocket.sent
+
+    sent = asyncio.run(session())
+    kinds = [e['type'] for e in sent]
+    assert kinds[0] == 'queued' and kinds[-2:] == ['start', 'ply']
+    assert sent[0]['position'] == 1
+    # The slot went back with the engine
+    assert scheduler.running == 0
+
+
+def test_a_full_queue_turns_the_message_away(engine_pool):
+    scheduler = FairScheduler(1, max_queue=0)
+    scheduler.submit("ip:someone-else", 1)
+    sent = _run(engine_pool, [{'type': 'start'}, {'type': 'move', 'uci': 'e2e4'}], 0, scheduler)
+    assert [e['type'] for e in sent] == ['error', 'error']
+    assert sent[0]['retry_after'] >= 1
@@ -0,0 +1,47 @@
+# backend/tests/test_load_test.py
+
+import argparse
+import io
+import random
+import sys
+
+import chess.pgn
+import pytest
+
+from conftest import BACKEND_DIR, CORPUS, OPERA_GAME
+
+sys.path.insert(0, str(BACKEND_DIR / "tools"))
+
+import load_test  # noqa: E402
+
+
+def test_percentiles_pick_a_sample():
+    values = sorted(float(v) for v in range(1, 101))
+    assert load_test.percentile(values, 50) == 50
+    assert load_test.percentile(values, 99) == 99
+    assert load_test.percentile(values, 100) == 100
+    assert load_test.percentile([7.0], 95) == 7
+    assert load_test.percentile([], 95) == 0
+
+
+def test_mix_is_parsed_with_default_weights():
+    assert load_test.parse_mix("analyze=3,games,health=0.5") == {'analyze': 3, 'games': 1, 'health': 0.5}
+    with pytest.raises(ValueError):
+        load_test.parse_mix("analyze,stream")
+
+
+def test_truncated_games_keep_their_headers():
+    game = chess.pgn.read_game(io.StringIO(OPERA_GAME))
+    short = chess.pgn.read_game(io.StringIO(load_test.truncated_pgn(game, 4)))
+    assert list(short.mainline_moves()) == list(game.mainline_moves())[:4]
+    assert short.headers["White"] == game.headers["White"]
+    assert short.headers["Result"] == "*"
+
+
+def test_workload_follows_the_mix():
+    args = argparse.Namespace(repeat_games=False, depth=8)
+    workload = load_test.Workload(load_test.load_games(CORPUS), {'analyze': 1}, args, random.Random(0))
+    endpoint, method, path, body = workload.next_request()
+    assert (endpoint, method, path) == ('analyze', 'POST', '/analyze')
+    assert body["options"]["depth"] == 8
+    assert chess.pgn.read_game(io.StringIO(body["pgn"])).mainline_moves()
@@ -0,0 +1,82 @@
+# backend/tests/test_resources.py
+
+import threading
+
+from analysis.analyzer import analyze_game
+from analysis.engine_pool import EnginePool
+from analysis.resources import ResourceGovernor
+
+from conftest import SCHOLARS_MATE, fake_engine
+
+
+def test_requests_are_clamped_to_the_per_request_caps():
+    governor = ResourceGovernor(cpu_threads=4, hash_mb=512, max_threads=2, max_hash_mb=128)
+    assert governor.clamp(20, 4096) == (2, 128)
+    assert governor.clamp(0, 1) == (1, governor.min_hash_mb)
+
+
+def test_grants_share_the_budget():
+    governor = ResourceGovernor(cpu_threads=4, hash_mb=512)
+    governor.hold('a', 128)
+    governor.hold('b', 128)
+    first = governor.reserve('a', 4, 512)
+    # One thread is kept back for the idle engine 'b'
+    assert (first.threads, first.hash_mb) == (3, 384)
+    second = governor.reserve('b', 4, 512)
+    assert second.threads == 1 and second.hash_mb == 128
+    assert governor.status()['hash_used_mb'] <= 512
+    governor.release(first)
+    governor.release(second)
+    assert governor.status()['threads_used'] == 0
+    # Hash stays charged while the engines hold their tables
+    assert governor.status()['hash_used_mb'] == 512
+    governor.forget('a')
+    assert governor.status()['hash_used_mb'] == 128
+
+
+def test_engine_defaults_leave_room_to_grow():
+    threads, hash_mb = ResourceGovernor(cpu_threads=8, hash_mb=1024).engine_defaults(2)
+    assert threads == 4
+    assert hash_mb == 256
+
+
+def test_analysis_reports_the_granted_size():
+    governor = ResourceGovernor(cpu_threads=2, hash_mb=128, max_hash_mb=64)
+    pool = EnginePool(fake_engine(), size=1, governor=governor)
+    try:
+        result = analyze_game(SCHOLARS_MATE, depth=4, threads=8, hash_mb=1024, engine_pool=pool, eval_cache=None)
+        assert result['analysis_params']['threads'] == 2
+        assert result['analysis_params']['hash_mb'] == 64
+    finally:
+        pool.close()
+
+def test_governed_pool_shares_threads_and_hash():
+    governor = ResourceGovernor(cpu_threads=4, hash_mb=256)
+    pool = EnginePool(fake_engine(), size=2, governor=governor)
+    try:
+        assert (pool.threads, pool.hash_mb) == governor.engine_defaults(2)
+        pool.start()
+        held = threading.Event()
+        done = threading.Event()
+        grants = {}
+
+        def hold_engine():
+            with pool.acquire(threads=4, hash_mb=256) as engine:
+                grants['first'] = pool._sizes[id(engine)]
+                held.set()
+                done.wait(5)
+
+        worker = threading.Thread(target=hold_engine)
+        worker.start()
+        held.wait(5)
+        with pool.acquire(threads=4, hash_mb=256) as engine:
+            grants['second'] = pool._sizes[id(engine)]
+            status = governor.status()
+        done.set()
+        worker.join()
+        assert grants['first'][0] + grants['second'][0] <= 4
+        assert grants['first'][1] + grants['second'][1] <= 256
+        assert status['threads_used'] <= status['threads_budget']
+        assert governor.status()['threads_used'] == 0
+    finally:
+        pool.close()
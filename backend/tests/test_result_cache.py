@@ -0,0 +1,43 @@
+# backend/tests/test_result_cache.py
+
+from analysis.result_cache import ResultCache, result_key
+
+from conftest import SCHOLARS_MATE
+
+PARAMS = {'depth': 12, 'multipv': 3}
+
+
+def test_key_depends_on_moves_and_options_only():
+    key = result_key(SCHOLARS_MATE, PARAMS)
+    reformatted = '[White "Someone else"]\n\n1.e4 {opening} e5 2.Bc4 Nc6 3.Qh5 Nf6 4.Qxf7# *\n'
+    assert result_key(reformatted, PARAMS) == key
+    # Threads and hash change how fast the result comes, not what it is
+    assert result_key(SCHOLARS_MATE, {**PARAMS, 'threads': 8, 'hash_mb': 1024}) == key
+    assert result_key(SCHOLARS_MATE, {**PARAMS, 'depth': 14}) != key
+    assert result_key(SCHOLARS_MATE.replace('Qxf7#', 'Qxf7+'), PARAMS) == key
+    assert result_key(SCHOLARS_MATE.replace('4. Qxf7# ', ''), PARAMS) != key
+
+
+def test_entries_survive_a_restart(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    etag = cache.put('k', {'moves_meta': [1, 2]})
+    assert cache.get('k') == ({'moves_meta': [1, 2]}, etag)
+    assert ResultCache(str(tmp_path)).get('k') == ({'moves_meta': [1, 2]}, etag)
+    # The ETag is a hash of the result
+    assert cache.put('other', {'moves_meta': [1, 2]}) == etag
+    assert cache.put('k', {'moves_meta': [3]}) != etag
+
+
+def test_entries_expire_and_are_evicted(tmp_path):
+    expired = ResultCache(str(tmp_path / 'ttl'), ttl=0)
+    expired.put('k', {})
+    assert expired.get('k') is None
+
+    cache = ResultCache(str(tmp_path / 'lru'), max_entries=2)
+    cache.put('a', {})
+    cache.put('b', {})
+    cache.get('a')
+    cache.put('c', {})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert len(list((tmp_path / 'lru').iterdir())) == 2
@@ -0,0 +1,98 @@
+# backend/tests/test_scheduler.py
+
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, QueueFull, estimate_plies
+
+from conftest import OPERA_GAME
+
+# Cost of a job estimated to take more than SCHEDULER_QUICK_SECONDS
+LONG = 1000
+
+
+def _started(tickets):
+    return [t for t in tickets if t.started is not None]
+
+
+def test_plies_are_estimated_without_parsing():
+    assert estimate_plies(OPERA_GAME) == 33
+    assert estimate_plies('[Event "?"]\n\n1. e4 {best by test} e5 2. O-O-O+ *') == 3
+
+
+def test_clients_take_turns():
+    scheduler = FairScheduler(1)
+    first = scheduler.submit('a', 1)
+    queued_a = [scheduler.submit('a', 1) for _ in range(3)]
+    queued_b = scheduler.submit('b', 1)
+    assert first.started is not None
+    scheduler.release(first)
+    # 'a' just had a turn, so 'b' goes next although it came last
+    assert queued_b.started is not None
+    assert not _started(queued_a)
+
+
+def test_a_client_holding_slots_yields_to_one_without():
+    scheduler = FairScheduler(2)
+    running = [scheduler.submit('a', 1), scheduler.submit('a', 1)]
+    scheduler.submit('a', 1)
+    newcomer = scheduler.submit('b', 1)
+    scheduler.release(running[0])
+    assert newcomer.started is not None
+
+
+def test_quick_jobs_go_first():
+    scheduler = FairScheduler(1)
+    scheduler.submit('a', 1)
+    long = scheduler.submit('b', LONG)
+    quick = scheduler.submit('c', 1)
+    assert scheduler.position(quick)['position'] == 1
+    assert scheduler.position(long)['position'] == 2
+    assert scheduler.position(long)['eta_s'] > scheduler.position(quick)['eta_s']
+
+
+def test_full_queues_raise_with_retry_after():
+    scheduler = FairScheduler(1, max_queue=3, client_queue=2)
+    scheduler.submit('a', 1)
+    scheduler.submit('a', 1)
+    scheduler.submit('a', 1)
+    with pytest.raises(QueueFull) as client_full:
+        scheduler.submit('a', 1)
+    assert client_full.value.retry_after >= 1
+    scheduler.submit('b', 1)
+    with pytest.raises(QueueFull):
+        scheduler.submit('c', 1)
+    with pytest.raises(QueueFull):
+        scheduler.admit('d', 2)
+
+
+def test_hold_sets_the_estimate_without_learning():
+    scheduler = FairScheduler(1)
+    unit = scheduler.unit_seconds
+    live = scheduler.submit('live', 1, hold=20)
+    waiting = scheduler.submit('a', 1)
+    assert scheduler.position(waiting)['eta_s'] == pytest.approx(20, abs=0.5)
+    scheduler.release(live)
+    assert scheduler.unit_seconds == unit
+
+
+def test_wait_returns_once_the_slot_is_free():
+    async def run():
+        scheduler = FairScheduler(1)
+        running = scheduler.submit('a', 1)
+        waiting = scheduler.submit('b', 1)
+        assert not await scheduler.wait(waiting, 0.01)
+        asyncio.get_running_loop().call_later(0.01, scheduler.release, running)
+        assert await scheduler.wait(waiting, 1)
+
+    asyncio.run(run())
+
+
+def test_released_queued_tickets_leave_the_queue():
+    scheduler = FairScheduler(1)
+    scheduler.submit('a', 1)
+    queued = scheduler.submit('b', 1)
+    scheduler.release(queued)
+    assert scheduler.queued == 0
+    assert scheduler.status()['clients_waiting'] == 0
@@ -0,0 +1,26 @@
+# backend/tests/test_streaming.py
+
+from analysis.analyzer import analyze_game, collect_result, iter_analysis, replay_result
+
+from conftest import OPERA_GAME
+
+
+def test_events_come_one_per_ply_in_order(engine_pool):
+    events = list(iter_analysis(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None))
+    assert [e['type'] for e in events] == ['start'] + ['ply'] * 33 + ['summary']
+    plies = [e for e in events if e['type'] == 'ply']
+    assert [e['ply_index'] for e in plies] == list(range(33))
+    assert plies[-1]['played_uci'] == 'd1d8'
+    assert plies[-1]['fen'].startswith('1n1Rkb1r/')
+
+
+def test_streamed_result_matches_analyze_game(engine_pool):
+    streamed = collect_result(iter_analysis(OPERA_GAME, depth=6, multipv=2, engine_pool=engine_pool, eval_cache=None))
+    whole = analyze_game(OPERA_GAME, depth=6, multipv=2, engine_pool=engine_pool, eval_cache=None)
+    for field in ('white', 'black', 'fen_history', 'moves_meta'):
+        assert streamed[field] == whole[field]
+
+
+def test_replayed_result_collects_to_itself(engine_pool):
+    result = analyze_game(OPERA_GAME, depth=6, engine_pool=engine_pool, eval_cache=None)
+    assert collect_result(replay_result(result)) == result
@@ -0,0 +1,114 @@
+# backend/tests/test_upstream.py
+
+import json
+import asyncio
+
+import httpx
+
+import upstream
+from upstream import UpstreamCache
+
+
+class Upstream:
+    """Mock upstream serving `documents` by path, with ETags, and logging every request."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.requests = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        document = self.documents.get(request.url.path)
+        if document is None:
+            return httpx.Response(404)
+        etag = f'"{hash(json.dumps(document))}"'
+        if request.headers.get('if-none-match') == etag:
+            return httpx.Response(304, headers={'ETag': etag})
+        return httpx.Response(200, json=document, headers={'ETag': etag})
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle), base_url="https://upstream")
+
+
+def test_fresh_documents_skip_the_network_and_stale_ones_revalidate():
+    server = Upstream({'/a': {'games': [1]}})
+
+    async def run():
+        cache = UpstreamCache()
+        async with server.client() as client:
+            # Stored already stale, so the next read revalidates with one 304 round trip
+            assert await cache.get_json(client, 'https://upstream/a', ttl=0) == (200, {'games': [1]})
+            assert await cache.get_json(client, 'https://upstream/a', ttl=60) == (200, {'games': [1]})
+            assert server.requests[-1].headers['if-none-match']
+            # Fresh again now
+            assert await cache.get_json(client, 'https://upstream/a', ttl=60) == (200, {'games': [1]})
+            assert len(server.requests) == 2
+
+    asyncio.run(run())
+
+
+def test_failures_are_not_cached_and_the_cache_is_bounded():
+    server = Upstream({'/a': {}, '/b': {}})
+
+    async def run():
+        cache = UpstreamCache(max_entries=1)
+        async with server.client() as client:
+            assert await cache.get_json(client, 'https://upstream/missing', ttl=60) == (404, None)
+            assert await cache.get_json(client, 'https://upstream/missing', ttl=60) == (404, None)
+            await cache.get_json(client, 'https://upstream/a', ttl=60)
+            await cache.get_json(client, 'https://upstream/b', ttl=60)
+            await cache.get_json(client, 'https://upstream/a', ttl=60)
+        assert [r.url.path for r in server.requests] == ['/missing', '/missing', '/a', '/b', '/a']
+
+    asyncio.run(run())
+
+
+def test_archives_are_fetched_newest_first_until_enough_games():
+    months = {f'/games/2024/{m:02d}': {'games': [f'{m}-{g}' for g in range(10)]} for m in range(1, 13)}
+    server = Upstream(months)
+    archives = [f'https://upstream{path}' for path in months]
+
+    async def run():
+        async with server.client() as client:
+            return await upstream.fetch_archives(client, UpstreamCache(), archives, 25)
+
+    games = asyncio.run(run())
+    assert games == [f'{m}-{g}' for m in (10, 11, 12) for g in range(10)][-25:]
+    # One month is estimated at GAMES_PER_MONTH_ESTIMATE games, so the first wave is one
+    # archive; the second is sized from what it held
+    assert [r.url.path for r in server.requests] == ['/games/2024/12', '/games/2024/11', '/games/2024/10']
+
+
+def test_archive_fetches_are_bounded(monkeypatch):
+    monkeypatch.setattr(upstream, 'ARCHIVE_CONCURRENCY', 2)
+    monkeypatch.setattr(upstream, 'GAMES_PER_MONTH_ESTIMATE', 1)
+    in_flight = peak = 0
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={'games': [request.url.path]})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handle)) as client:
+            archives = [f'https://upstream/{m}' for m in range(8)]
+            return await upstream.fetch_archives(client, UpstreamCache(), archives, 8)
+
+    assert asyncio.run(run()) == [f'/{m}' for m in range(8)]
+    assert peak == 2
+
+
+def test_ndjson_is_parsed_line_by_line():
+    body = b'{"id": 1}\n\n{"id": 2}\n'
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            streamed = await upstream.stream_ndjson(client, 'https://upstream/games')
+            followed = [item async for item in upstream.iter_ndjson(client, 'https://upstream/games')]
+        return streamed, followed
+
+    assert asyncio.run(run()) == ((200, [{'id': 1}, {'id': 2}]), [{'id': 1}, {'id': 2}])
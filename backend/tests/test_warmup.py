@@ -0,0 +1,37 @@
+# backend/tests/test_warmup.py
+
+import asyncio
+
+from analysis.engine_pool import EnginePool
+from scheduler import FairScheduler
+from warmup import Warmup
+
+from conftest import fake_engine
+
+
+def test_engines_are_only_warmed_on_free_slots():
+    pool = EnginePool(fake_engine(200), size=2, threads=1, hash_mb=16)
+    scheduler = FairScheduler(2)
+    warmup = Warmup(pool, lambda pgn: None, scheduler=scheduler)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        busy = scheduler.submit('a', 1)
+        warming = asyncio.ensure_future(warmup._warm_engines(loop))
+        await asyncio.sleep(0.1)
+        # The warm-up holds the one free slot while it searches
+        assert scheduler.running == 2
+        assert await warming == 1
+        assert scheduler.running == 1
+
+        # With every slot taken, and a job waiting, nothing is warmed
+        scheduler.submit('b', 1)
+        waiting = scheduler.submit('c', 1)
+        assert await warmup._warm_engines(loop) == 0
+        assert waiting.started is None and scheduler.running == 2
+
+    try:
+        asyncio.run(run())
+        assert pool.spawn_count == 1
+    finally:
+        pool.close()
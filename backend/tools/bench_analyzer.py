@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for analyze_game.
+
+Runs the analyzer over a fixed PGN corpus and separates the time spent inside
+engine calls (search plus UCI round trips) from the Python work around them:
+PGN parsing, board bookkeeping, move assessment and result building. By default
+it drives tools/fake_uci_engine.py, which answers instantly and
+deterministically, so the numbers mostly measure our own overhead.
+
+Each repeat runs two passes over the corpus:
+1. cold: empty evaluation cache, every position goes to the engine
+2. warm: same cache again, so positions are served from the cache
+
+A third, separate pass runs under tracemalloc to report peak allocations.
+
+Usage:
+  python tools/bench_analyzer.py [--engine PATH] [--depth N] [--repeat N]
+                                 [--baseline FILE] [--update-baseline] [--check]
+
+Results are compared against a stored baseline (tools/bench/baseline.json).
+--check exits non-zero if a metric regressed by more than --tolerance.
+Baselines are machine-specific: the baseline records the machine it was
+measured on and the command that measured it, and --check only compares
+against a baseline from the same machine. Record one with
+
+  python tools/bench_analyzer.py --repeat 5 --update-baseline
+
+on an otherwise idle machine, before the change under test.
+"""
+import gc
+import io
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import cProfile
+import pstats
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+
+import chess.pgn
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from analysis.analyzer import analyze_game, split_pgn_games  # noqa: E402
+from analysis.engine_pool import EnginePool  # noqa: E402
+from analysis.eval_cache import EvalCache  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+BENCH_DIR = Path(__file__).resolve().parent / "bench"
+DEFAULT_CORPUS = BENCH_DIR / "corpus.pgn"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+FAKE_ENGINE = Path(__file__).resolve().parent / "fake_uci_engine.py"
+
+# Metric name -> True if higher is better
+METRICS = {
+    'cold_plies_per_sec': True,
+    'warm_plies_per_sec': True,
+    'python_ms_per_ply': False,
+    'engine_ms_per_ply': False,
+    'parse_ms_per_game': False,
+    'peak_alloc_kib': False,
+}
+
+
+class _TimedEngine:
+    """Engine proxy that accumulates the wall time spent in analyse()."""
+
+    def __init__(self, engine, clock: Dict[str, float]):
+        self._engine = engine
+        self._clock = clock
+
+    def analyse(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._engine.analyse(*args, **kwargs)
+        finally:
+            self._clock['engine_s'] += time.perf_counter() - start
+            self._clock['searches'] += 1
+
+    def __getattr__(self, name):
+        return getattr(self._engine, name)
+
+
+class _TimedPool(EnginePool):
+    """EnginePool handing out _TimedEngine proxies."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock = {'engine_s': 0.0, 'searches': 0}
+
+    @contextmanager
+    def acquire(self, timeout=None, **sizes):
+        with super().acquire(timeout, **sizes) as engine:
+            yield _TimedEngine(engine, self.clock)
+
+
+def load_corpus(path: Path) -> List[str]:
+    with open(path, encoding='utf-8') as f:
+        return split_pgn_games(f.read())
+
+
+def count_plies(games: List[str]) -> int:
+    return sum(len(list(chess.pgn.read_game(io.StringIO(g)).mainline_moves())) for g in games)
+
+
+def run_pass(games: List[str], pool: _TimedPool, cache: EvalCache, args) -> Dict[str, Any]:
+    """Analyze every game once; return wall/engine time and cache counters."""
+    pool.clock.update(engine_s=0.0, searches=0)
+    hits = misses = 0
+    start = time.perf_counter()
+    for pgn in games:
+        result = analyze_game(pgn, depth=args.depth, multipv=args.multipv,
+                              engine_pool=pool, eval_cache=cache)
+        hits += result['analysis_params']['cache_hits']
+        misses += result['analysis_params']['cache_misses']
+    return {
+        'wall_s': time.perf_counter() - start,
+        'engine_s': pool.clock['engine_s'],
+        'searches': pool.clock['searches'],
+        'cache_hits': hits,
+        'cache_misses': misses,
+    }
+
+
+def measure_parse(games: List[str], repeat: int = 5) -> float:
+    """Fastest of `repeat` parses of the whole corpus with python-chess (seconds)."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for pgn in games:
+            game = chess.pgn.read_game(io.StringIO(pgn))
+            board = game.board()
+            for move in game.mainline_moves():
+                board.push(move)
+        samples.append(time.perf_counter() - start)
+    # The fastest run is the least disturbed by whatever else the machine was doing
+    return min(samples)
+
+
+def measure_peak_allocation(games: List[str], pool: _TimedPool, args) -> float:
+    """Peak traced Python allocation (KiB) during one cold pass."""
+    # Garbage left by earlier passes would otherwise be collected, or not, mid-pass
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_pass(games, pool, EvalCache(), args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    games = load_corpus(Path(args.corpus))
+    plies = count_plies(games)
+    engine = args.engine or [sys.executable, str(FAKE_ENGINE), "--latency-ms", str(args.latency_ms)]
+    pool = _TimedPool(engine, size=1, threads=1, hash_mb=args.hash)
+    pool.start()
+    try:
+        # One untimed pass so process start-up and imports don't skew the first sample
+        run_pass(games[:1], pool, EvalCache(), args)
+
+        cold_runs, warm_runs = [], []
+        for _ in range(args.repeat):
+            cache = EvalCache()
+            cold_runs.append(run_pass(games, pool, cache, args))
+            warm_runs.append(run_pass(games, pool, cache, args))
+
+        if args.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            run_pass(games, pool, EvalCache(), args)
+            profiler.disable()
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+        peak_kib = measure_peak_allocation(games, pool, args)
+    finally:
+        pool.close()
+
+    cold = min(cold_runs, key=lambda r: r['wall_s'])
+    warm = min(warm_runs, key=lambda r: r['wall_s'])
+    python_s = cold['wall_s'] - cold['engine_s']
+    return {
+        'games': len(games),
+        'plies': plies,
+        'cold': cold,
+        'warm': warm,
+        'metrics': {
+            'cold_plies_per_sec': plies / cold['wall_s'],
+            'warm_plies_per_sec': plies / warm['wall_s'],
+            'python_ms_per_ply': 1000 * python_s / plies,
+            'engine_ms_per_ply': 1000 * cold['engine_s'] / plies,
+            'parse_ms_per_game': 1000 * measure_parse(games) / len(games),
+            'peak_alloc_kib': peak_kib,
+        },
+        'engine_share': cold['engine_s'] / cold['wall_s'],
+        'cold_hit_rate': _hit_rate(cold),
+        'warm_hit_rate': _hit_rate(warm),
+    }
+
+
+def _hit_rate(run: Dict[str, Any]) -> float:
+    lookups = run['cache_hits'] + run['cache_misses']
+    return run['cache_hits'] / lookups if lookups else 0.0
+
+
+def machine_notes() -> Dict[str, Any]:
+    """What the timings depend on, so baselines from elsewhere are not compared."""
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    except OSError:
+        pass
+    return {
+        'system': f"{platform.system()} {platform.machine()}",
+        'cpu': cpu,
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'python_chess': chess.__version__,
+    }
+
+
+def _revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(metrics: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Print metrics next to the baseline; return the names that regressed."""
+    regressions = []
+    print(f"\n{'metric':<22}{'current':>12}{'baseline':>12}{'change':>10}")
+    for name, higher_is_better in METRICS.items():
+        current = metrics[name]
+        reference = baseline.get(name)
+        if not reference:
+            print(f"{name:<22}{current:>12.2f}{'-':>12}{'':>10}")
+            continue
+        change = (current - reference) / reference
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSED" if worse > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<22}{current:>12.2f}{reference:>12.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analyze_game against a fixed corpus")
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="PGN corpus")
+    parser.add_argument("--engine", help="UCI engine to use instead of the fake engine")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Per-search latency of the fake engine")
+    parser.add_argument("--depth", type=int, default=12, help="Search depth")
+    parser.add_argument("--multipv", type=int, default=3, help="Lines per position")
+    parser.add_argument("--hash", type=int, default=16, help="Engine hash size (MB)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeats; the fastest is reported")
+    parser.add_argument("--profile", action="store_true", help="Print a cProfile of one cold pass")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative regression per metric")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    report = run_benchmark(args)
+    cold, warm = report['cold'], report['warm']
+    print(f"Corpus: {report['games']} games, {report['plies']} plies, depth {args.depth}, multipv {args.multipv}")
+    print(f"Cold: {cold['wall_s']:.3f}s, {cold['searches']} searches, "
+          f"engine {report['engine_share']:.0%} / python {1 - report['engine_share']:.0%}, "
+          f"cache hit rate {report['cold_hit_rate']:.0%}")
+    print(f"Warm: {warm['wall_s']:.3f}s, {warm['searches']} searches, "
+          f"cache hit rate {report['warm_hit_rate']:.0%}")
+
+    baseline_path = Path(args.baseline)
+    stored = {}
+    if baseline_path.exists():
+        with open(baseline_path, encoding='utf-8') as f:
+            stored = json.load(f)
+    notes = machine_notes()
+    comparable = stored.get('machine') == notes and (stored.get('depth'), stored.get('multipv')) == (
+        args.depth, args.multipv)
+    regressions = compare(report['metrics'], stored.get('metrics', {}), args.tolerance)
+    if stored and not comparable:
+        print(f"\nBaseline was measured on {stored.get('machine')} at depth {stored.get('depth')}, "
+              f"multipv {stored.get('multipv')}; this run is not comparable. "
+              f"Record a baseline here first (see --help).")
+
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'machine': notes,
+                'revision': _revision(),
+                'command': ' '.join(['python', 'tools/bench_analyzer.py'] + sys.argv[1:]),
+                'engine': 'fake' if not args.engine else args.engine,
+                'depth': args.depth,
+                'multipv': args.multipv,
+                'metrics': {k: round(v, 3) for k, v in report['metrics'].items()},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline saved to {baseline_path}")
+
+    if args.check and not comparable:
+        print("Nothing checked: no baseline from this machine")
+        sys.exit(2)
+    if args.check and regressions:
+        print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,32 +8,43 @@ This script calibrates centipawn-loss thresholds for move categories by:
 3. Using machine learning techniques to find optimal thresholds
 4. Validating results against known good/bad moves
 
-The calibration can use two modes:
-1. Reference JSON with pre-labeled moves (fast)
-2. Full game analysis with Stockfish (thorough)
+The calibration can use three modes:
+1. Reference JSON / NDJSON with pre-labeled moves (fast). The input is streamed
+   into a memory-mapped columns directory, so it never has to fit in memory.
+2. Full game analysis with Stockfish (thorough), spread over a process pool.
+   Raw per-move evals and features are saved to a .npz dataset.
+3. Re-calibration from a saved dataset, without running the engine
 
 Usage:
-  python calibrate_thresholds.py [--mode reference|analysis] input_file
+  python calibrate_thresholds.py [--mode reference|analysis|dataset] input_file
 
 For reference mode: input_file should be JSON with move objects:
   [{"cp_loss": 42, "ref_category": "inaccuracy"}, ...]
+or the same objects one per line (NDJSON).
   
 For analysis mode: input_file should be a PGN file with games to analyze.
+For dataset mode: input_file should be a .npz file written by analysis mode or
+a columns directory written by reference mode.
 
 The script uses statistical analysis and cross-validation to ensure robust
 threshold values that work well across different playing strengths and styles.
 """
+import io
+import os
+import re
 import json
 import sys
+import multiprocessing.util
 import chess
 import chess.pgn
 import chess.engine
 import logging
-import statistics
-import random
 from pathlib import Path
 from collections import Counter, defaultdict
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
 
 # Configure logging
 logging.basicConfig(
@@ -57,6 +68,47 @@ INITIAL_THRESHOLDS = {
     'blunder': 400    # Game-changing errors
 }
 
+# Categories decided purely by cp_loss > 0, in threshold order
+SEGMENT_CATS = ["excellent", "good", "inaccuracy", "mistake", "blunder"]
+BOUNDED_CATS = SEGMENT_CATS[:-1]
+
+# ref_code values that are not indices into CATS
+UNLABELLED = -1
+UNKNOWN_CATEGORY = len(CATS)
+
+# Columns of the per-move calibration dataset and their dtypes
+DATASET_COLUMNS = {
+    'cp_loss': np.int32,
+    'ref_code': np.int8,
+    'fullmove': np.int16,
+    'score_before': np.int32,
+    'score_after': np.int32,
+    'best_move_played': np.bool_,
+    'material_count': np.int8,
+    'position_complexity': np.int16,
+    'attacking_possibilities': np.int16,
+}
+
+# Columns of reference-mode datasets converted from JSON
+REFERENCE_COLUMNS = {
+    'cp_loss': np.float32,
+    'ref_code': np.int8,
+    'material_sacrificed': np.bool_,
+    'material_count': np.int8,
+    'position_complexity': np.int16,
+    'attacking_possibilities': np.int16,
+}
+
+# Rows processed at a time when converting or scanning datasets
+CHUNK_ROWS = 1_000_000
+# JSON moves buffered as Python objects before being written as columns
+CONVERT_BATCH_ROWS = 50_000
+COLUMNS_META = 'meta.json'
+_RECORD_SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+# Score assigned to forced mates, from the side to move's point of view
+MATE_SCORE = 10000
+
 def map_category(cp_loss: float, thresholds: Dict[str, float], 
                 position_features: Optional[Dict] = None) -> str:
     """
@@ -86,18 +138,71 @@ def map_category(cp_loss: float, thresholds: Dict[str, float],
     return 'blunder'
 
 
-def score_thresholds(data, thresholds):
-    mismatches = 0
-    total = 0
+def _ref_code(category: Optional[str]) -> int:
+    if category is None:
+        return UNLABELLED
+    return CATS.index(category) if category in CATS else UNKNOWN_CATEGORY
+
+
+def _as_columns(data) -> Mapping[str, np.ndarray]:
+    """
+    Normalise calibration input to a mapping of column arrays.
+
+    Accepts a list of move dicts, a (cp_loss, ref_code) pair, or the column
+    mapping returned by load_dataset (possibly memory-mapped). Moves without a
+    cp_loss are dropped. Moves without a ref_category get code UNLABELLED and
+    are ignored. Categories outside CATS get code UNKNOWN_CATEGORY, so they
+    can never be predicted correctly.
+    """
+    if isinstance(data, tuple):
+        return {'cp_loss': data[0], 'ref_code': data[1]}
+    if isinstance(data, Mapping):
+        return data
+    cp, ref = [], []
     for item in data:
-        cp = item.get('cp_loss')
-        ref = item.get('ref_category')
-        if cp is None or ref is None:
+        if item.get('cp_loss') is None:
             continue
-        pred = map_category(cp, thresholds)
-        if pred != ref:
-            mismatches += 1
-        total += 1
+        cp.append(item['cp_loss'])
+        ref.append(_ref_code(item.get('ref_category')))
+    return {'cp_loss': np.asarray(cp, dtype=np.float64), 'ref_code': np.asarray(ref, dtype=np.int8)}
+
+
+def _iter_chunks(columns: Mapping[str, np.ndarray],
+                 min_move: int = 0) -> Iterator[Tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Yield (start, keep, cp_loss, ref_code) for CHUNK_ROWS rows at a time.
+
+    `keep` marks labelled rows at or after `min_move` (when the data has a
+    fullmove column). Only one chunk is materialised at a time, so memory use
+    stays flat for memory-mapped columns.
+    """
+    cp_column, ref_column = columns['cp_loss'], columns['ref_code']
+    fullmove = columns.get('fullmove')
+    for start in range(0, len(cp_column), CHUNK_ROWS):
+        stop = start + CHUNK_ROWS
+        cp = np.asarray(cp_column[start:stop], dtype=np.float64)
+        ref = np.asarray(ref_column[start:stop])
+        keep = ref != UNLABELLED
+        if fullmove is not None and min_move > 0:
+            keep &= np.asarray(fullmove[start:stop]) >= min_move
+        yield start, keep, cp, ref
+
+
+def predict_codes(cp: np.ndarray, thresholds: Dict[str, float]) -> np.ndarray:
+    """Vectorized map_category (without position features), as CATS indices."""
+    # Running max makes the ordered "first threshold >= cp" test a binary search
+    bounds = np.maximum.accumulate([thresholds[cat] for cat in BOUNDED_CATS])
+    codes = CATS.index('excellent') + np.searchsorted(bounds, cp, side='left')
+    codes = np.where(cp == 0, CATS.index('best'), codes)
+    return np.where(cp < 0, CATS.index('great'), codes).astype(np.int8)
+
+
+def score_thresholds(data, thresholds, min_move: int = 0):
+    mismatches = 0
+    total = 0
+    for _, keep, cp, ref in _iter_chunks(_as_columns(data), min_move):
+        mismatches += int(np.count_nonzero(predict_codes(cp[keep], thresholds) != ref[keep]))
+        total += int(np.count_nonzero(keep))
     return mismatches, total
 
 
@@ -118,10 +223,8 @@ def analyze_position(engine: chess.engine.SimpleEngine, board: chess.Board,
             info=chess.engine.INFO_SCORE | chess.engine.INFO_PV
         )
         
-        # Extract evaluation
-        score = info[0]["score"].relative.score()
-        if score is None:  # Handle mate scores
-            score = 10000 if info[0]["score"].relative.is_mate() else -10000
+        # Extract evaluation; mates count as +/-MATE_SCORE for the side to move
+        score = info[0]["score"].relative.score(mate_score=MATE_SCORE)
             
         # Get best moves
         best_moves = [line["pv"][0].uci() for line in info if "pv" in line]
@@ -140,136 +243,405 @@ def analyze_position(engine: chess.engine.SimpleEngine, board: chess.Board,
         logger.error(f"Engine analysis failed: {e}")
         return 0, [], {}
 
-def find_best_thresholds(data: List[Dict], folds: int = 5) -> Dict[str, float]:
+# Per-process engine used by the calibration worker pool
+_worker_engine: Optional[chess.engine.SimpleEngine] = None
+
+
+def _init_worker(engine_path: str, hash_mb: int) -> None:
+    global _worker_engine
+    _worker_engine = chess.engine.SimpleEngine.popen_uci(engine_path)
+    try:
+        _worker_engine.configure({'Threads': 1, 'Hash': hash_mb})
+    except Exception as e:
+        logger.warning(f"Some engine configuration failed: {e}")
+    # Run on worker exit; atexit would be too late, the engine thread blocks shutdown
+    multiprocessing.util.Finalize(None, _worker_engine.quit, exitpriority=10)
+
+
+def analyze_game_moves(pgn_text: str, depth: int) -> Dict[str, List]:
+    """
+    Evaluate every position of one game once and derive per-move rows.
+
+    The evaluation after a move is the evaluation before the next one, so a game
+    of N moves costs N + 1 searches instead of 2N. Runs inside a pool worker.
+
+    Returns:
+        Dictionary of DATASET_COLUMNS lists, one entry per move
+    """
+    game = chess.pgn.read_game(io.StringIO(pgn_text))
+    columns: Dict[str, List] = {name: [] for name in DATASET_COLUMNS}
+    if game is None:
+        return columns
+
+    board = game.board()
+    moves = list(game.mainline_moves())
+    positions = []
+    for i in range(len(moves) + 1):
+        if board.is_checkmate():
+            positions.append((-MATE_SCORE, [], {}))
+        elif board.is_game_over():
+            positions.append((0, [], {}))
+        else:
+            positions.append(analyze_position(_worker_engine, board, depth))
+        if i < len(moves):
+            columns['fullmove'].append(board.fullmove_number)
+            board.push(moves[i])
+
+    for i, move in enumerate(moves):
+        score_before, best_moves, features = positions[i]
+        score_after = positions[i + 1][0]
+        columns['cp_loss'].append(score_before - (-score_after))
+        columns['ref_code'].append(UNLABELLED)
+        columns['score_before'].append(score_before)
+        columns['score_after'].append(score_after)
+        columns['best_move_played'].append(bool(best_moves) and best_moves[0] == move.uci())
+        columns['material_count'].append(features.get('material_count', 0))
+        columns['position_complexity'].append(features.get('position_complexity', 0))
+        columns['attacking_possibilities'].append(features.get('attacking_possibilities', 0))
+    return columns
+
+
+def analyze_games_parallel(pgn_path: str, depth: int, workers: int, hash_mb: int) -> Dict[str, np.ndarray]:
+    """
+    Analyze every game in a PGN file across a process pool of engines.
+
+    Args:
+        pgn_path: PGN file with the games to analyze
+        depth: Search depth per position
+        workers: Number of engine processes
+        hash_mb: Hash table size per engine
+
+    Returns:
+        Column arrays in DATASET_COLUMNS layout, moves in file order
+    """
+    from analysis.analyzer import get_stockfish_path
+    engine_path = get_stockfish_path()
+    if not engine_path:
+        raise RuntimeError("Stockfish engine not found")
+
+    games = []
+    with open(pgn_path, encoding='utf-8') as pgn:
+        while True:
+            game = chess.pgn.read_game(pgn)
+            if game is None:
+                break
+            games.append(str(game))
+    logger.info(f"Analyzing {len(games)} games with {workers} engine processes")
+
+    columns: Dict[str, List] = {name: [] for name in DATASET_COLUMNS}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(engine_path, hash_mb)) as pool:
+        for done, game_columns in enumerate(pool.map(analyze_game_moves, games, [depth] * len(games)), 1):
+            for name, values in game_columns.items():
+                columns[name].extend(values)
+            if done % 50 == 0:
+                logger.info(f"Analyzed {done}/{len(games)} games")
+    return {name: np.asarray(values, dtype=DATASET_COLUMNS[name]) for name, values in columns.items()}
+
+
+def save_dataset(path: str, columns: Dict[str, np.ndarray]) -> None:
+    """Write raw per-move evals and features as a compressed .npz file."""
+    np.savez_compressed(path, **columns)
+    logger.info(f"Saved {len(columns['cp_loss'])} moves to {path}")
+
+
+def load_dataset(path: str) -> Mapping[str, np.ndarray]:
+    """
+    Open a saved dataset as a mapping of column arrays.
+
+    Args:
+        path: .npz file written by save_dataset (loaded into memory), or a
+            columns directory written by write_columns (memory-mapped)
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, COLUMNS_META), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['rows'] == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in meta['columns'].items()}
+        return {name: np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(meta['rows'],))
+                for name, dtype in meta['columns'].items()}
+    with np.load(path) as dataset:
+        return {name: dataset[name] for name in dataset.files}
+
+
+def write_columns(path: str, chunks: Iterable[Dict[str, np.ndarray]]) -> int:
     """
-    Find optimal thresholds using cross-validation and grid search.
+    Append chunks of column arrays to a columns directory.
+
+    Each column is a raw little-endian binary file named after it, and
+    COLUMNS_META records the dtypes and row count, so load_dataset can
+    memory-map the result. Returns the number of rows written.
+    """
+    os.makedirs(path, exist_ok=True)
+    files: Dict[str, BinaryIO] = {}
+    dtypes: Dict[str, str] = {}
+    rows = 0
+    try:
+        for chunk in chunks:
+            for name, values in chunk.items():
+                if name not in files:
+                    dtypes[name] = np.dtype(values.dtype).newbyteorder('<').str
+                    files[name] = open(os.path.join(path, f"{name}.bin"), 'wb')
+                files[name].write(np.ascontiguousarray(values, dtype=dtypes[name]).tobytes())
+            rows += len(chunk['cp_loss'])
+    finally:
+        for f in files.values():
+            f.close()
+    with open(os.path.join(path, COLUMNS_META), 'w', encoding='utf-8') as f:
+        json.dump({'rows': rows, 'columns': dtypes}, f)
+    return rows
+
+
+def iter_json_records(path: str, read_size: int = 1 << 20) -> Iterator[Dict]:
+    """
+    Stream objects from a JSON array or NDJSON file without loading it whole.
+
+    Objects are decoded one at a time from a buffer refilled `read_size`
+    characters at a time; array brackets, commas and whitespace between them
+    are skipped, so both layouts parse the same way.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    with open(path, 'r', encoding='utf-8') as f:
+        while True:
+            pos = _RECORD_SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer):
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                    yield item
+                    continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                return
+            # Need more input: keep the undecoded tail and read the next block
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def _reference_chunk(items: List[Dict]) -> Dict[str, np.ndarray]:
+    columns: Dict[str, List] = {name: [] for name in REFERENCE_COLUMNS}
+    for item in items:
+        if item.get('cp_loss') is None:
+            continue
+        features = item.get('features') or {}
+        columns['cp_loss'].append(item['cp_loss'])
+        columns['ref_code'].append(_ref_code(item.get('ref_category')))
+        columns['material_sacrificed'].append(bool(features.get('material_sacrificed', False)))
+        columns['material_count'].append(features.get('material_count', 0))
+        columns['position_complexity'].append(features.get('position_complexity', 0))
+        columns['attacking_possibilities'].append(features.get('attacking_possibilities', 0))
+    return {name: np.asarray(values, dtype=REFERENCE_COLUMNS[name]) for name, values in columns.items()}
+
+
+def convert_reference(input_path: str, output_path: str) -> int:
+    """
+    Convert a reference JSON / NDJSON file into a memory-mapped columns directory.
+
+    Input is read and written CONVERT_BATCH_ROWS moves at a time. Returns the number of
+    moves stored.
+    """
+    def chunks() -> Iterator[Dict[str, np.ndarray]]:
+        batch = []
+        for item in iter_json_records(input_path):
+            batch.append(item)
+            if len(batch) >= CONVERT_BATCH_ROWS:
+                yield _reference_chunk(batch)
+                batch = []
+        yield _reference_chunk(batch)
+
+    rows = write_columns(output_path, chunks())
+    logger.info(f"Converted {rows} moves from {input_path} to {output_path}")
+    return rows
+
+
+def _fold_ids(start: int, size: int, folds: int, seed: int) -> np.ndarray:
+    """Deterministic fold of each row in [start, start + size)."""
+    if folds <= 1:
+        return np.zeros(size, dtype=np.int64)
+    return np.random.default_rng([seed, start]).integers(0, folds, size)
+
+
+def _merge_histograms(values_a: np.ndarray, counts_a: np.ndarray,
+                      values_b: np.ndarray, counts_b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    values = np.union1d(values_a, values_b)
+    counts = np.zeros(counts_a.shape[:-1] + (values.size,), dtype=np.int64)
+    counts[..., np.searchsorted(values, values_a)] += counts_a
+    counts[..., np.searchsorted(values, values_b)] += counts_b
+    return values, counts
+
+
+def _histogram(columns: Mapping[str, np.ndarray], folds: int, seed: int, min_move: int):
+    """
+    One chunked pass collecting everything the optimizer needs, per fold.
+
+    Returns:
+        Tuple of (values, counts, fixed_correct, totals): the distinct positive
+        cp_loss values; counts[fold, segment, value] of moves labelled with that
+        SEGMENT_CATS category; per fold, the moves with cp_loss <= 0 that are
+        classified correctly regardless of thresholds; and the labelled moves
+    """
+    segments = len(SEGMENT_CATS)
+    segment_of = np.full(UNKNOWN_CATEGORY + 1, -1)
+    for k, cat in enumerate(SEGMENT_CATS):
+        segment_of[CATS.index(cat)] = k
+
+    values = np.empty(0, dtype=np.float64)
+    counts = np.zeros((folds, segments, 0), dtype=np.int64)
+    fixed_correct = np.zeros(folds, dtype=np.int64)
+    totals = np.zeros(folds, dtype=np.int64)
+    for start, keep, cp, ref in _iter_chunks(columns, min_move):
+        fold = _fold_ids(start, keep.size, folds, seed)[keep]
+        cp, ref = cp[keep], ref[keep]
+        totals += np.bincount(fold, minlength=folds)
+        fixed = ((cp < 0) & (ref == CATS.index('great'))) | ((cp == 0) & (ref == CATS.index('best')))
+        fixed_correct += np.bincount(fold[fixed], minlength=folds)
+
+        segment = segment_of[ref]
+        hit = (cp > 0) & (segment >= 0)
+        chunk_values, inverse = np.unique(cp[hit], return_inverse=True)
+        flat = (fold[hit] * segments + segment[hit]) * chunk_values.size + inverse.ravel()
+        chunk_counts = np.bincount(flat, minlength=folds * segments * chunk_values.size)
+        values, counts = _merge_histograms(values, counts, chunk_values,
+                                           chunk_counts.reshape(folds, segments, chunk_values.size))
+    return values, counts, fixed_correct, totals
+
+
+def _segment_correct(values: np.ndarray, counts: np.ndarray, thresholds: Dict[str, float]) -> int:
+    """Moves with cp_loss > 0 that `thresholds` classify correctly."""
+    bounds = np.maximum.accumulate([thresholds[cat] for cat in BOUNDED_CATS])
+    segment = np.searchsorted(bounds, values, side='left')
+    return int(counts[segment, np.arange(values.size)].sum())
+
+
+def _fit_thresholds(values: np.ndarray, counts: np.ndarray) -> Dict[str, float]:
+    """
+    Exact accuracy-maximizing thresholds for one histogram of labelled moves.
+
+    Positive cp_loss values are split into contiguous, ordered segments labelled
+    excellent, good, inaccuracy, mistake and blunder. With the distinct values
+    sorted once and per-category cumulative counts, the best split is a small
+    dynamic program: for each segment, the best score ending at value j is its
+    own count up to j plus the best prefix max of (previous score - own count)
+    over earlier boundaries. That is O(categories x distinct values).
+
+    Args:
+        values: Sorted distinct positive cp_loss values
+        counts: counts[segment, value] of moves labelled SEGMENT_CATS[segment]
+    """
+    thresholds = INITIAL_THRESHOLDS.copy()
+    if values.size == 0:
+        return thresholds
+
+    # prefix[k, j]: moves labelled SEGMENT_CATS[k] among the j smallest distinct values
+    prefix = np.zeros((len(SEGMENT_CATS), values.size + 1), dtype=np.int64)
+    prefix[:, 1:] = np.cumsum(counts, axis=1)
+
+    positions = np.arange(values.size + 1)
+    best = prefix[0]
+    back = []
+    for k in range(1, len(SEGMENT_CATS)):
+        candidate = best - prefix[k]
+        running = np.maximum.accumulate(candidate)
+        back.append(np.maximum.accumulate(np.where(candidate == running, positions, 0)))
+        best = prefix[k] + running
+
+    # Walk the boundaries back from the last segment
+    ends = []
+    j = values.size
+    for arg in reversed(back):
+        j = int(arg[j])
+        ends.append(j)
+    ends.reverse()
+    for cat, end in zip(BOUNDED_CATS, ends):
+        thresholds[cat] = float(values[end - 1]) if end > 0 else 0.0
+    thresholds['blunder'] = thresholds['mistake'] + 100  # Fixed offset for blunders
+    return thresholds
+
+
+def find_best_thresholds(data, folds: int = 5, seed: int = 0, min_move: int = 0) -> Dict[str, float]:
+    """
+    Find optimal thresholds exactly and report k-fold cross-validated accuracy.
+
+    The data is scanned once, in chunks, into per-fold histograms of the
+    distinct cp_loss values; every fit and score afterwards works on those.
     
     Args:
-        data: List of move data with cp_loss and ref_category
+        data: List of move data with cp_loss and ref_category, (cp_loss, ref_code)
+            arrays, or columns from load_dataset
         folds: Number of cross-validation folds
+        seed: Seed for the fold assignment, so runs are reproducible
+        min_move: Skip moves before this full move number (data with a fullmove column)
         
     Returns:
-        Dictionary of optimized thresholds
+        Dictionary of optimized thresholds, fitted on all of the data
     """
-    best_accuracy = 0
-    best_thresholds = INITIAL_THRESHOLDS.copy()
-    
-    # Extract features for grid search
-    cp_losses = [x['cp_loss'] for x in data if 'cp_loss' in x]
-    if not cp_losses:
-        return best_thresholds
-        
-    # Calculate statistics for search ranges
-    stats = {
-        'mean': statistics.mean(cp_losses),
-        'stdev': statistics.stdev(cp_losses) if len(cp_losses) > 1 else 100,
-        'median': statistics.median(cp_losses),
-        'q1': statistics.quantiles(cp_losses, n=4)[0],
-        'q3': statistics.quantiles(cp_losses, n=4)[2]
-    }
-    
-    # Grid search with adaptive ranges
-    ranges = {
-        'brilliant': (-100, 0, 10),
-        'excellent': (0, stats['q1'], 5),
-        'good': (stats['q1'], stats['median'], 10),
-        'inaccuracy': (stats['median'], stats['q3'], 15),
-        'mistake': (stats['q3'], stats['mean'] + 2*stats['stdev'], 25)
-    }
-    
-    # Try different threshold combinations
-    for b in range(*ranges['brilliant']):
-        for e in range(*ranges['excellent']):
-            for g in range(*ranges['good']):
-                for i in range(*ranges['inaccuracy']):
-                    for m in range(*ranges['mistake']):
-                        thresholds = {
-                            'brilliant': b,
-                            'excellent': e,
-                            'good': g,
-                            'inaccuracy': i,
-                            'mistake': m,
-                            'blunder': m + 100  # Fixed offset for blunders
-                        }
-                        
-                        # Simple validation scoring
-                        # Randomly split data into train/test sets
-                        n = len(data)
-                        test_size = n // folds
-                        accuracies = []
-                        
-                        for _ in range(folds):
-                            # Random sampling for validation
-                            test_indices = random.sample(range(n), test_size)
-                            test_data = [data[i] for i in test_indices]
-                            
-                            mismatches, total = score_thresholds(test_data, thresholds)
-                            if total > 0:
-                                accuracies.append(1 - mismatches/total)
-                                
-                        if accuracies:
-                            avg_accuracy = sum(accuracies) / len(accuracies)
-                            if avg_accuracy > best_accuracy:
-                                best_accuracy = avg_accuracy
-                                best_thresholds = thresholds.copy()
-    
-    logger.info(f"Found best thresholds with {best_accuracy:.2%} accuracy")
+    folds = max(1, folds)
+    values, counts, fixed_correct, totals = _histogram(_as_columns(data), folds, seed, min_move)
+    if totals.sum() == 0:
+        return INITIAL_THRESHOLDS.copy()
+
+    overall = counts.sum(axis=0)
+    if folds > 1 and (totals > 0).all():
+        accuracies = []
+        for fold in range(folds):
+            fold_thresholds = _fit_thresholds(values, overall - counts[fold])
+            correct = fixed_correct[fold] + _segment_correct(values, counts[fold], fold_thresholds)
+            accuracies.append(correct / totals[fold])
+        logger.info(f"Cross-validated accuracy over {folds} folds: "
+                    f"{np.mean(accuracies):.2%} (+/- {np.std(accuracies):.2%})")
+
+    best_thresholds = _fit_thresholds(values, overall)
+    correct = fixed_correct.sum() + _segment_correct(values, overall, best_thresholds)
+    logger.info(f"Found best thresholds with {correct / totals.sum():.2%} accuracy")
     return best_thresholds
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Calibrate move classification thresholds")
     parser.add_argument("input_file", help="Input file (PGN or JSON)")
-    parser.add_argument("--mode", choices=['reference', 'analysis'], 
+    parser.add_argument("--mode", choices=['reference', 'analysis', 'dataset'], 
                       default='reference', help="Calibration mode")
     parser.add_argument("--depth", type=int, default=18,
                       help="Analysis depth for PGN mode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                      help="Engine processes for PGN mode")
+    parser.add_argument("--hash", type=int, default=64,
+                      help="Hash size (MB) per engine for PGN mode")
+    parser.add_argument("--dataset",
+                      help="Where raw data is saved: .npz for PGN mode, a columns directory for "
+                           "reference mode (default: input file with .npz / .cols suffix)")
+    parser.add_argument("--min-move", type=int, default=5,
+                      help="Skip moves before this full move number (PGN and dataset modes)")
+    parser.add_argument("--folds", type=int, default=5,
+                      help="Cross-validation folds")
+    parser.add_argument("--seed", type=int, default=0,
+                      help="Seed for the cross-validation split")
     args = parser.parse_args()
     
     try:
         if args.mode == 'reference':
-            with open(args.input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # Stream the JSON into memory-mapped columns instead of loading it whole
+            dataset_file = args.dataset or str(Path(args.input_file).with_suffix('.cols'))
+            convert_reference(args.input_file, dataset_file)
+            data = load_dataset(dataset_file)
+        elif args.mode == 'dataset':
+            # Re-calibrate from a saved dataset without running the engine
+            data = load_dataset(args.input_file)
         else:
             # Analyze games mode
-            from analysis.analyzer import get_stockfish_path
-            engine_path = get_stockfish_path()
-            if not engine_path:
-                logger.error("Stockfish engine not found")
-                sys.exit(1)
-                
-            engine = chess.engine.SimpleEngine.popen_uci(engine_path)
-            try:
-                data = []
-                with open(args.input_file) as pgn:
-                    while True:
-                        game = chess.pgn.read_game(pgn)
-                        if game is None:
-                            break
-                            
-                        board = game.board()
-                        for move in game.mainline_moves():
-                            if board.fullmove_number < 5:  # Skip early moves
-                                board.push(move)
-                                continue
-                                
-                            score_before, best_moves, features = analyze_position(
-                                engine, board, args.depth)
-                            
-                            board.push(move)
-                            score_after, _, _ = analyze_position(engine, board, args.depth)
-                            
-                            cp_loss = score_before - (-score_after)
-                            data.append({
-                                'cp_loss': cp_loss,
-                                'features': features
-                            })
-                            
-            finally:
-                engine.quit()
+            columns = analyze_games_parallel(args.input_file, args.depth, args.workers, args.hash)
+            dataset_file = args.dataset or str(Path(args.input_file).with_suffix('.npz'))
+            save_dataset(dataset_file, columns)
+            data = load_dataset(dataset_file)
                 
         # Find and save optimal thresholds
-        thresholds = find_best_thresholds(data)
+        thresholds = find_best_thresholds(data, folds=args.folds, seed=args.seed, min_move=args.min_move)
         print("\nCalibrated Thresholds:")
         print(json.dumps(thresholds, indent=2))
         
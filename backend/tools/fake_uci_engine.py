@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Deterministic, CPU-cheap stand-in for Stockfish.
+
+Speaks enough UCI for python-chess and the analyzer: options, position,
+go depth/movetime/nodes with MultiPV, isready and quit. Moves are ranked by a
+one-ply material count plus a small hash-based jitter, so the same position
+always gets the same scores and lines, and every "search" prints one info line
+per depth and PV like a real engine would.
+
+Usage:
+  python fake_uci_engine.py [--latency-ms N] [--seed N]
+
+  --latency-ms  Sleep this long per `go`, to emulate engine think time
+                (defaults to $FAKE_UCI_LATENCY_MS, for when the engine is
+                started from a bare path such as STOCKFISH_PATH). A `go` with
+                a shorter movetime stops early and reports a proportionally
+                shallower depth, like a real engine running out of time
+  --seed        Change the jitter, giving a different but still deterministic engine
+
+Point the backend at it with STOCKFISH_PATH=tools/fake_uci_engine.py, or pass
+[sys.executable, "tools/fake_uci_engine.py"] as the engine command.
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+import chess
+
+VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 320, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+MATE = 100000
+
+
+def static_eval(board: chess.Board, seed: int) -> int:
+    """Material balance for the side to move, plus 0-40cp of positional jitter."""
+    score = 0
+    for piece in board.piece_map().values():
+        value = VALUES[piece.piece_type]
+        score += value if piece.color == board.turn else -value
+    digest = hashlib.blake2b(f"{seed}:{board.board_fen()}".encode(), digest_size=2).hexdigest()
+    return score + int(digest, 16) % 41 - 20
+
+
+def ranked_moves(board: chess.Board, seed: int):
+    """Legal moves as (score, uci) from the mover's point of view, best first."""
+    ranked = []
+    for move in board.legal_moves:
+        board.push(move)
+        score = MATE if board.is_checkmate() else -static_eval(board, seed)
+        board.pop()
+        ranked.append((score, move.uci()))
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return ranked
+
+
+def parse_position(parts):
+    if parts[1] == "startpos":
+        board = chess.Board()
+        rest = parts[2:]
+    else:
+        end = parts.index("moves") if "moves" in parts else len(parts)
+        board = chess.Board(" ".join(parts[2:end]))
+        rest = parts[end:]
+    for uci in rest[1:]:
+        board.push_uci(uci)
+    return board
+
+
+def search(board: chess.Board, parts, multipv: int, seed: int, latency: float) -> None:
+    depth = int(parts[parts.index("depth") + 1]) if "depth" in parts else 10
+    if latency:
+        if "movetime" in parts:
+            movetime = int(parts[parts.index("movetime") + 1]) / 1000.0
+            if movetime < latency:
+                depth = max(1, int(depth * movetime / latency))
+                latency = movetime
+        time.sleep(latency)
+    if board.is_checkmate():
+        print("info depth 0 score mate 0")
+        print("bestmove (none)")
+        return
+    if board.is_game_over():
+        print("info depth 0 score cp 0")
+        print("bestmove (none)")
+        return
+    ranked = ranked_moves(board, seed)
+    for d in range(1, depth + 1):
+        for k, (score, uci) in enumerate(ranked[:multipv], 1):
+            value = "mate 1" if score >= MATE else f"cp {score}"
+            print(f"info depth {d} seldepth {d + 2} multipv {k} score {value} "
+                  f"nodes {d * 1000} nps 1000000 hashfull {d} time {d} pv {uci}")
+    print(f"bestmove {ranked[0][1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic fake UCI engine")
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("FAKE_UCI_LATENCY_MS", "0")),
+                        help="Sleep per search (default: $FAKE_UCI_LATENCY_MS or 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Evaluation jitter seed")
+    args = parser.parse_args()
+
+    board = chess.Board()
+    multipv = 1
+    for line in sys.stdin:
+        parts = line.split()
+        if not parts:
+            continue
+        command = parts[0]
+        if command == "uci":
+            print("id name FakeFish")
+            print("id author chessgod")
+            print("option name Threads type spin default 1 min 1 max 512")
+            print("option name Hash type spin default 16 min 1 max 33554432")
+            print("option name MultiPV type spin default 1 min 1 max 500")
+            print("option name SyzygyPath type string default <empty>")
+            print("uciok")
+        elif command == "isready":
+            print("readyok")
+        elif command == "setoption" and "MultiPV" in parts:
+            multipv = int(parts[-1])
+        elif command == "position":
+            board = parse_position(parts)
+        elif command == "go":
+            search(board, parts, multipv, args.seed, args.latency_ms / 1000.0)
+        elif command == "quit":
+            break
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the FastAPI service.
+
+Starts the app under uvicorn on a local port, with Chess.com and Lichess
+replaced by an in-process stand-in server (and, with --fake-engine, Stockfish
+replaced by tools/fake_uci_engine.py). It then replays a weighted mix of
+/analyze, /games/{platform}/{username} and /health requests while ramping up
+the number of concurrent clients. For every concurrency stage and endpoint it
+reports throughput, error rate and p50/p95/p99 latency, and flags the first
+stage that breaks the error-rate or p99 budget.
+
+Usage:
+  python tools/load_test.py [--fake-engine] [--stages 1,2,4,8,16,32]
+                            [--duration 10] [--mix analyze=2,games=5,health=3]
+                            [--url http://host:port] [--json report.json]
+
+With --url the harness targets an already running service instead of starting
+one; the upstream stand-in is then not used. /analyze requests pick a random
+corpus game truncated at a random length, so most of them miss the result
+cache; pass --repeat-games to replay whole corpus games instead.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import chess.pgn
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TOOLS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = TOOLS_DIR.parent
+CORPUS = TOOLS_DIR / "bench" / "corpus.pgn"
+FAKE_ENGINE = TOOLS_DIR / "fake_uci_engine.py"
+
+ENDPOINTS = ('analyze', 'games', 'health')
+USERNAMES = [f"player{i}" for i in range(20)]
+
+
+def load_games(path: Path) -> List[chess.pgn.Game]:
+    games = []
+    with open(path, encoding='utf-8') as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                return games
+            games.append(game)
+
+
+def truncated_pgn(game: chess.pgn.Game, plies: int) -> str:
+    """PGN of the first `plies` moves of `game`, keeping its headers."""
+    board = game.board()
+    moves = list(game.mainline_moves())[:plies]
+    short = chess.pgn.Game.from_board(_replay(board, moves))
+    for key, value in game.headers.items():
+        if key != "Result":
+            short.headers[key] = value
+    return str(short)
+
+
+def _replay(board: chess.Board, moves: List[chess.Move]) -> chess.Board:
+    for move in moves:
+        board.push(move)
+    return board
+
+
+# -------- Upstream stand-in --------
+
+def start_upstream(games: List[chess.pgn.Game], latency: float) -> ThreadingHTTPServer:
+    """Serve Chess.com- and Lichess-shaped responses built from the corpus."""
+    pgns = [str(g) for g in games]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(latency)
+            base = f"http://127.0.0.1:{self.server.server_port}"
+            path = self.path.split("?")[0]
+            parts = path.strip("/").split("/")
+            if path.endswith("/games/archives"):
+                # Chess.com archive list; ETag lets the service revalidate with a 304
+                etag = '"archives-v1"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", "application/json", {"ETag": etag})
+                    return
+                archives = [f"{base}/pub/player/{parts[2]}/games/2024/{m:02d}" for m in range(1, 13)]
+                self._send(200, json.dumps({"archives": archives}).encode(), "application/json", {"ETag": etag})
+            elif path.startswith("/pub/player/"):
+                month = [{"pgn": pgn, "url": f"{base}{path}#{i}"} for i, pgn in enumerate(pgns * 6)]
+                self._send(200, json.dumps({"games": month}).encode(), "application/json")
+            elif path.startswith("/api/games/user/"):
+                lines = [json.dumps({"id": f"g{i}", "pgn": pgn}) for i, pgn in enumerate(pgns)]
+                self._send(200, ("\n".join(lines) + "\n").encode(), "application/x-ndjson")
+            else:
+                self._send(404, b"{}", "application/json")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# -------- Service under test --------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_service(upstream_url: str, args, cache_dir: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ,
+               CHESSCOM_API_BASE=upstream_url,
+               LICHESS_API_BASE=upstream_url,
+               RESULT_CACHE_DIR=cache_dir,
+               RENDER_EXTERNAL_URL=url)
+    if args.fake_engine:
+        env.update(STOCKFISH_PATH=str(FAKE_ENGINE), FAKE_UCI_LATENCY_MS=str(args.engine_latency_ms))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(BACKEND_DIR), env=env)
+    return process, url
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str, timeout: float = 120.0) -> None:
+    """Wait until /ready reports warm engines and preloaded openings, so the
+    first stage does not measure the warm-up."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # A deployment without /ready (404) counts as ready once it answers
+            if (await client.get(f"{url}/ready")).status_code in (200, 404):
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Service at {url} did not become ready within {timeout:.0f}s")
+
+
+# -------- Load generation --------
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Workload:
+    """Picks the next request of the traffic mix."""
+
+    def __init__(self, games: List[chess.pgn.Game], mix: Dict[str, float], args, rng: random.Random):
+        self.games = games
+        self.endpoints = list(mix)
+        self.weights = [mix[e] for e in self.endpoints]
+        self.args = args
+        self.rng = rng
+
+    def next_request(self) -> Tuple[str, str, str, Optional[Dict[str, Any]]]:
+        """Return (endpoint, method, path, json body)."""
+        endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+        if endpoint == 'health':
+            return endpoint, "GET", "/health", None
+        if endpoint == 'games':
+            platform = self.rng.choice(["chess.com", "lichess"])
+            limit = self.rng.choice([10, 10, 25, 50])
+            return endpoint, "GET", f"/games/{platform}/{self.rng.choice(USERNAMES)}?limit={limit}", None
+        game = self.rng.choice(self.games)
+        plies = len(list(game.mainline_moves()))
+        if not self.args.repeat_games:
+            plies = self.rng.randint(max(1, plies // 3), plies)
+        body = {"pgn": truncated_pgn(game, plies), "options": {"depth": self.args.depth, "multipv": 3}}
+        return endpoint, "POST", "/analyze", body
+
+
+async def run_stage(client: httpx.AsyncClient, url: str, workload: Workload,
+                    concurrency: int, duration: float) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {e: [] for e in workload.endpoints}
+    errors: Dict[str, int] = {e: 0 for e in workload.endpoints}
+    deadline = time.monotonic() + duration
+
+    async def user() -> None:
+        while time.monotonic() < deadline:
+            endpoint, method, path, body = workload.next_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, f"{url}{path}", json=body)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples[endpoint].append(time.perf_counter() - start)
+            if not ok:
+                errors[endpoint] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    endpoints = {}
+    for endpoint, latencies in samples.items():
+        latencies.sort()
+        endpoints[endpoint] = {
+            'requests': len(latencies),
+            'errors': errors[endpoint],
+            'rps': len(latencies) / elapsed,
+            'p50_ms': 1000 * percentile(latencies, 50),
+            'p95_ms': 1000 * percentile(latencies, 95),
+            'p99_ms': 1000 * percentile(latencies, 99),
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return {
+        'concurrency': concurrency,
+        'elapsed_s': elapsed,
+        'rps': total / elapsed,
+        'error_rate': sum(errors.values()) / total if total else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def print_stage(stage: Dict[str, Any]) -> None:
+    print(f"\nconcurrency {stage['concurrency']}: {stage['rps']:.1f} req/s, "
+          f"{stage['error_rate']:.1%} errors")
+    print(f"  {'endpoint':<10}{'reqs':>7}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, s in stage['endpoints'].items():
+        print(f"  {endpoint:<10}{s['requests']:>7}{s['errors']:>6}{s['rps']:>9.1f}"
+              f"{s['p50_ms']:>9.0f}{s['p95_ms']:>9.0f}{s['p99_ms']:>9.0f}")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in --mix (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    games = load_games(Path(args.corpus))
+    workload = Workload(games, parse_mix(args.mix), args, random.Random(args.seed))
+    process = upstream = None
+    url = args.url
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.timeout)
+    with tempfile.TemporaryDirectory(prefix="chessgod-load-") as cache_dir:
+        try:
+            if not url:
+                upstream = start_upstream(games, args.upstream_latency_ms / 1000.0)
+                process, url = start_service(f"http://127.0.0.1:{upstream.server_port}", args, cache_dir)
+            async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+                await wait_ready(client, url)
+                stages = []
+                for concurrency in args.stages:
+                    stage = await run_stage(client, url, workload, concurrency, args.duration)
+                    print_stage(stage)
+                    stages.append(stage)
+                    worst_p99 = max(s['p99_ms'] for s in stage['endpoints'].values() if s['requests'])
+                    if stage['error_rate'] > args.max_error_rate or worst_p99 > args.max_p99_ms:
+                        print(f"\nBudget exceeded at concurrency {concurrency} "
+                              f"(errors {stage['error_rate']:.1%}, worst p99 {worst_p99:.0f} ms)")
+                        break
+                return stages
+        finally:
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            if upstream is not None:
+                upstream.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the ChessGod API")
+    parser.add_argument("--url", help="Target a running service instead of starting one")
+    parser.add_argument("--fake-engine", action="store_true",
+                        help="Run the service against tools/fake_uci_engine.py instead of Stockfish")
+    parser.add_argument("--engine-latency-ms", type=float, default=5.0,
+                        help="Per-search latency of the fake engine")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0,
+                        help="Latency of the Chess.com/Lichess stand-in")
+    parser.add_argument("--stages", type=lambda s: [int(x) for x in s.split(",")],
+                        default=[1, 2, 4, 8, 16, 32], help="Concurrency levels to ramp through")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per stage")
+    parser.add_argument("--mix", default="analyze=2,games=5,health=3", help="Endpoint weights")
+    parser.add_argument("--depth", type=int, default=10, help="Depth requested by /analyze calls")
+    parser.add_argument("--repeat-games", action="store_true",
+                        help="Analyze whole corpus games (mostly result-cache hits after warm-up)")
+    parser.add_argument("--corpus", default=str(CORPUS), help="PGN games used for /analyze and the stand-in")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout")
+    parser.add_argument("--max-error-rate", type=float, default=0.05, help="Stop ramping above this error rate")
+    parser.add_argument("--max-p99-ms", type=float, default=30000.0, help="Stop ramping above this p99")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the request mix")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    stages = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'stages': stages, 'mix': parse_mix(args.mix), 'fake_engine': args.fake_engine}, f, indent=2)
+        print(f"\nReport saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from analysis.metrics import UPSTREAM_CACHE, UPSTREAM_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Base URLs are configurable so the service can run against local stand-ins
+CHESSCOM_API_BASE = os.getenv('CHESSCOM_API_BASE', 'https://api.chess.com').rstrip('/')
+LICHESS_API_BASE = os.getenv('LICHESS_API_BASE', 'https://lichess.org').rstrip('/')
+
+# Seconds before a cached document is revalidated with the upstream site
+ARCHIVE_LIST_TTL = float(os.getenv('ARCHIVE_LIST_TTL', '300'))
+ARCHIVE_TTL = float(os.getenv('ARCHIVE_TTL', '60'))
+UPSTREAM_CACHE_SIZE = int(os.getenv('UPSTREAM_CACHE_SIZE', '1000'))
+
+# Parallel Chess.com archive downloads per request, and the guess used to size the first wave
+ARCHIVE_CONCURRENCY = int(os.getenv('ARCHIVE_CONCURRENCY', '6'))
+GAMES_PER_MONTH_ESTIMATE = int(os.getenv('GAMES_PER_MONTH_ESTIMATE', '30'))
+
+
+def create_client() -> httpx.AsyncClient:
+    """Shared upstream client: keep-alive connection pool with HTTP/2."""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(15.0, connect=5.0),
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0),
+        headers={"User-Agent": "ChessGod/1.1"},
+    )
+
+
+async def timed_get(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    """GET `url`, recording its latency per upstream host."""
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        response = await client.get(url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        UPSTREAM_DURATION.labels(urlsplit(url).netloc, status).observe(time.perf_counter() - start)
+
+
+class UpstreamCache:
+    """LRU cache of upstream JSON documents with a freshness TTL.
+
+    Fresh entries are served without touching the network. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since, so an unchanged
+    document costs a 304 round trip instead of a full download.
+    """
+
+    def __init__(self, max_entries: int = UPSTREAM_CACHE_SIZE):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def get_json(self, client: httpx.AsyncClient, url: str, ttl: float) -> Tuple[int, Optional[Any]]:
+        """Return (status_code, parsed JSON) for `url`, served from cache when fresh.
+
+        Only successful responses are cached; for any other status the data is None.
+        """
+        entry = self._entries.get(url)
+        if entry is not None and entry['expires'] > time.monotonic():
+            self._entries.move_to_end(url)
+            UPSTREAM_CACHE.labels('fresh').inc()
+            return 200, entry['data']
+
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = await timed_get(client, url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            entry['expires'] = time.monotonic() + ttl
+            self._entries.move_to_end(url)
+            UPSTREAM_CACHE.labels('revalidated').inc()
+            return 200, entry['data']
+        UPSTREAM_CACHE.labels('miss').inc()
+        if response.status_code != 200:
+            return response.status_code, None
+
+        data = response.json()
+        self._entries[url] = {
+            'data': data,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'expires': time.monotonic() + ttl,
+        }
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return 200, data
+
+
+async def fetch_archives(client: httpx.AsyncClient,
+                         cache: UpstreamCache,
+                         archives: List[str],
+                         limit: int) -> List[Dict[str, Any]]:
+    """Collect the `limit` most recent games from Chess.com monthly archives.
+
+    Archives are fetched newest first in concurrent waves, at most
+    ARCHIVE_CONCURRENCY requests at a time. The first wave is sized from an
+    estimate of games per month; further waves only run if it came up short.
+
+    Args:
+        client: Shared upstream client
+        cache: Cache used for the archive documents
+        archives: Archive URLs as listed by Chess.com, oldest first
+        limit: Number of games wanted
+
+    Returns:
+        Up to `limit` games in chronological order
+    """
+    semaphore = asyncio.Semaphore(ARCHIVE_CONCURRENCY)
+
+    async def fetch(url: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            status, data = await cache.get_json(client, url, ARCHIVE_TTL)
+        if status != 200:
+            logger.warning(f"Skipping archive {url}: HTTP {status}")
+            return []
+        return data.get("games", [])
+
+    pending = list(reversed(archives))
+    games: List[Dict[str, Any]] = []
+    wave_size = max(1, math.ceil(limit / GAMES_PER_MONTH_ESTIMATE))
+    while pending and len(games) < limit:
+        wave, pending = pending[:wave_size], pending[wave_size:]
+        # Months come back newest first; prepend so `games` stays chronological
+        for month in await asyncio.gather(*(fetch(url) for url in wave)):
+            games = month + games
+        # Re-estimate from what the months so far actually held
+        missing = limit - len(games)
+        fetched = len(archives) - len(pending)
+        per_month = max(1, len(games) // fetched)
+        wave_size = max(1, math.ceil(missing / per_month))
+    return games[-limit:] if limit > 0 else []
+
+
+async def stream_ndjson(client: httpx.AsyncClient, url: str, **kwargs) -> Tuple[int, List[Any]]:
+    """GET an NDJSON endpoint, parsing each line as it arrives.
+
+    Returns:
+        (status_code, parsed objects); objects are only read for a 200 response
+    """
+    items: List[Any] = []
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        async with client.stream("GET", url, **kwargs) as response:
+            status = str(response.status_code)
+            if response.status_code != 200:
+                return response.status_code, items
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if line:
+                    items.append(json.loads(line))
+        return 200, items
+    finally:
+        # Includes reading the whole body, which is what the caller waits for
+        UPSTREAM_DURATION.labels(urlsplit(url).netloc, status).observe(time.perf_counter() - start)
+
+
+async def iter_ndjson(client: httpx.AsyncClient, url: str, **kwargs) -> AsyncIterator[Any]:
+    """Follow a long-lived NDJSON stream, yielding each object as it arrives.
+
+    Blank keep-alive lines are skipped. Ends when the upstream closes the stream.
+
+    Raises:
+        httpx.HTTPStatusError: If the response is not a 200
+    """
+    async with client.stream("GET", url, **kwargs) as response:
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+        async for line in response.aiter_lines():
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+import functools
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from analysis.engine_pool import EnginePool
+from analysis.metrics import SERVICE_READY
+from scheduler import FairScheduler, Ticket
+
+logger = logging.getLogger(__name__)
+
+# -------- CONFIG --------
+# Seconds between periodic warm-ups (engine health + self-ping)
+WARMUP_INTERVAL = float(os.getenv('WARMUP_INTERVAL', '600'))
+# Set to 0 to skip preloading opening positions into the evaluation cache
+WARMUP_OPENINGS = os.getenv('WARMUP_OPENINGS', '1') != '0'
+# Public URL of this service; when set, the periodic warm-up GETs its /health
+# so the platform sees inbound traffic and does not put the service to sleep
+SELF_PING_URL = os.getenv('RENDER_EXTERNAL_URL', '').rstrip('/')
+# Scheduler client the warm-up's engine searches and opening preloads are queued under
+WARMUP_CLIENT = "warmup"
+# Seconds an engine warm-up search is expected to hold its scheduler slot
+WARMUP_SLOT_SECONDS = float(os.getenv('WARMUP_SLOT_SECONDS', '2'))
+
+# Main lines of common openings. Every position along them is analyzed at the
+# default /analyze settings, so the opening phase of most games is served
+# from the evaluation cache.
+OPENING_LINES = [
+    "1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 5. O-O Be7",          # Ruy Lopez
+    "1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. c3 Nf6 5. d3 d6",            # Italian
+    "1. e4 e5 2. Nf3 Nc6 3. d4 exd4 4. Nxd4 Nf6 5. Nxc6 bxc6",      # Scotch
+    "1. e4 e5 2. Nf3 Nf6 3. Nxe5 d6 4. Nf3 Nxe4 5. d4 d5",          # Petrov
+    "1. e4 c5 2. Nf3 d6 3. d4 cxd4 4. Nxd4 Nf6 5. Nc3 a6",          # Sicilian Najdorf
+    "1. e4 c5 2. Nf3 Nc6 3. d4 cxd4 4. Nxd4 Nf6 5. Nc3 e5",         # Sicilian Sveshnikov
+    "1. e4 c5 2. Nc3 Nc6 3. g3 g6 4. Bg2 Bg7 5. d3 d6",             # Closed Sicilian
+    "1. e4 e6 2. d4 d5 3. Nc3 Nf6 4. Bg5 Be7 5. e5 Nfd7",           # French
+    "1. e4 c6 2. d4 d5 3. Nc3 dxe4 4. Nxe4 Bf5 5. Ng3 Bg6",         # Caro-Kann
+    "1. e4 d5 2. exd5 Qxd5 3. Nc3 Qa5 4. d4 Nf6 5. Nf3 c6",         # Scandinavian
+    "1. d4 d5 2. c4 e6 3. Nc3 Nf6 4. Bg5 Be7 5. e3 O-O",            # Queen's Gambit Declined
+    "1. d4 d5 2. c4 dxc4 3. Nf3 Nf6 4. e3 e6 5. Bxc4 c5",           # Queen's Gambit Accepted
+    "1. d4 d5 2. c4 c6 3. Nf3 Nf6 4. Nc3 dxc4 5. a4 Bf5",           # Slav
+    "1. d4 Nf6 2. c4 g6 3. Nc3 Bg7 4. e4 d6 5. Nf3 O-O",            # King's Indian
+    "1. d4 Nf6 2. c4 e6 3. Nc3 Bb4 4. e3 O-O 5. Bd3 d5",            # Nimzo-Indian
+    "1. d4 d5 2. Bf4 Nf6 3. e3 e6 4. Nf3 c5 5. c3 Nc6",             # London
+    "1. c4 e5 2. Nc3 Nf6 3. Nf3 Nc6 4. g3 d5 5. cxd5 Nxd5",         # English
+    "1. Nf3 d5 2. g3 Nf6 3. Bg2 e6 4. O-O Be7 5. d3 O-O",           # Reti
+]
+
+
+class Warmup:
+    """Startup and periodic warm-up of the analysis path, and the readiness it implies.
+
+    At startup every pooled engine is spawned and runs a short search (process
+    start, network weights, hash allocation), then the positions along
+    OPENING_LINES are analyzed into the evaluation cache. The service counts
+    as ready once both are done. Afterwards, every WARMUP_INTERVAL seconds,
+    idle engines are health-checked and warmed again (crashed ones are
+    respawned before a request needs them) and SELF_PING_URL is pinged.
+
+    With a scheduler, each engine is warmed on a slot taken under
+    WARMUP_CLIENT, and only slots that are free with nothing queued are
+    taken, so warm-up never holds an engine an admitted job is counting on.
+    """
+
+    def __init__(self,
+                 engine_pool: EnginePool,
+                 analyze: Callable[[str], Any],
+                 client: Optional[httpx.AsyncClient] = None,
+                 scheduler: Optional[FairScheduler] = None):
+        """
+        Args:
+            engine_pool: Pool whose engines are warmed
+            analyze: Blocking callable analyzing one PGN the way /analyze does,
+                used to preload the opening positions
+            client: Client for the self-ping
+            scheduler: Scheduler the pool's engines are shared through
+        """
+        self.engine_pool = engine_pool
+        self.analyze = analyze
+        self.client = client
+        self.scheduler = scheduler
+        self.engines_warm = 0
+        self.openings_done = 0
+        self.openings_total = len(OPENING_LINES) if WARMUP_OPENINGS else 0
+        self.started = time.monotonic()
+        self.ready_after: Optional[float] = None
+        self.last_run: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "engines_warmed": self.engines_warm,
+            "engines_running": self.engine_pool.running,
+            "engines_total": self.engine_pool.size,
+            "openings_preloaded": self.openings_done,
+            "openings_total": self.openings_total,
+            "warmup_seconds": round(self.ready_after if self.ready else time.monotonic() - self.started, 2),
+            "last_warmup_seconds_ago": round(time.monotonic() - self.last_run, 1) if self.last_run else None,
+        }
+
+    async def run(self) -> None:
+        """Warm up now, then keep the service warm until cancelled."""
+        loop = asyncio.get_event_loop()
+        self.engines_warm = await self._warm_engines(loop)
+        if self.openings_total:
+            await loop.run_in_executor(None, self._preload_openings)
+        if self.engines_warm:
+            self.ready_after = time.monotonic() - self.started
+            SERVICE_READY.set(1)
+            logger.info(f"Warm-up finished in {self.ready_after:.1f}s: {self.engines_warm} engines, "
+                        f"{self.openings_done} opening lines")
+        else:
+            logger.error("Warm-up failed: no engine could be started")
+
+        while True:
+            await asyncio.sleep(WARMUP_INTERVAL)
+            # Engines busy with requests are skipped; they are warm anyway
+            warm = await self._warm_engines(loop)
+            if warm and not self.ready:
+                # No engine could be started at first, but now one has
+                self.engines_warm = warm
+                self.ready_after = time.monotonic() - self.started
+                SERVICE_READY.set(1)
+            await self._self_ping()
+
+    async def _warm_engines(self, loop) -> int:
+        tickets = self._free_slots()
+        if tickets is not None and not tickets:
+            # Every slot is taken or wanted; engines in use are warm anyway
+            warm = 0
+        else:
+            limit = len(tickets) if tickets is not None else None
+            future = loop.run_in_executor(None, functools.partial(self.engine_pool.warm_up, limit=limit))
+            # The slots are held until the searches are over, even if this is cancelled
+            future.add_done_callback(lambda _: self._release(tickets))
+            try:
+                warm = await asyncio.shield(future)
+            except Exception as e:
+                logger.error(f"Engine warm-up error: {e}")
+                warm = 0
+        self.last_run = time.monotonic()
+        return warm
+
+    def _free_slots(self) -> Optional[List[Ticket]]:
+        """Scheduler tickets for the slots free now with nothing queued, at most
+        one per engine; None without a scheduler."""
+        if self.scheduler is None:
+            return None
+        tickets = []
+        while (len(tickets) < self.engine_pool.size and not self.scheduler.queued
+               and self.scheduler.running < self.scheduler.slots):
+            ticket = self.scheduler.submit(WARMUP_CLIENT, 1, hold=WARMUP_SLOT_SECONDS)
+            if ticket.started is None:
+                self.scheduler.release(ticket)
+                break
+            tickets.append(ticket)
+        return tickets
+
+    def _release(self, tickets: Optional[List[Ticket]]) -> None:
+        for ticket in tickets or ():
+            self.scheduler.release(ticket)
+
+    def _preload_openings(self) -> None:
+        for line in OPENING_LINES:
+            try:
+                self.analyze(line)
+                self.openings_done += 1
+            except Exception as e:
+                logger.warning(f"Failed to preload opening '{line}': {e}")
+
+    async def _self_ping(self) -> None:
+        if not SELF_PING_URL or self.client is None:
+            return
+        try:
+            response = await self.client.get(f"{SELF_PING_URL}/health")
+            logger.debug(f"Self-ping: HTTP {response.status_code}")
+        except httpx.HTTPError as e:
+            logger.warning(f"Self-ping failed: {e}")
@@ -216,32 +216,60 @@ async function startAnalysis(pgn, gameUrl = '', meta = {}, depth = 15) {
   results.classList.add("hidden");
 
   try {
-    // Simulate progress while waiting for the backend (up to 85%)
     const progressFill = document.getElementById('analysisProgressFill');
     const progressLabel = document.getElementById('analysisProgressLabel');
-    let progress = 5;
-    if (progressFill) progressFill.style.width = progress + '%';
-    const progressInterval = setInterval(() => {
-      if (progress < 85) {
-        progress += Math.random() * 3; // random bump
-        if (progress > 85) progress = 85;
-        if (progressFill) progressFill.style.width = Math.round(progress) + '%';
-        if (progressLabel) progressLabel.textContent = `Analyzing...`;
-      }
-    }, 350);
-
-    const data = await analyzeGame(pgn, gameUrl, depth);
-    clearInterval(progressInterval);
-    if (progressFill) progressFill.style.width = '100%';
-    if (progressLabel) progressLabel.textContent = 'Finalizing...';
+    if (progressFill) progressFill.style.width = '5%';
+    if (progressLabel) progressLabel.textContent = 'Analyzing...';
 
     // Merge client metadata
-    if (meta) {
+    const mergeMeta = (data) => {
+      if (!meta) return;
       data.white_name = data.white_name || meta.white_name || data.white_name;
       data.black_name = data.black_name || meta.black_name || data.black_name;
       data.white_rating = data.white_rating || meta.white_rating || (data.white && data.white.rating) || null;
       data.black_rating = data.black_rating || meta.black_rating || (data.black && data.black.rating) || null;
+    };
+
+    // Plies stream in as soon as the backend scores them; show the board after
+    // the first one and let it fill in while the rest of the game is analyzed
+    let boardShown = false;
+    let data;
+    try {
+      data = await analyzeGameStream(pgn, gameUrl, depth, (event, partial) => {
+        if (event.type === 'queued') {
+          if (progressLabel && event.position) {
+            const eta = event.eta_s ? ` (about ${Math.ceil(event.eta_s)}s)` : '';
+            progressLabel.textContent = `Queued: #${event.position}${eta}`;
+          }
+          return;
+        }
+        if (event.type === 'start' && progressLabel) progressLabel.textContent = 'Analyzing...';
+        if (event.type !== 'ply') return;
+        if (!boardShown) {
+          boardShown = true;
+          mergeMeta(partial);
+          const overlay = document.getElementById('analysisOverlay');
+          if (overlay) { overlay.classList.add('hidden'); overlay.style.display = 'none'; }
+          try { document.body.classList.remove('overlay-active'); } catch (e) {}
+          const gl = document.getElementById('gamesList');
+          if (gl) gl.style.display = 'none';
+          try {
+            window._currentPGN = pgn || '';
+            initBoardFromAnalysis(partial);
+          } catch (e) { console.warn('Failed to init board', e); }
+        } else {
+          try { if (window._updateBoardUI) window._updateBoardUI(); } catch (e) {}
+        }
+      });
+    } catch (err) {
+      // Some proxies buffer or cut chunked responses; if nothing has been shown
+      // yet, fetch the whole analysis in one (compact) /analyze response instead
+      if (boardShown || err.busy) throw err;
+      console.warn('Streaming analysis failed, retrying without streaming', err);
+      data = await analyzeGame(pgn, gameUrl, depth);
     }
+    if (progressFill) progressFill.style.width = '100%';
+    mergeMeta(data);
 
     // Hide the games list and show analysis screen
     const gl = document.getElementById('gamesList');
@@ -251,19 +279,16 @@ async function startAnalysis(pgn, gameUrl = '', meta = {}, depth = 15) {
     const analysisScreen = document.querySelectorAll('.analysis-element');
     analysisScreen.forEach(el => el.classList.remove('hidden'));
 
-    // Show and update results section
-    results.classList.remove('hidden');
-    renderResults(data);
-
     // Show board container
     const boardContainer = document.getElementById('boardContainer');
     if (boardContainer) boardContainer.classList.remove('hidden');
 
-    // Initialize board preview from returned fen history and moves meta
+    // Initialize the board if no ply streamed in (e.g. empty game); otherwise
+    // just refresh controls for the now-complete history
     try {
-      // persist the original PGN so the board can reference moves if needed
       window._currentPGN = pgn || data.pgn || '';
-      initBoardFromAnalysis(data);
+      if (!boardShown) initBoardFromAnalysis(data);
+      else if (window._updateBoardUI) window._updateBoardUI();
     } catch (e) { console.warn('Failed to init board', e); }
 
     // Render and persist results
@@ -51,48 +51,279 @@ async function fetchLichessGames(username) {
   });
 }
 
-// Send PGN to backend
+// Send PGN to backend and get the whole analysis in one response, using the
+// compact columnar encoding (decoded below) to keep the download small
 async function analyzeGame(pgn, url = '', depth = 15) {
   const BACKEND_URL = 'https://chessgod-backend-wa2i.onrender.com'; // Production Render URL
-  
-  // Try both endpoints - JSON and form data
+
   try {
-    // First try the JSON endpoint
-    const moves = pgn.split(/\s+/).filter(move => move.trim());
-    const jsonResponse = await fetch(`${BACKEND_URL}/analyze`, {
+    const res = await fetch(`${BACKEND_URL}/analyze`, {
       method: "POST",
       headers: {
         'Content-Type': 'application/json',
+        'Accept': COMPACT_MEDIA_TYPE,
       },
       body: JSON.stringify({
-        moves: moves,
+        pgn,
         platform: 'extension',
-        depth: depth,
-        url: url
+        options: { depth },
+        previous_id: await loadPreviousResultId(pgn, url),
       })
     });
-
-    if (jsonResponse.ok) {
-      return jsonResponse.json();
-    }
-
-    // Fallback to form data if JSON fails
-    const formData = new FormData();
-    const file = new Blob([pgn], { type: "text/plain" });
-    formData.append("file", file, "game.pgn");
-    if (url) formData.append('url', url);
-    formData.append('depth', String(depth));
-
-    const res = await fetch(`${BACKEND_URL}/analyze`, {
-      method: "POST",
-      body: formData,
-    });
+    if (res.status === 429) throw await busyError(res);
     if (!res.ok) {
       throw new Error("Backend error");
     }
-    return res.json();
+    const data = await res.json();
+    const result = isCompactResult(data) ? decodeCompactResult(data) : data;
+    result.game_url = url;
+    try { await rememberResultId(pgn, url, result.result_id); } catch (e) {}
+    return result;
   } catch (error) {
     console.error("Analysis failed:", error);
     throw error;
   }
-}
\ No newline at end of file
+}
+
+// -------- Compact /analyze results --------
+// The backend can send an analysis as the start FEN, the played moves and one
+// array per per-ply field instead of a FEN and an object per ply. These helpers
+// rebuild the usual { fen_history, moves_meta, ... } shape from it.
+const COMPACT_MEDIA_TYPE = 'application/vnd.chessgod.compact+json';
+const COMPACT_FORMAT = 'compact-v1';
+
+function isCompactResult(data) {
+  return !!data && data.format === COMPACT_FORMAT;
+}
+
+// Castling rights lost when a piece moves from or to these squares
+const CASTLING_SQUARES = { e1: 'KQ', h1: 'K', a1: 'Q', e8: 'kq', h8: 'k', a8: 'q' };
+
+// Apply a UCI move to a FEN. The en passant field of the result is taken from
+// hasEnPassant, as only a move generator knows whether the capture is legal.
+function applyUciToFen(fen, uci, hasEnPassant) {
+  const [placement, turn, castling, ep, halfmove, fullmove] = fen.split(' ');
+  // board[rank][file], rank 0 = rank 8 as in the FEN
+  const board = placement.split('/').map(row => {
+    const cells = [];
+    for (const ch of row) {
+      if (/\d/.test(ch)) cells.push(...Array(Number(ch)).fill(null));
+      else cells.push(ch);
+    }
+    return cells;
+  });
+  const at = sq => [8 - Number(sq[1]), sq.charCodeAt(0) - 97];
+  const [fr, ff] = at(uci.slice(0, 2));
+  const [tr, tf] = at(uci.slice(2, 4));
+  const piece = board[fr][ff];
+  const isPawn = piece.toLowerCase() === 'p';
+  let capture = board[tr][tf] !== null;
+
+  if (isPawn && ff !== tf && !capture) {
+    // En passant: the captured pawn sits beside the moving pawn
+    board[fr][tf] = null;
+    capture = true;
+  }
+  if (piece.toLowerCase() === 'k' && Math.abs(tf - ff) === 2) {
+    // Castling: bring the rook across the king
+    const rookFrom = tf > ff ? 7 : 0;
+    board[fr][(ff + tf) / 2] = board[fr][rookFrom];
+    board[fr][rookFrom] = null;
+  }
+  board[fr][ff] = null;
+  const promotion = uci[4];
+  board[tr][tf] = promotion ? (turn === 'w' ? promotion.toUpperCase() : promotion) : piece;
+
+  let rights = castling === '-' ? '' : castling;
+  for (const sq of [uci.slice(0, 2), uci.slice(2, 4)]) {
+    for (const r of CASTLING_SQUARES[sq] || '') rights = rights.replace(r, '');
+  }
+  const epSquare = hasEnPassant ? uci[0] + (Number(uci[1]) + Number(uci[3])) / 2 : '-';
+
+  const rows = board.map(cells => {
+    let row = '';
+    let empty = 0;
+    for (const cell of cells) {
+      if (cell === null) { empty++; continue; }
+      if (empty) { row += empty; empty = 0; }
+      row += cell;
+    }
+    return empty ? row + empty : row;
+  });
+  return [
+    rows.join('/'),
+    turn === 'w' ? 'b' : 'w',
+    rights || '-',
+    epSquare,
+    isPawn || capture ? 0 : Number(halfmove) + 1,
+    turn === 'b' ? Number(fullmove) + 1 : Number(fullmove),
+  ].join(' ');
+}
+
+// Rebuild the full analysis result from the compact encoding
+function decodeCompactResult(compact) {
+  const { format, start_fen, categories, reasons, moves, category, cp_loss, eval: evals,
+          best, lines, ep_plies = [], extra = {}, ...rest } = compact;
+  const epPlies = new Set(ep_plies);
+  const fen_history = [start_fen];
+  const moves_meta = moves.map((played_uci, i) => {
+    const fen = fen_history[i];
+    const [, turn, , , , fullmove] = fen.split(' ');
+    fen_history.push(applyUciToFen(fen, played_uci, epPlies.has(i)));
+    const meta = {
+      ply_index: i,
+      move_number: Number(fullmove),
+      side: turn === 'w' ? 'white' : 'black',
+      played_uci,
+      best_uci: best[i] === null && lines[i].length ? lines[i][0] : best[i],
+      best_uci_list: lines[i],
+      cp_loss: cp_loss[i],
+      category: categories[category[i]],
+      reason: reasons[category[i]],
+      eval: evals[i],
+    };
+    for (const [key, values] of Object.entries(extra)) {
+      if (values[i] !== null) meta[key] = values[i];
+    }
+    return meta;
+  });
+  return { ...rest, fen_history, moves_meta };
+}
+
+// Finished analyses are kept in extension storage together with their ETag, so
+// reopening a game only revalidates it instead of re-downloading the analysis
+const ANALYSIS_CACHE_LIMIT = 20;
+
+function storageGet(keys) {
+  return new Promise(resolve => {
+    try { chrome.storage.local.get(keys, resolve); } catch (e) { resolve({}); }
+  });
+}
+
+function storageSet(items) {
+  return new Promise(resolve => {
+    try { chrome.storage.local.set(items, resolve); } catch (e) { resolve(); }
+  });
+}
+
+async function analysisCacheKey(pgn, depth) {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(`${depth}\n${pgn}`));
+  return 'analysis:' + Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// The backend can re-analyze a game incrementally from an earlier result of
+// it (e.g. at another depth, or before more moves were played). Remember the
+// latest result_id per game, keyed by its URL or else its PGN.
+async function analysisHandleKey(pgn, url) {
+  if (url) return 'analysisHandle:' + url;
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(pgn));
+  return 'analysisHandle:' + Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function loadPreviousResultId(pgn, url) {
+  const key = await analysisHandleKey(pgn, url);
+  return (await storageGet([key]))[key] || null;
+}
+
+async function rememberResultId(pgn, url, resultId) {
+  if (!resultId) return;
+  await storageSet({ [await analysisHandleKey(pgn, url)]: resultId });
+}
+
+async function storeCachedAnalysis(key, etag, result) {
+  const { analysisCacheIndex = [] } = await storageGet(['analysisCacheIndex']);
+  const index = [key, ...analysisCacheIndex.filter(k => k !== key)];
+  const evicted = index.splice(ANALYSIS_CACHE_LIMIT);
+  if (evicted.length) {
+    try { chrome.storage.local.remove(evicted); } catch (e) {}
+  }
+  await storageSet({ [key]: { etag, result }, analysisCacheIndex: index });
+}
+
+// Error for a 429 from the backend's analysis queue; err.busy and
+// err.retryAfter (seconds) let callers skip pointless retries
+async function busyError(res) {
+  const retryAfter = Number(res.headers.get('Retry-After')) || 0;
+  let message = 'Server is busy';
+  try { message = (await res.json()).error || message; } catch (e) {}
+  const err = new Error(retryAfter ? `${message}, try again in ${retryAfter}s` : message);
+  err.busy = true;
+  err.retryAfter = retryAfter;
+  return err;
+}
+
+// Stream per-ply analysis from the backend as newline-delimited JSON.
+// While the game waits for an engine slot, 'queued' events carry its queue
+// position and estimated wait in seconds (eta_s).
+// onEvent(event, partial) is called for every event as it arrives, where
+// partial is the result assembled so far; resolves with the complete result.
+async function analyzeGameStream(pgn, url = '', depth = 15, onEvent = () => {}) {
+  const BACKEND_URL = 'https://chessgod-backend-wa2i.onrender.com'; // Production Render URL
+
+  const cacheKey = await analysisCacheKey(pgn, depth);
+  const cached = (await storageGet([cacheKey]))[cacheKey];
+  const headers = { 'Content-Type': 'application/json' };
+  if (cached && cached.etag) headers['If-None-Match'] = cached.etag;
+
+  const res = await fetch(`${BACKEND_URL}/analyze/stream`, {
+    method: "POST",
+    headers,
+    body: JSON.stringify({
+      pgn,
+      platform: 'extension',
+      options: { depth },
+      previous_id: await loadPreviousResultId(pgn, url),
+    })
+  });
+  if (res.status === 304 && cached) {
+    // Unchanged on the server: replay the stored analysis
+    cached.result.moves_meta.forEach(meta => onEvent({ type: 'ply', ...meta }, cached.result));
+    return cached.result;
+  }
+  if (res.status === 429) throw await busyError(res);
+  if (!res.ok || !res.body) throw new Error("Backend error");
+
+  const result = { fen_history: [], moves_meta: [], game_url: url };
+  const handleLine = line => {
+    if (!line.trim()) return;
+    const event = JSON.parse(line);
+    if (event.type === 'start') {
+      result.fen_history.push(event.fen);
+      result.white_name = event.white_name;
+      result.black_name = event.black_name;
+      result.result_id = event.result_id;
+    } else if (event.type === 'ply') {
+      const { type, fen, ...meta } = event;
+      result.fen_history.push(fen);
+      result.moves_meta.push(meta);
+    } else if (event.type === 'summary') {
+      result.white = event.white;
+      result.black = event.black;
+      result.analysis_params = event.analysis_params;
+      result.etag = event.etag;
+    } else if (event.type === 'error') {
+      throw new Error(event.error);
+    }
+    onEvent(event, result);
+  };
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let nl;
+    while ((nl = buffer.indexOf('\n')) >= 0) {
+      handleLine(buffer.slice(0, nl));
+      buffer = buffer.slice(nl + 1);
+    }
+  }
+  handleLine(buffer);
+  if (result.etag) {
+    try { await storeCachedAnalysis(cacheKey, result.etag, result); } catch (e) { console.warn('Failed to cache analysis', e); }
+  }
+  try { await rememberResultId(pgn, url, result.result_id); } catch (e) {}
+  return result;
+}